@@ -7,10 +7,12 @@ Modular, Clean, Developer-Friendly Implementation
 import sys
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QIcon
-from src.canvas import TutorCanvas
+from src.canvas import TutorCanvas, apply_input_compression, saved_setting
 
 def main():
     """Main application entry point"""
+    # Event compression must be chosen before the application object exists
+    apply_input_compression(saved_setting("full_rate_input", True))
     app = QApplication(sys.argv)
     app.setApplicationName("TutorDraw")
     app.setApplicationVersion("1.0.0")
@@ -0,0 +1,416 @@
+"""
+Autosave journal for TutorDraw
+Scene operations are appended to an on-disk log by a background thread, so
+the GUI never waits for the disk; the log is replayed on the next start and
+periodically compacted into a checkpoint; shared geometry is logged once
+per key and instances only reference it
+"""
+
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+from src.shape_codec import pack_record, unpack_record
+
+CHECKPOINT_FILE = "checkpoint.tdj"
+JOURNAL_FILE = "journal.tdj"
+
+FSYNC_INTERVAL = 1.0          # Seconds of writes that may be lost to a power cut
+COMPACT_BYTES = 4 * 1024 * 1024  # Journal size before compaction is considered
+
+# Every frame is (payload length, CRC-32 of payload) followed by the payload,
+# whose first byte is the operation; a torn or corrupt frame ends the replay
+_FRAME = struct.Struct("<II")
+_BASE = struct.Struct("<BQ")    # op, checkpoint generation the journal continues
+_PUT = struct.Struct("<BIi")    # op, shape id, z; the packed shape follows
+_DELETE = struct.Struct("<BI")  # op, shape id
+_GEOMETRY = struct.Struct("<BQ")  # op, geometry key; the packed source follows
+
+OP_BASE = 1
+OP_PUT = 2
+OP_DELETE = 3
+OP_CLEAR = 4
+_REPLACE = 5  # Queue-only: the whole scene from a loader, written as a checkpoint
+OP_GEOMETRY = 6
+
+_STOP = object()
+
+
+def _frame(payload):
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_frames(data):
+    """Payloads of the intact frames at the start of data"""
+    pos = 0
+    out = []
+    while pos + _FRAME.size <= len(data):
+        length, crc = _FRAME.unpack_from(data, pos)
+        payload = data[pos + _FRAME.size:pos + _FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc or not payload:
+            break
+        out.append(payload)
+        pos += _FRAME.size + length
+    return out
+
+
+def geometry_keys(blob):
+    """Keys of the shared geometry a packed shape references, directly or inside groups"""
+    keys = set()
+    pending = [unpack_record(blob)]
+    while pending:
+        record = pending.pop()
+        if record.get("geometry") is not None:
+            keys.add(record["geometry"])
+        pending.extend(record.get("children") or ())
+    return keys
+
+
+def _replay(payloads, state, geometries):
+    """Apply journal payloads to state (id -> (z, blob)) and geometries (key -> blob).
+
+    Returns the base generation, if any.
+    """
+    generation = None
+    for payload in payloads:
+        op = payload[0]
+        if op == OP_BASE:
+            generation = _BASE.unpack_from(payload)[1]
+        elif op == OP_GEOMETRY:
+            geometries[_GEOMETRY.unpack_from(payload)[1]] = bytes(payload[_GEOMETRY.size:])
+        elif op == OP_PUT:
+            _, shape_id, z = _PUT.unpack_from(payload)
+            state[shape_id] = (z, bytes(payload[_PUT.size:]))
+        elif op == OP_DELETE:
+            state.pop(_DELETE.unpack_from(payload)[1], None)
+        elif op == OP_CLEAR:
+            state.clear()
+    return generation
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return b""
+
+
+def _write_file(path, data):
+    """Replace path with data, durably"""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def session_state(reader, new_key):
+    """Journal state of a session file's scene, as loaded bottom to top.
+
+    Returns ({id: (z, packed shape)}, {geometry key: packed source}).  Each
+    shared source row gets one key from ``new_key()``, which its instances
+    reference.  Corrupt rows are left out.
+    """
+    keys = {}
+
+    def key_of(source_row):
+        if source_row not in keys:
+            keys[source_row] = new_key()
+        return keys[source_row]
+
+    state = {}
+    for row in range(reader.scene_count):
+        try:
+            record = reader.full_record(row, key_of)
+        except ValueError:
+            # A corrupt row, which loading the file leaves out as well
+            continue
+        state[record["id"]] = (row, pack_record(record))
+    geometries = {}
+    while len(geometries) < len(keys):
+        # Sources can contain instances of further sources
+        for source_row, key in list(keys.items()):
+            if key not in geometries:
+                geometries[key] = pack_record(reader.full_record(source_row, key_of))
+    return state, geometries
+
+
+def recover(directory, geometries=None):
+    """Last saved scene as (generation, {id: (z, packed shape)}).
+
+    The checkpoint is loaded first; the journal is replayed on top only if it
+    continues that checkpoint, since a crash during compaction can leave a
+    journal that the new checkpoint already contains.  ``geometries``, if
+    given, receives the packed sources of shared geometry (key -> blob).
+    """
+    state = {}
+    if geometries is None:
+        geometries = {}
+    generation = _replay(read_frames(_read(os.path.join(directory, CHECKPOINT_FILE))), state, geometries) or 0
+    payloads = read_frames(_read(os.path.join(directory, JOURNAL_FILE)))
+    if payloads and payloads[0][0] == OP_BASE and _BASE.unpack_from(payloads[0])[1] == generation:
+        _replay(payloads, state, geometries)
+    return generation, state
+
+
+class AutosaveJournal:
+    """Background writer of the autosave log in one directory.
+
+    ``put``, ``delete`` and ``clear`` only enqueue and return immediately.
+    The writer thread appends each batch of queued operations with a single
+    write, calls fsync at most every ``fsync_interval`` seconds, and keeps a
+    mirror of the scene (packed shapes) so it can compact the log into a
+    checkpoint without asking the GUI for anything.  Shared geometry is
+    written the first time a shape references it, and compaction keeps only
+    the geometry still referenced.  ``on_error(exception)`` is called on the
+    writer thread when journaling stops, e.g. because the directory cannot be
+    written.
+    """
+
+    def __init__(self, directory, fsync_interval=FSYNC_INTERVAL, compact_bytes=COMPACT_BYTES, on_error=None):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        self.on_error = on_error
+        self.error = None  # First error of the writer; journaling stops after one
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._file = None
+        self._state = {}
+        self._geometries = {}  # key -> packed source
+        self._refs = {}  # shape id -> geometry keys it references, where known
+        self._generation = 0
+        self._checkpoint_bytes = 0
+        self._dirty = False  # Written since the last fsync
+        self._last_sync = 0.0
+
+    def start(self, generation=None, state=None, geometries=None):
+        """Begin appending to the journal that continues checkpoint ``generation``.
+
+        ``state`` and ``geometries`` are the scene the journal currently
+        describes, as returned by ``recover``; they seed the mirror used for
+        compaction.  Without a generation the writer continues whatever
+        checkpoint the directory holds.  Returns at once: the writer thread
+        opens the journal before anything queued is written, and a failure
+        to do so stops journaling like any other write error.
+        """
+        self._thread = threading.Thread(target=self._run, args=(generation, state, geometries),
+                                        name="autosave", daemon=True)
+        self._thread.start()
+
+    def _open(self, generation, state, geometries):
+        """Writer side of start: recover the generation if needed and open the journal for appending"""
+        os.makedirs(self.directory, exist_ok=True)
+        if generation is None:
+            generation = recover(self.directory)[0]
+        self._generation = generation
+        self._state = dict(state or {})
+        self._geometries = dict(geometries or {})
+        checkpoint = os.path.join(self.directory, CHECKPOINT_FILE)
+        self._checkpoint_bytes = os.path.getsize(checkpoint) if os.path.exists(checkpoint) else 0
+        path = os.path.join(self.directory, JOURNAL_FILE)
+        payloads = read_frames(_read(path))
+        if not payloads or payloads[0][0] != OP_BASE or _BASE.unpack_from(payloads[0])[1] != generation:
+            # Missing, stale or unreadable: start a fresh journal for this checkpoint
+            _write_file(path, _frame(_BASE.pack(OP_BASE, generation)))
+        else:
+            # Drop a torn tail so new frames follow the last intact one
+            intact = sum(_FRAME.size + len(p) for p in payloads)
+            with open(path, "r+b") as f:
+                f.truncate(intact)
+        self._file = open(path, "ab")
+
+    def put(self, shape_id, z, blob, geometries=None):
+        """Record a shape's current packed state (added, moved or restyled).
+
+        ``geometries`` holds the packed sources (key -> blob) of the shared
+        geometry the shape references; each is written only once.
+        """
+        self._queue.put((OP_PUT, shape_id, z, blob, geometries or {}))
+
+    def delete(self, shape_id):
+        self._queue.put((OP_DELETE, shape_id))
+
+    def clear(self):
+        self._queue.put((OP_CLEAR,))
+
+    def replace(self, loader):
+        """Replace the whole scene with ``loader()``, called on the writer thread.
+
+        For bulk changes such as opening a session file: the loader returns
+        the new ``({id: (z, packed shape)}, {key: packed source})`` state and
+        shared geometry, which is written straight to a new checkpoint, so the
+        GUI never packs the shapes itself.
+        """
+        self._queue.put((_REPLACE, loader))
+
+    def sync(self, timeout=None):
+        """Block until everything queued so far is written and fsynced; for shutdown and tests.
+
+        Returns False if that did not happen within ``timeout`` or the writer
+        thread is gone.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not done.wait(0.1):
+            if not self._thread.is_alive() or (deadline is not None and time.monotonic() >= deadline):
+                return False
+        return True
+
+    def close(self, timeout=5.0):
+        """Write and fsync what is queued, then stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self, generation, state, geometries):
+        try:
+            self._open(generation, state, geometries)
+        except Exception as e:
+            self._fail(e)
+        self._last_sync = time.monotonic()
+        while True:
+            try:
+                items = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                items = []
+            # Batch everything that queued up meanwhile into one write
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            ops = []
+            waiters = []
+            stop = False
+            for item in items:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    ops.append(item)
+            try:
+                self._write(ops, stop or waiters)
+            except Exception as e:
+                # Journaling stops, but the thread stays to answer sync and close
+                self._fail(e)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                return
+
+    def _fail(self, error):
+        """Stop journaling after the first error and report it"""
+        if self.error is not None:
+            return
+        self.error = error
+        if self.on_error is not None:
+            self.on_error(error)
+        else:
+            print(f"Autosave stopped: {error}")
+
+    def _write(self, ops, sync_now):
+        """Apply one batch of queued operations and append it to the journal"""
+        if self.error is not None:
+            return
+        frames = []
+        replaced = False
+        for item in ops:
+            if item[0] == _REPLACE:
+                self._state, self._geometries = item[1]()
+                self._refs = {}
+                # Earlier frames are superseded; later ones are in the state too
+                frames = []
+                replaced = True
+            else:
+                frames.append(self._apply(item))
+        if self.error is not None:
+            return
+        if replaced:
+            self._compact()
+            self._dirty = False
+        elif frames:
+            self._file.write(b"".join(frames))
+            # Reaches the OS right away, so an application crash loses nothing
+            self._file.flush()
+            self._dirty = True
+        now = time.monotonic()
+        if self._dirty and (sync_now or now - self._last_sync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+            self._dirty = False
+            if self._file.tell() > max(self.compact_bytes, self._checkpoint_bytes):
+                self._compact()
+
+    def _apply(self, item):
+        """Update the mirror with one operation and return its frames"""
+        op = item[0]
+        if op == OP_PUT:
+            _, shape_id, z, blob, geometries = item
+            frames = b""
+            for key, source in geometries.items():
+                if key not in self._geometries:
+                    self._geometries[key] = source
+                    frames += _frame(_GEOMETRY.pack(OP_GEOMETRY, key) + source)
+            self._state[shape_id] = (z, blob)
+            self._refs[shape_id] = set(geometries)
+            return frames + _frame(_PUT.pack(OP_PUT, shape_id, z) + blob)
+        if op == OP_DELETE:
+            self._state.pop(item[1], None)
+            self._refs.pop(item[1], None)
+            return _frame(_DELETE.pack(OP_DELETE, item[1]))
+        self._state.clear()
+        self._refs.clear()
+        return _frame(bytes((OP_CLEAR,)))
+
+    def _used_geometries(self):
+        """Keys of the geometry the mirrored scene still references, nested sources included"""
+        used = set()
+        for shape_id, (_, blob) in self._state.items():
+            refs = self._refs.get(shape_id)
+            if refs is None:
+                # Recovered or replaced state: only the blob knows
+                refs = self._refs[shape_id] = geometry_keys(blob) if self._geometries else set()
+            used.update(refs)
+        pending = list(used)
+        while pending:
+            source = self._geometries.get(pending.pop())
+            for key in geometry_keys(source) if source is not None else ():
+                if key not in used:
+                    used.add(key)
+                    pending.append(key)
+        return used
+
+    def _compact(self):
+        """Write the mirror as the next checkpoint and restart the journal from it"""
+        generation = self._generation + 1
+        used = self._used_geometries()
+        self._geometries = {key: source for key, source in self._geometries.items() if key in used}
+        frames = [_frame(_BASE.pack(OP_BASE, generation))]
+        for key, source in self._geometries.items():
+            frames.append(_frame(_GEOMETRY.pack(OP_GEOMETRY, key) + source))
+        for shape_id, (z, blob) in self._state.items():
+            frames.append(_frame(_PUT.pack(OP_PUT, shape_id, z) + blob))
+        data = b"".join(frames)
+        _write_file(os.path.join(self.directory, CHECKPOINT_FILE), data)
+        # A crash from here on leaves a journal of the old generation, which
+        # recovery ignores in favour of the complete checkpoint
+        path = os.path.join(self.directory, JOURNAL_FILE)
+        self._file.close()
+        _write_file(path, _frame(_BASE.pack(OP_BASE, generation)))
+        self._file = open(path, "ab")
+        self._generation = generation
+        self._checkpoint_bytes = len(data)
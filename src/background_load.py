@@ -0,0 +1,72 @@
+"""
+Background loading for TutorDraw
+Runs a producer on a worker thread and hands what it yields to the GUI
+thread a frame's time budget at a time, so content streams in while the
+user keeps working
+"""
+
+import queue
+import threading
+import time
+
+
+class BackgroundLoader:
+    """Iterates ``produce()`` on a worker thread; ``poll`` consumes the results.
+
+    The generator should yield reasonably small items (e.g. chunks of
+    decoded shapes).  ``poll`` is called once per frame on the GUI thread and
+    hands queued items to ``consume`` until its time budget is spent, so one
+    frame never absorbs the whole load.  ``cancel`` stops the worker after the
+    item it is producing; items already queued are still delivered, the
+    consumer decides whether they still matter.
+    """
+
+    def __init__(self, produce):
+        self._produce = produce
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._finished = False  # Worker done; set on the worker, read on the GUI thread
+        self.cancelled = False
+        self.done = False
+        self.error = None  # Exception that ended the producer early, if any
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="background-load", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _run(self):
+        try:
+            for item in self._produce():
+                self._queue.put(item)
+                if self.cancelled:
+                    break
+        except Exception as e:
+            self.error = e
+        self._finished = True
+
+    def poll(self, consume, budget=0.004):
+        """Hand queued items to consume(item) for up to budget seconds; returns True once all are delivered"""
+        if self.done:
+            return True
+        deadline = time.perf_counter() + budget
+        while True:
+            # Read before draining so an item queued just before finishing is not missed
+            finished = self._finished
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                if finished:
+                    self.done = True
+                return self.done
+            consume(item)
+            if time.perf_counter() >= deadline:
+                return False
+
+    def wait(self, consume, timeout=None):
+        """Block until the producer is done and deliver everything; for shutdown and tests"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.poll(consume, budget=float("inf"))
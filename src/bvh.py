@@ -0,0 +1,72 @@
+"""
+Bounding-volume hierarchy for TutorDraw shape groups
+Static tree over child bounds so hit tests and culling inside a group only
+descend into the branches that can contain a hit
+"""
+
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+class BVH:
+    """Binary tree of axis-aligned ``(x0, y0, x1, y1)`` bounds.
+
+    Built once from ``(item, bounds)`` entries given bottom-most first;
+    entries are split at the median of the longest centroid axis.  Queries
+    return items topmost-first like ``SpatialGrid``.
+    """
+
+    def __init__(self, entries, leaf_size=4):
+        self.leaf_size = leaf_size
+        self._items = [item for item, _ in entries]
+        self._bounds = [bounds for _, bounds in entries]
+        # Each node is (bounds, left, right, leaf_indices); leaves have no children
+        leaves = [(bounds, i) for i, (_, bounds) in enumerate(entries)]
+        self._root = self._build(leaves) if leaves else None
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def bounds(self):
+        return self._root[0] if self._root else None
+
+    def _build(self, leaves):
+        bounds = leaves[0][0]
+        for b, _ in leaves[1:]:
+            bounds = _union(bounds, b)
+        if len(leaves) <= self.leaf_size:
+            return (bounds, None, None, [i for _, i in leaves])
+        cx = [(b[0] + b[2]) for b, _ in leaves]
+        cy = [(b[1] + b[3]) for b, _ in leaves]
+        axis = 0 if max(cx) - min(cx) >= max(cy) - min(cy) else 1
+        leaves.sort(key=lambda leaf: leaf[0][axis] + leaf[0][axis + 2])
+        mid = len(leaves) // 2
+        return (bounds, self._build(leaves[:mid]), self._build(leaves[mid:]), None)
+
+    def _collect(self, hit_test):
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            bounds, left, right, indices = stack.pop()
+            if not hit_test(bounds):
+                continue
+            if indices is None:
+                stack.append(left)
+                stack.append(right)
+            else:
+                found.extend(i for i in indices if hit_test(self._bounds[i]))
+        items = self._items
+        return [items[i] for i in sorted(found, reverse=True)]
+
+    def query_point(self, x, y):
+        """Items whose bounds contain the point, topmost first"""
+        return self._collect(lambda b: b[0] <= x <= b[2] and b[1] <= y <= b[3])
+
+    def query_rect(self, rect):
+        """Items whose bounds intersect the rect, topmost first"""
+        qx0, qy0, qx1, qy1 = rect
+        return self._collect(lambda b: b[0] <= qx1 and qx0 <= b[2] and b[1] <= qy1 and qy0 <= b[3])
@@ -3,16 +3,73 @@ import math
 import os
 import json
 import tempfile
+import itertools
+import functools
+import random
+import weakref
+from array import array
 
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QLineEdit, QMessageBox, QColorDialog, QDialog, QDialogButtonBox, QVBoxLayout, QLabel, QComboBox, QShortcut
+    QApplication, QWidget, QLineEdit, QMessageBox, QColorDialog, QDialog, QDialogButtonBox, QVBoxLayout, QLabel, QComboBox, QShortcut,
+    QFileDialog, QInputDialog, QProgressDialog
 )
-from PyQt5.QtCore import Qt, QTimer, QRectF, QPointF, QRect, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer, QRectF, QPointF, QRect, QEvent, QCoreApplication, pyqtSignal
 from PyQt5.QtGui import (
-    QPainter, QPen, QColor, QPainterPath, QFont, QRadialGradient, QBrush, QFontMetrics, QIcon, QKeySequence
+    QPainter, QPen, QColor, QPainterPath, QFont, QRadialGradient, QBrush, QFontMetrics, QIcon, QKeySequence, QPixmap,
+    QCursor, QTransform, QPolygonF, QImage
 )
 
+from src.scene import Scene
+from src import scene_events
+from src.layers import LayerStack
+from src.spatial_index import SpatialGrid
+from src.bvh import BVH
+from src.history import History
+from src.shape_codec import pack_record, unpack_record, quantize
+from src import hit_testing
+from src.curve_fit import CurveFitter, flatten
+from src.input_pipeline import InputPipeline, SAMPLE_STRIDE
+from src.ink_prediction import StrokePredictor
+from src.smoothing import PointSmoother
+from src.stroke_split import Capsule, split_polyline
+from src.transform import Affine, map_many
+from src.selection_handles import HandleLayout
+from src.snapping import SnapIndex
+from src.shape_recognition import recognize
+from src.stroke_outline import StrokeOutline, SpeedPressure, stroke_outline, pressure_radius, max_width
+from src.session_file import SessionReader, write_session
+from src.autosave import AutosaveJournal, recover, session_state
+from src.background_load import BackgroundLoader
+from src.image_export import ExportJob, save_png
+
 CONFIG_FILE = "tutordraw_settings.json"
+AUTOSAVE_DIR = "tutordraw_autosave"  # Journal the scene is restored from after a crash or quit
+RESTORE_CHUNK = 500  # Shapes decoded per chunk of the startup restore
+RESTORE_BUDGET = 0.004  # Seconds per frame spent adding restored shapes to the scene
+RESTORE_RESERVED = 1 << 30  # First id and z of shapes drawn before the saved ones are known
+EXPORT_SCALES = ["1×", "2×", "3×", "4×"]
+
+def saved_setting(key, default):
+    """Read one value from the settings file before the canvas exists"""
+    try:
+        with open(CONFIG_FILE, "r") as f:
+            return json.load(f).get(key, default)
+    except (OSError, ValueError):
+        return default
+
+def apply_input_compression(full_rate):
+    """Let Qt merge high-frequency mouse/tablet events, or deliver every one of them.
+
+    Set before the QApplication is created; later changes are honoured by
+    platforms that read the attributes per event.
+    """
+    QCoreApplication.setAttribute(Qt.AA_CompressHighFrequencyEvents, not full_rate)
+    if hasattr(Qt, 'AA_CompressTabletEvents'):
+        QCoreApplication.setAttribute(Qt.AA_CompressTabletEvents, not full_rate)
+
+# Two-point shapes whose corners snap while drawing
+SNAPPING_MODES = ["rect", "diamond", "ellipse", "arrow"]
+ARROW_HEAD_ANGLE = math.radians(28)  # Between the shaft and each wing of an arrow head
 
 class TutorShape:
     def __init__(self, mode, start, color, thickness=4, text="", fill_color=None, font_size=22, font_bold=False, font_italic=False):
@@ -33,19 +90,821 @@ class TutorShape:
         self.font_size = font_size
         self.font_bold = font_bold
         self.font_italic = font_italic
+        # Freehand strokes are stored as cubic Bezier control points once fitted:
+        # points = [p0, c1, c2, p3, c1, c2, p3, ...]
+        self.is_curve = False
+        # Stable identifier assigned by the Scene store
+        self.id = None
+        # ID of the annotation layer the shape is drawn on (see LayerStack)
+        self.layer = None
+        # Cached (x0, y0, x1, y1) geometry bounds, see bounds()
+        self._bounds = None
+        # Cached flat [x0, y0, x1, y1, ...] polyline of freehand strokes, see flat_coords()
+        self._coords = None
+        # Cached QPainterPath of freehand strokes, extended as points arrive
+        self._path = None
+        # Pen pressure (0-1) per raw point of variable-width pencil strokes, None for constant width
+        self.pressures = None
+        # Offsets of a variable-width stroke being drawn, see begin_live_outline()
+        self._outline = None
+        # Loader of points not decoded yet, see defer_points()
+        self._lazy_points = None
+
+    def __getattr__(self, name):
+        # Only reached when an attribute is missing: the points of a deferred stroke
+        loader = self.__dict__.get('_lazy_points')
+        if name != 'points' or loader is None:
+            raise AttributeError(name)
+        coords = loader()
+        self._lazy_points = None
+        self.points = [QPointF(coords[i], coords[i + 1]) for i in range(0, len(coords) - 1, 2)]
+        if self._coords is None and not self.is_curve:
+            self._coords = coords
+        return self.points
+
+    def defer_points(self, loader, bounds=None):
+        """Drop the points until first use; loader() returns their flat coordinates.
+
+        Used for strokes loaded from session files, so shapes that are never
+        drawn, hit or edited never decode their geometry.
+        """
+        del self.points
+        self._lazy_points = loader
+        if bounds is not None:
+            self._bounds = bounds
+
+    def copy(self):
+        """Independent copy with the same id, used for undo snapshots"""
+        c = TutorShape(self.mode, QPointF(self.points[0]), QColor(self.color), self.thickness, self.text,
+                       self.fill_color, self.font_size, self.font_bold, self.font_italic)
+        c.points = [QPointF(p) for p in self.points]
+        c.end_pos = QPointF(self.end_pos)
+        c.rotation = self.rotation
+        c.scale_x = self.scale_x
+        c.scale_y = self.scale_y
+        c.is_curve = self.is_curve
+        if self.pressures is not None:
+            c.pressures = array('f', self.pressures)
+        c.id = self.id
+        c.layer = self.layer
+        c._bounds = self._bounds
+        if getattr(self, 'text_bounds', None):
+            c.text_bounds = QRectF(self.text_bounds)
+        return c
+
+    def to_record(self):
+        """Plain-data description of the shape used by the binary codecs"""
+        tb = getattr(self, 'text_bounds', None)
+        return {
+            "mode": self.mode,
+            "id": self.id,
+            "layer": self.layer,
+            "color": self.color.rgba(),
+            "fill": self.fill_color.rgba() if self.fill_color else None,
+            "thickness": self.thickness,
+            "rotation": self.rotation,
+            "scale_x": self.scale_x,
+            "scale_y": self.scale_y,
+            "font_size": self.font_size,
+            "font_bold": self.font_bold,
+            "font_italic": self.font_italic,
+            "is_curve": self.is_curve,
+            "text": self.text,
+            "points": self.point_coords(),
+            "end": (self.end_pos.x(), self.end_pos.y()),
+            "text_bounds": (tb.x(), tb.y(), tb.width(), tb.height()) if tb else None,
+            "pressures": list(self.pressures) if self.pressures is not None else None,
+            "bounds": self._bounds,
+        }
+
+    @classmethod
+    def from_record(cls, record, sources=None, registry=None):
+        """Shape for a record; see ShapeInstance.from_record for sources and registry"""
+        if record["mode"] == "group":
+            return ShapeGroup.from_record(record, sources, registry)
+        if record["mode"] == "instance":
+            return ShapeInstance.from_record(record, sources, registry)
+        coords = record["points"]
+        shape = cls(record["mode"], QPointF(coords[0], coords[1]), QColor.fromRgba(record["color"]),
+                    record["thickness"], record["text"],
+                    QColor.fromRgba(record["fill"]) if record["fill"] is not None else None,
+                    record["font_size"], record["font_bold"], record["font_italic"])
+        shape.points = [QPointF(coords[i], coords[i + 1]) for i in range(0, len(coords) - 1, 2)]
+        shape.end_pos = QPointF(*record["end"])
+        shape.rotation = record["rotation"]
+        shape.scale_x = record["scale_x"]
+        shape.scale_y = record["scale_y"]
+        shape.is_curve = record["is_curve"]
+        shape.id = record["id"]
+        shape.layer = record.get("layer")
+        if record["text_bounds"]:
+            shape.text_bounds = QRectF(*record["text_bounds"])
+        if record.get("pressures") is not None:
+            shape.pressures = array('f', record["pressures"])
+        return shape
+
+    def font(self):
+        """Font a text shape is rendered with"""
+        font = QFont("Segoe Print", self.font_size, QFont.Bold if self.font_bold else QFont.Normal)
+        font.setStyle(QFont.StyleItalic if self.font_italic else QFont.StyleNormal)
+        return font
+
+    def add_point(self, pos, pressure=None):
+        """Append a freehand sample, growing the cached bounds in O(1)"""
+        self.points.append(pos)
+        if self.pressures is not None:
+            if pressure is None:
+                pressure = self.pressures[-1] if self.pressures else 0.5
+            self.pressures.append(pressure)
+            if self._outline is not None:
+                quad = self._outline.add(pos.x(), pos.y(), pressure_radius(self.thickness, pressure))
+                if quad is not None:
+                    self._path.addPolygon(QPolygonF([QPointF(quad[i], quad[i + 1]) for i in range(0, 8, 2)]))
+                    self._path.closeSubpath()
+            else:
+                self._path = None
+        elif self._path is not None:
+            self._path.lineTo(pos)
+        if self._coords is not None:
+            self._coords.extend((pos.x(), pos.y()))
+        if self._bounds is not None:
+            x, y = pos.x(), pos.y()
+            x0, y0, x1, y1 = self._bounds
+            self._bounds = (min(x0, x), min(y0, y), max(x1, x), max(y1, y))
+
+    def set_end_pos(self, pos):
+        self.end_pos = pos
+        self._bounds = None
+
+    def translate(self, delta):
+        """Move the whole shape; cached bounds are shifted rather than recomputed"""
+        self.points = [p + delta for p in self.points]
+        self.end_pos = self.end_pos + delta
+        if getattr(self, 'text_bounds', None):
+            self.text_bounds = self.text_bounds.translated(delta)
+        if self._bounds is not None:
+            dx, dy = delta.x(), delta.y()
+            x0, y0, x1, y1 = self._bounds
+            self._bounds = (x0 + dx, y0 + dy, x1 + dx, y1 + dy)
+        self._coords = None
+        self._path = None
+        self._outline = None
+
+    def invalidate_bounds(self):
+        """Call after the geometry or font was changed in place (scale, restyle)"""
+        self._bounds = None
+        self._coords = None
+        self._path = None
+        self._outline = None
+
+    def begin_live_outline(self, pressure):
+        """Make this a variable-width stroke whose outline grows quad by quad while drawing"""
+        self.pressures = array('f', [pressure] * len(self.points))
+        self._outline = StrokeOutline()
+        path = QPainterPath()
+        path.setFillRule(Qt.WindingFill)
+        p = self.points[0]
+        r = pressure_radius(self.thickness, pressure)
+        # Round start cap; the end cap comes with the finished outline
+        path.addEllipse(p, r, r)
+        self._path = path
+        for p, pressure in zip(self.points, self.pressures):
+            self._outline.add(p.x(), p.y(), pressure_radius(self.thickness, pressure))
+
+    def end_live_outline(self):
+        """Drop the quad-by-quad path so freehand_path() builds the closed outline"""
+        self._outline = None
+        self._path = None
+
+    def set_curve(self, segments):
+        """Replace the raw samples with fitted (p0, c1, c2, p3) Bezier segments.
+
+        Control points are snapped to the quantized grid, far inside the fit
+        error, so the exact history encoding stores no residual for them.
+        """
+        points = [QPointF(*map(quantize, segments[0][0]))]
+        for _, c1, c2, p3 in segments:
+            points.extend(QPointF(quantize(x), quantize(y)) for x, y in (c1, c2, p3))
+        self.points = points
+        self.is_curve = True
+        self.invalidate_bounds()
+
+    def curve_segments(self):
+        pts = [(p.x(), p.y()) for p in self.points]
+        return [tuple(pts[i:i + 4]) for i in range(0, len(pts) - 3, 3)]
+
+    def point_coords(self):
+        """The points as a flat [x0, y0, ...] list, without decoding deferred ones"""
+        if 'points' not in self.__dict__:
+            return list(self._lazy_points())
+        return [c for p in self.points for c in (p.x(), p.y())]
+
+    def flat_coords(self):
+        """Freehand outline as a flat coordinate list; Bezier strokes are flattened"""
+        if self._coords is None:
+            if 'points' not in self.__dict__ and not self.is_curve:
+                self._coords = self._lazy_points()
+            elif self.is_curve:
+                self._coords = flatten(self.curve_segments())
+            else:
+                self._coords = [c for p in self.points for c in (p.x(), p.y())]
+        return self._coords
+
+    def freehand_path(self):
+        """QPainterPath for pencil and highlighter strokes, built once and cached.
+
+        Samples are already smoothed on arrival, so a stroke in progress is a
+        plain polyline that add_point() extends.  Variable-width strokes are
+        the filled outline polygon instead.
+        """
+        if self._path is None:
+            path = QPainterPath()
+            pts = self.points
+            if self.pressures is not None:
+                # The outline crosses itself at loops and caps; even-odd filling would leave holes there
+                path.setFillRule(Qt.WindingFill)
+                outline = stroke_outline(self.flat_coords(), self.pressures, self.thickness)
+                path.addPolygon(QPolygonF([QPointF(outline[i], outline[i + 1])
+                                           for i in range(0, len(outline) - 1, 2)]))
+                path.closeSubpath()
+                self._path = path
+                return path
+            path.moveTo(pts[0])
+            if self.is_curve:
+                for i in range(1, len(pts) - 2, 3):
+                    path.cubicTo(pts[i], pts[i + 1], pts[i + 2])
+            else:
+                for p in pts[1:]:
+                    path.lineTo(p)
+            self._path = path
+        return self._path
+
+    def bounds(self):
+        """Geometry bounds as an (x0, y0, x1, y1) tuple, cached until invalidated"""
+        if self._bounds is None:
+            self._bounds = self._compute_bounds()
+        return self._bounds
+
+    def _compute_bounds(self):
+        start = self.points[0]
+        if self.mode == "text":
+            # For text, calculate based on the metrics of the font it is drawn with
+            fm = QFontMetrics(self.font())
+            x, y = start.x(), start.y() - fm.ascent()
+            return (x, y, x + fm.horizontalAdvance(self.text), y + fm.height())
+        elif self.mode in ["rect", "ellipse", "diamond"]:
+            # For geometric shapes, use the two defining points
+            x0, y0, x1, y1 = start.x(), start.y(), self.end_pos.x(), self.end_pos.y()
+            return (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        elif self.mode == "arrow":
+            # The head's wings can reach past the two end points
+            ends = [start, self.end_pos] + self.arrow_head()
+            xs, ys = [p.x() for p in ends], [p.y() for p in ends]
+            return (min(xs), min(ys), max(xs), max(ys))
+        elif self.mode in ["pencil", "highlighter"]:
+            # For freehand drawing, calculate from the whole outline once
+            coords = self.flat_coords()
+            xs, ys = coords[0::2], coords[1::2]
+            tb = getattr(self, 'text_bounds', None)
+            if tb:
+                # A text highlight is drawn as the text's rectangle
+                xs = list(xs) + [tb.left(), tb.right()]
+                ys = list(ys) + [tb.top(), tb.bottom()]
+            return (min(xs), min(ys), max(xs), max(ys))
+        elif self.mode == "circle":
+            radius = math.hypot(self.end_pos.x() - start.x(), self.end_pos.y() - start.y())
+            return (start.x() - radius, start.y() - radius, start.x() + radius, start.y() + radius)
+        else:
+            # For other shapes, use a reasonable bounding box
+            return (start.x() - 10, start.y() - 10, start.x() + 10, start.y() + 10)
+
+    def arrow_head(self):
+        """Tips of the two wings of an arrow's head at end_pos, sized from the thickness"""
+        tip, tail = self.end_pos, self.points[0]
+        length = max(10.0, 4.0 * self.thickness)
+        angle = math.atan2(tip.y() - tail.y(), tip.x() - tail.x())
+        return [QPointF(tip.x() - length * math.cos(angle + side * ARROW_HEAD_ANGLE),
+                        tip.y() - length * math.sin(angle + side * ARROW_HEAD_ANGLE)) for side in (-1, 1)]
+
+class ShapeGroup:
+    """Several shapes handled as one node of the scene.
+
+    Children keep group-local coordinates and the group only stores an offset,
+    so moving a group is a single transform update whatever its size.  The
+    combined bounds, a BVH over the children and a raster of them are cached
+    and survive moves.
+    """
+
+    mode = "group"
+    MAX_RASTER_PIXELS = 4096 * 4096  # Larger groups are drawn child by child
+
+    def __init__(self, children, offset=None):
+        self.children = children
+        self.offset = offset if offset is not None else QPointF(0, 0)
+        self.id = None
+        self.layer = children[-1].layer
+        self.is_selected = False
+        self.color = children[0].color
+        self.fill_color = None
+        self.thickness = max(c.thickness for c in children)
+        self.rotation = 0
+        self.scale_x = 1.0
+        self.scale_y = 1.0
+        self.text = ""
+        # Built on demand by the canvas, which knows the pick tolerances
+        self.bvh = None
+        self.raster = None
+        self._local_bounds = None
+        self._bounds = None
+
+    def copy(self):
+        c = ShapeGroup([child.copy() for child in self.children], QPointF(self.offset))
+        c.id = self.id
+        c.layer = self.layer
+        return c
+
+    def to_record(self):
+        ox, oy = self.offset.x(), self.offset.y()
+        record = self.children[0].to_record()
+        record.update(mode="group", id=self.id, layer=self.layer, text="", fill=None, text_bounds=None,
+                      is_curve=False, points=[ox, oy], end=(ox, oy), pressures=None, bounds=None,
+                      tint=None, geometry=None, children=[child.to_record() for child in self.children])
+        return record
+
+    @classmethod
+    def from_record(cls, record, sources=None, registry=None):
+        group = cls([TutorShape.from_record(child, sources, registry) for child in record["children"]],
+                    QPointF(*record["points"][:2]))
+        group.id = record["id"]
+        group.layer = record.get("layer")
+        return group
+
+    def local_bounds(self):
+        """Union of the children bounds in group coordinates"""
+        if self._local_bounds is None:
+            x0, y0, x1, y1 = self.children[0].bounds()
+            for child in self.children[1:]:
+                b = child.bounds()
+                x0, y0, x1, y1 = min(x0, b[0]), min(y0, b[1]), max(x1, b[2]), max(y1, b[3])
+            self._local_bounds = (x0, y0, x1, y1)
+        return self._local_bounds
+
+    def bounds(self):
+        if self._bounds is None:
+            x0, y0, x1, y1 = self.local_bounds()
+            dx, dy = self.offset.x(), self.offset.y()
+            self._bounds = (x0 + dx, y0 + dy, x1 + dx, y1 + dy)
+        return self._bounds
+
+    def translate(self, delta):
+        """Move the group; children, BVH and raster are left untouched"""
+        self.offset = self.offset + delta
+        self._bounds = None
+
+    def invalidate_bounds(self):
+        self._local_bounds = None
+        self._bounds = None
+        self.bvh = None
+        self.raster = None
+
+    def ungrouped(self):
+        """Children moved back to scene coordinates, on the group's layer"""
+        for child in self.children:
+            child.translate(self.offset)
+            child.layer = self.layer
+        return self.children
+
+
+class SharedGeometry:
+    """Immutable drawing content shared by any number of ShapeInstances.
+
+    The source shape (a stroke or a group) stays in its own coordinates and
+    must not be edited once shared.  Rasters are cached per tint so every
+    instance with the same style blits the same pixmap.
+    """
+
+    # Keys outlive the process in the autosave journal; a random base keeps
+    # them apart from the keys earlier runs left there
+    _keys = itertools.count((random.getrandbits(31) << 20) + 1)
+    # key -> geometry, so instances restored from history share again
+    _registry = weakref.WeakValueDictionary()
+
+    def __init__(self, source, key=None, registry=None):
+        self.source = source
+        source.is_selected = False
+        # The source is only reachable through instances, never through the scene
+        source.id = None
+        self.key = key if key is not None else next(SharedGeometry._keys)
+        self.rasters = {}
+        self._packed = None
+        (SharedGeometry._registry if registry is None else registry)[self.key] = self
+
+    @classmethod
+    def lookup(cls, key):
+        return cls._registry.get(key)
+
+    @classmethod
+    def new_key(cls):
+        return next(cls._keys)
+
+    def packed(self):
+        """The source as an exact packed record, made once since the source never changes"""
+        if self._packed is None:
+            self._packed = pack_record(self.source.to_record(), exact=True)
+        return self._packed
+
+    def bounds(self):
+        return self.source.bounds()
+
+
+class ShapeInstance:
+    """Lightweight placement of a SharedGeometry with its own offset and tint"""
+
+    mode = "instance"
+
+    def __init__(self, geometry, offset=None, tint=None):
+        self.geometry = geometry
+        self.offset = offset if offset is not None else QPointF(0, 0)
+        self.tint = tint  # Overrides the source colors when set
+        self.id = None
+        self.layer = geometry.source.layer
+        self.is_selected = False
+        self.color = tint or geometry.source.color
+        self.fill_color = None
+        self.thickness = geometry.source.thickness
+        self.rotation = 0
+        self.scale_x = 1.0
+        self.scale_y = 1.0
+        self.text = ""
+        self._bounds = None
+
+    def copy(self):
+        c = ShapeInstance(self.geometry, QPointF(self.offset), self.tint)
+        c.id = self.id
+        c.layer = self.layer
+        return c
+
+    def to_record(self):
+        """Record referencing the geometry by key; the source is stored once, elsewhere"""
+        ox, oy = self.offset.x(), self.offset.y()
+        source = self.geometry.source
+        return {
+            "mode": "instance",
+            "id": self.id,
+            "layer": self.layer,
+            "color": source.color.rgba(),
+            "fill": None,
+            "thickness": source.thickness,
+            "rotation": 0.0,
+            "scale_x": 1.0,
+            "scale_y": 1.0,
+            "font_size": getattr(source, 'font_size', 22),
+            "font_bold": False,
+            "font_italic": False,
+            "is_curve": False,
+            "text": "",
+            "points": [ox, oy],
+            "end": (ox, oy),
+            "text_bounds": None,
+            "pressures": None,
+            "bounds": None,
+            "children": None,
+            "tint": self.tint.rgba() if self.tint else None,
+            "geometry": self.geometry.key,
+        }
+
+    @classmethod
+    def from_record(cls, record, sources=None, registry=None):
+        """Instance for a record, sharing the geometry of live instances with the same key.
+
+        Self-contained records embed the source as their only child; others
+        find it in ``sources`` (key -> packed source).  ``registry`` (key ->
+        SharedGeometry) replaces the process-wide one, e.g. for copies that
+        must not share anything with the scene.
+        """
+        key = record.get("geometry")
+        geometry = None
+        if key is not None:
+            geometry = SharedGeometry.lookup(key) if registry is None else registry.get(key)
+        if geometry is None:
+            source = record["children"][0] if record.get("children") else unpack_record(sources[key])
+            geometry = SharedGeometry(TutorShape.from_record(source, sources, registry), key, registry)
+        tint = QColor.fromRgba(record["tint"]) if record.get("tint") is not None else None
+        instance = cls(geometry, QPointF(*record["points"][:2]), tint)
+        instance.id = record["id"]
+        instance.layer = record.get("layer")
+        return instance
+
+    def bounds(self):
+        if self._bounds is None:
+            x0, y0, x1, y1 = self.geometry.bounds()
+            dx, dy = self.offset.x(), self.offset.y()
+            self._bounds = (x0 + dx, y0 + dy, x1 + dx, y1 + dy)
+        return self._bounds
+
+    def translate(self, delta):
+        """Move the instance; the shared geometry is never touched"""
+        self.offset = self.offset + delta
+        self._bounds = None
+
+    def invalidate_bounds(self):
+        self._bounds = None
+
+
+def shape_from_session(reader, row, record=None):
+    """Live shape for a row of a session file; freehand points are decoded on first use"""
+    if record is None:
+        record = reader.record(row, points=False)
+    mode = record["mode"]
+    if mode == "group":
+        group = ShapeGroup([shape_from_session(reader, child) for child in reader.children(row)],
+                           QPointF(*record["points"][:2]))
+        group.id = record["id"]
+        group.layer = record["layer"]
+        return group
+    if mode == "instance":
+        # Geometry keys are process-local; instances of one source row share again
+        source_row = reader.geometry_row(row)
+        geometry = reader.cache.get(source_row)
+        if geometry is None:
+            geometry = reader.cache[source_row] = SharedGeometry(shape_from_session(reader, source_row))
+        tint = QColor.fromRgba(record["tint"]) if record["tint"] is not None else None
+        instance = ShapeInstance(geometry, QPointF(*record["points"][:2]), tint)
+        instance.id = record["id"]
+        instance.layer = record["layer"]
+        return instance
+    if mode not in ["pencil", "highlighter"] and reader.point_count(row) > 1:
+        record = reader.record(row)
+    shape = TutorShape.from_record(record)
+    if mode in ["pencil", "highlighter"]:
+        shape.defer_points(functools.partial(reader.points, row), record["bounds"])
+    return shape
+
+
+def shared_geometries(shape, found=None):
+    """SharedGeometry (key -> geometry) a shape references, inside groups and sources too"""
+    if found is None:
+        found = {}
+    if shape.mode == "instance":
+        if shape.geometry.key not in found:
+            found[shape.geometry.key] = shape.geometry
+            shared_geometries(shape.geometry.source, found)
+    elif shape.mode == "group":
+        for child in shape.children:
+            shared_geometries(child, found)
+    return found
+
+
+def journal_session_state(path):
+    """Writer side of opening a session: the journal state of the file, from a mapping closed again after"""
+    reader = SessionReader(path)
+    try:
+        return session_state(reader, SharedGeometry.new_key)
+    finally:
+        reader.close()
+
+
+def session_rows(reader, chunk_size=RESTORE_CHUNK):
+    """Worker side of opening a session: ("rows", rows, records) chunks bottom to top.
+
+    Only the records are decoded here, which checks each row first; the GUI
+    builds the shapes, which share per-row state (``reader.cache``) with the
+    ones undo rebuilds.  Corrupt rows are left out, and reported with
+    ValueError once the others are loaded.
+    """
+    skipped = 0
+    for start in range(0, reader.scene_count, chunk_size):
+        stop = min(start + chunk_size, reader.scene_count)
+        rows = range(start, stop)
+        try:
+            records = reader.records(start, stop, points=False)
+        except ValueError:
+            # Keep the good rows of the chunk
+            rows = []
+            records = []
+            for row in range(start, stop):
+                try:
+                    records.append(reader.record(row, points=False))
+                except ValueError:
+                    skipped += 1
+                    continue
+                rows.append(row)
+        yield ("rows", rows, records)
+    if skipped:
+        raise ValueError(f"{skipped} corrupt shape(s) left out")
+
+
+def autosave_restore(directory, chunk_size=RESTORE_CHUNK):
+    """Worker side of the startup restore.
+
+    Yields ("state", generation, state, geometries, top id, top z) once the
+    journal is read, then ("shapes", [(z, shape, packed shape), ...]) chunks
+    bottom to top.  Instances keep their saved geometry keys, which no key
+    of this run can equal (see SharedGeometry).
+    """
+    geometries = {}
+    generation, state = recover(directory, geometries)
+    top_id = max(state, default=0)
+    top_z = max((z for z, _ in state.values()), default=-1)
+    yield ("state", generation, state, geometries, top_id, top_z)
+    chunk = []
+    for z, blob in sorted(state.values(), key=lambda item: item[0]):
+        try:
+            chunk.append((z, TutorShape.from_record(unpack_record(blob), geometries), blob))
+        except (ValueError, KeyError):
+            continue
+        if len(chunk) >= chunk_size:
+            yield ("shapes", chunk)
+            chunk = []
+    if chunk:
+        yield ("shapes", chunk)
+
+
+def image_rows(image):
+    """Pixel rows of a 32-bit QImage as memoryviews into its buffer; the image must outlive them"""
+    stride = image.bytesPerLine()
+    bits = image.constBits()
+    bits.setsize(stride * image.height())
+    data = memoryview(bits)
+    width = image.width() * 4
+    return [data[y * stride:y * stride + width] for y in range(image.height())]
+
+
+def draw_primitive(painter, s, tint=None):
+    """Draw a stroke, outline or text shape; tint replaces the shape's own colors.
+
+    Uses nothing but the shape, so exports can draw on a worker thread.
+    """
+    w = s.thickness + 2 if s.is_selected else s.thickness
+    painter.setPen(QPen(tint or s.color, w, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+    
+    if s.fill_color:
+        painter.setBrush(QBrush(tint or s.fill_color))
+    else:
+        painter.setBrush(Qt.NoBrush)
+    
+    if s.mode == "pencil":
+        if len(s.points) > 1:
+            if s.pressures is not None:
+                # The outline already has the stroke's width; fill it
+                painter.setPen(QPen(tint or s.color, 2) if s.is_selected else Qt.NoPen)
+                painter.setBrush(QBrush(tint or s.color))
+            painter.drawPath(s.freehand_path())
+    elif s.mode == "highlighter":
+        # Text-aware highlighter
+        if hasattr(s, 'text_bounds') and s.text_bounds:
+            # Highlight existing text - align with text bounds
+            highlight_color = QColor(255, 255, 0, 128)  # Yellow with 50% transparency
+            if tint:
+                highlight_color = QColor(tint.red(), tint.green(), tint.blue(), 128)
+            painter.setPen(QPen(highlight_color, max(8, w * 2), Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+            painter.setBrush(QBrush(highlight_color))
+            # Draw highlight rectangle that matches text bounds
+            painter.drawRect(s.text_bounds)
+        else:
+            # Free-form highlighter drawing
+            highlight_color = QColor(255, 255, 0, 128)  # Yellow with 50% transparency
+            if tint:
+                highlight_color = QColor(tint.red(), tint.green(), tint.blue(), 128)
+            painter.setPen(QPen(highlight_color, max(8, w * 2), Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+            if len(s.points) > 1:
+                painter.drawPath(s.freehand_path())
+    elif s.mode == "text":
+        # Use the shape's font properties
+        painter.setFont(s.font())
+        painter.drawText(s.points[0], s.text)
+    elif s.mode == "rect":
+        painter.drawRect(QRectF(s.points[0], s.end_pos).normalized())
+    elif s.mode == "ellipse":
+        painter.drawEllipse(QRectF(s.points[0], s.end_pos).normalized())
+    elif s.mode == "circle":
+        radius = math.hypot(s.end_pos.x() - s.points[0].x(), s.end_pos.y() - s.points[0].y())
+        painter.drawEllipse(s.points[0], radius, radius)
+    elif s.mode == "arrow":
+        painter.drawLine(s.points[0], s.end_pos)
+        left, right = s.arrow_head()
+        painter.drawPolyline([left, s.end_pos, right])
+    elif s.mode == "diamond":
+        r = QRectF(s.points[0], s.end_pos).normalized()
+        painter.drawPolygon([QPointF(r.center().x(), r.top()), QPointF(r.right(), r.center().y()), 
+                           QPointF(r.center().x(), r.bottom()), QPointF(r.left(), r.center().y())])
+
+
+def draw_vector(painter, s, tint=None):
+    """Draw any shape as plain vector paths, without cached pixmaps; for exports off the GUI thread"""
+    if s.mode == "group":
+        painter.save()
+        painter.translate(s.offset)
+        for child in s.children:
+            draw_vector(painter, child, tint)
+        painter.restore()
+    elif s.mode == "instance":
+        painter.save()
+        painter.translate(s.offset)
+        draw_vector(painter, s.geometry.source, s.tint)
+        painter.restore()
+    else:
+        draw_primitive(painter, s, tint)
+
+
+def render_export(shapes, layers, size, scale, background, path, job):
+    """Worker side of TutorCanvas.export_image: draw the shapes layer by layer, then encode.
+
+    ``shapes`` are the scene's shapes bottom to top, copies that nothing
+    else uses; ``layers`` lists (layer id, opacity) bottom to top.
+    """
+    out_w = max(1, round(size[0] * scale))
+    out_h = max(1, round(size[1] * scale))
+    total = max(1, len(shapes))
+    known = {layer_id for layer_id, _ in layers}
+    by_layer = {}
+    for shape in shapes:
+        by_layer.setdefault(shape.layer if shape.layer in known else layers[0][0], []).append(shape)
+    image = QImage(out_w, out_h, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    if background is not None:
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawImage(QRectF(0, 0, out_w, out_h), background)
+        painter.end()
+    drawn = 0
+    for layer_id, opacity in layers:
+        layer_shapes = by_layer.get(layer_id)
+        if not layer_shapes or opacity <= 0.0:
+            continue
+        # A translucent layer is blended as a whole, as on screen
+        target = image if opacity >= 1.0 else QImage(out_w, out_h, QImage.Format_ARGB32_Premultiplied)
+        if target is not image:
+            target.fill(Qt.transparent)
+        painter = QPainter(target)
+        try:
+            painter.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing)
+            painter.scale(scale, scale)
+            for s in layer_shapes:
+                draw_vector(painter, s)
+                drawn += 1
+                if drawn % 256 == 0:
+                    job.check()
+                    job.report(0.8 * drawn / total)
+        finally:
+            painter.end()
+        if target is not image:
+            painter = QPainter(image)
+            painter.setOpacity(opacity)
+            painter.drawImage(0, 0, target)
+            painter.end()
+    if path is not None:
+        job.check()
+        rgba = image.convertToFormat(QImage.Format_RGBA8888)
+        save_png(path, out_w, out_h, image_rows(rgba), job, 0.8, 1.0)
+    job.report(1.0)
+    return image
+
+
+def export_scene(entries, sources, openers, layers, size, scale, background, path, job):
+    """Worker side of TutorCanvas.export_image: decode history payloads into copies, then render_export.
+
+    ``entries`` are the committed (z, payload) pairs; payloads are packed
+    shapes or (session reader, row) pairs, whose rows are read through a
+    reader of this thread's own, opened by ``openers[id(reader)]``.
+    Instances decode from ``sources`` into a registry of the export's own.
+    """
+    readers = {key: open_reader() for key, open_reader in openers.items()}
+    try:
+        registry = {}
+        shapes = []
+        for k, (_, payload) in enumerate(sorted(entries, key=lambda entry: entry[0])):
+            if isinstance(payload, tuple):
+                record = readers[id(payload[0])].full_record(payload[1])
+            else:
+                record = unpack_record(payload)
+            shapes.append(TutorShape.from_record(record, sources, registry))
+            if k % 256 == 255:
+                job.check()
+    finally:
+        for reader in readers.values():
+            reader.close()
+    return render_export(shapes, layers, size, scale, background, path, job)
+
 
 class LaserTrail:
-    def __init__(self, start_pos, color, thickness, duration, smoothness):
+    def __init__(self, start_pos, color, thickness, duration, smoothness, beta=0.03):
         self.points = [start_pos]
         self.timestamps = [time.monotonic()]
         self.color = QColor(color) if isinstance(color, str) else color
         self.thickness = thickness
         self.duration = duration
         self.smoothness = smoothness
+        # Smoothness 1..10 maps to a One Euro minimum cutoff of 10..1 Hz
+        self.smoother = PointSmoother(10.0 / max(1, smoothness), beta)
+        self.smoother(start_pos.x(), start_pos.y(), self.timestamps[0])
     
     def add_point(self, pos):
-        self.points.append(pos)
-        self.timestamps.append(time.monotonic())
+        """Store the sample already smoothed, so drawing does no further work"""
+        now = time.monotonic()
+        x, y = self.smoother(pos.x(), pos.y(), now)
+        self.points.append(QPointF(x, y))
+        self.timestamps.append(now)
     
     def cleanup_old_points(self, current_time):
         while self.timestamps and current_time - self.timestamps[0] > self.duration:
@@ -54,23 +913,6 @@ class LaserTrail:
     
     def is_empty(self):
         return len(self.points) == 0
-    
-    def get_interpolated_points(self, smoothness):
-        if len(self.points) < 2:
-            return self.points
-        
-        interpolated = []
-        for i in range(len(self.points) - 1):
-            p1, p2 = self.points[i], self.points[i + 1]
-            interpolated.append(p1)
-            # Add smooth intermediate points
-            for j in range(1, smoothness):
-                t = j / smoothness
-                x = p1.x() * (1 - t) + p2.x() * t
-                y = p1.y() * (1 - t) + p2.y() * t
-                interpolated.append(QPointF(x, y))
-        interpolated.append(self.points[-1])
-        return interpolated
 
 class HideHandle(QWidget):
     def __init__(self, canvas):
@@ -475,6 +1317,8 @@ class SettingsDialog(QDialog):
         super().accept()
 
 class TutorCanvas(QWidget):
+    autosave_failed = pyqtSignal(object)  # Emitted by the journal's writer thread when journaling stops
+
     def __init__(self):
         super().__init__()
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Window)
@@ -503,10 +1347,17 @@ class TutorCanvas(QWidget):
         # Selection and transformation attributes
         self.active_handle = None  # Which handle is currently being manipulated
         self.drag_start_pos = None  # Starting position for dragging/resizing
-        self.original_shape_points = None  # Original points before transformation
-        self.original_shape_end_pos = None  # Original end_pos before transformation
-        self.original_bounding_rect = None  # Original bounding rect for transformations
-        self.last_pos = None  # Last mouse position for shape movement
+        self.original_bounding_rect = None  # Selection bounding rect when the drag started
+        # Move/scale/rotate of the selection in progress: drawn through the matrix, applied on release
+        self.transform_selection = []
+        self.selection_matrix = None
+        # Marquee (two points) or lasso (outline) being dragged in select mode
+        self.marquee_points = None
+        self.marquee_lasso = False
+        # Handle geometry of the current selection (see selection_handle_layout) and the handle under the pointer
+        self.handle_layout = None
+        self.handle_layout_key = None
+        self.hover_handle = None
         
         # Add missing attributes for original toolbar compatibility
         self.fill_mode_enabled = False
@@ -516,23 +1367,82 @@ class TutorCanvas(QWidget):
         self.record_full_screen = lambda: print("Full screen record")
         self.record_area = lambda: print("Area record")
         self.hide_toolbar_permanent = self.hide_toolbar_permanent_func
-        self.clear_canvas = self.clear_canvas_func
         
         self.laser_color = "#FF1E1E"
         self.laser_thickness = 14
         self.laser_duration = 1.5
         self.laser_smoothness = 5
         self.laser_glow = True
-        
-        self.shapes = []
-        self.undo_stack = []
-        self.redo_stack = []
+        self.stroke_fit_error = 1.5  # Max deviation in pixels when fitting freehand strokes to curves
+        self.full_rate_input = True  # Keep every pen/mouse sample instead of letting Qt compress them
+        self.prediction_horizon_ms = 16  # How far ahead the live stroke is extrapolated (0 = off)
+        # One Euro smoothing of freehand input: cutoff (Hz) at rest and its increase with speed
+        self.smoothing_min_cutoff = 2.0
+        self.smoothing_beta = 0.03
+        # Partial eraser: cut through freehand strokes instead of removing them whole
+        self.partial_eraser = False
+        # Snapping of drawn boxes and moved selections to shape edges/centers and an optional grid
+        self.snap_enabled = False  # Opt-in from Settings, like the other drawing aids
+        self.snap_grid = 0  # Grid spacing in pixels, 0 = no grid
+        self.snap_tolerance = 6
+        self.shape_recognition = False  # Replace pencil strokes that look like boxes/lines/arrows on release
+        self.variable_width = False  # Pencil width follows pen pressure (or, with a mouse, drawing speed)
+        self.eraser_size = 24  # Diameter of the partial eraser in pixels
+        self.autosave_enabled = True  # Journal every change and restore the scene on the next start
+        
+        self.shapes = Scene()
+        # Annotation layers; each visible layer is composited from its own raster
+        self.layers = LayerStack()
+        self.layer_rasters = {}  # layer id -> QPixmap of the widget area
+        self.layer_dirty = {}  # layer id -> scene rect to re-render, or True for all of it
+        self.layer_of_shape = {}  # shape id -> layer id the shape was rendered on
+        self.raster_view = None  # Zoom/size the rasters were rendered for
+        self.raster_selection = set()  # Selected shapes are drawn live, not into rasters
+        self.layers_panel = None
+        self.shape_index = SpatialGrid()
+        self.snap_index = SnapIndex()  # Edges and centerlines of every shape, see snap_position()
+        self.snap_guides = None  # (x, y) guide lines shown while a snap is active; either may be None
+        # The index follows the scene through coalesced change events
+        self.shapes.changes.subscribe(self.on_scene_changed)
+        # Undo/redo and the history scrubber share one delta/keyframe history;
+        # shapes are kept packed there and only decoded when undone/seeked to
+        # Exact packed sources of the shared geometry history refers to, by key (see snapshot_shape)
+        self.geometry_sources = {}
+        self.history = History(self.snapshot_shape, self.restore_snapshot, on_change=self.journal_history_changes)
+        self.shapes.changes.subscribe(self.history.on_scene_changed)
+        self.history_scrubber = None
+        self.session_reader = None  # Mapped session file the scene and its undo base were loaded from
+        # Every committed history step is appended to disk by the journal's writer thread
+        self.autosave = None
+        self.autosave_failed.connect(self.autosave_stopped)
+        # Startup restore streaming the previous scene in, see start_autosave()
+        self.restore_loader = None
+        self.restore_journal = None  # The journal that already holds the shapes still to come
+        self.restore_session = None  # Path of the session file being opened, None for the startup restore
+        self.restore_read = False  # The worker has read the journal and knows the saved ids
+        self.restore_early_ids = set()  # Shapes added before the saved ids were known
+        self.restore_newer = False  # Something not restored may lie above the shapes still to come
+        self.restore_chunk_ids = set()  # Shapes of the chunk being added, during its flush
+        self.shapes.changes.subscribe(self.track_restore_changes)
+        self.layer_overdraw = {}  # layer id -> restored shapes to paint over its raster as they are
+        self.export_job = None  # Image export running on a worker thread, see export_image()
+        self.export_progress = None
         self.current_shape = None
+        self.curve_fitter = None  # Streams samples of the stroke being drawn into Bezier segments
+        # Freehand samples are buffered per event and applied once per frame
+        self.input_pipeline = InputPipeline(self.consume_samples)
+        self.stroke_samples = array('d')  # Every (x, y, pressure, t) sample of the current stroke
+        self.stroke_predictor = StrokePredictor()
+        self.stroke_smoother = PointSmoother()
+        self.speed_pressure = SpeedPressure()  # Stands in for pen pressure on mouse strokes
+        self.stroke_from_tablet = False
         self.selected_shape = None
+        self.clipboard_shape = None  # Shape copied with Ctrl+C, pasted as shared-geometry instances
         self.input_box = None
         self.is_hidden = False
         self.laser_trails = []
         self.current_laser = None
+        self.erase_last_pos = None  # Previous pointer position of an eraser drag
         self.toolbar_last_pos = None
         
         # Zoom functionality
@@ -544,6 +1454,11 @@ class TutorCanvas(QWidget):
         
         self.shortcuts = {"mouse": "M", "select": "V", "pencil": "P", "rect": "R", "diamond": "D", "ellipse": "E", "arrow": "A", "text": "T", "laser": "L", "eraser": "X", "clear": "C"}
         self.load_config()
+        self.stroke_predictor.horizon = self.prediction_horizon_ms / 1000
+        if self.autosave_enabled:
+            self.start_autosave()
+        # Also reached by Esc, which quits right away
+        QApplication.instance().aboutToQuit.connect(self.save_on_quit)
 
         # Add keyboard shortcuts for text formatting
         self.bold_shortcut = QShortcut(QKeySequence("Ctrl+B"), self)
@@ -586,16 +1501,29 @@ class TutorCanvas(QWidget):
                     self.laser_duration = d.get("laser_duration", self.laser_duration)
                     self.laser_smoothness = d.get("laser_smoothness", self.laser_smoothness)
                     self.laser_glow = d.get("laser_glow", self.laser_glow)
+                    self.stroke_fit_error = d.get("stroke_fit_error", self.stroke_fit_error)
+                    self.full_rate_input = d.get("full_rate_input", self.full_rate_input)
+                    self.prediction_horizon_ms = d.get("prediction_horizon_ms", self.prediction_horizon_ms)
+                    self.smoothing_min_cutoff = d.get("smoothing_min_cutoff", self.smoothing_min_cutoff)
+                    self.smoothing_beta = d.get("smoothing_beta", self.smoothing_beta)
+                    self.partial_eraser = d.get("partial_eraser", self.partial_eraser)
+                    self.snap_enabled = d.get("snap_enabled", self.snap_enabled)
+                    self.snap_grid = d.get("snap_grid", self.snap_grid)
+                    self.shape_recognition = d.get("shape_recognition", self.shape_recognition)
+                    self.variable_width = d.get("variable_width", self.variable_width)
+                    self.eraser_size = d.get("eraser_size", self.eraser_size)
+                    self.autosave_enabled = d.get("autosave_enabled", self.autosave_enabled)
                     self.default_thickness = d.get("default_thickness", self.default_thickness)
                     self.enable_fill = d.get("enable_fill", self.enable_fill)
                     self.toolbar_orientation = d.get("toolbar_orientation", self.toolbar_orientation)
                     self.current_theme = d.get("current_theme", self.current_theme)
+                    self.layers.load_config(d.get("layers", {}))
             except:
                 pass
 
     def save_config(self):
         with open(CONFIG_FILE, "w") as f:
-            json.dump({"shortcuts": self.shortcuts, "laser_color": self.laser_color, "laser_thickness": self.laser_thickness, "laser_duration": self.laser_duration, "laser_smoothness": self.laser_smoothness, "laser_glow": self.laser_glow, "default_thickness": self.default_thickness, "enable_fill": self.enable_fill, "toolbar_orientation": self.toolbar_orientation, "current_theme": self.current_theme}, f, indent=2)
+            json.dump({"shortcuts": self.shortcuts, "laser_color": self.laser_color, "laser_thickness": self.laser_thickness, "laser_duration": self.laser_duration, "laser_smoothness": self.laser_smoothness, "laser_glow": self.laser_glow, "stroke_fit_error": self.stroke_fit_error, "full_rate_input": self.full_rate_input, "prediction_horizon_ms": self.prediction_horizon_ms, "smoothing_min_cutoff": self.smoothing_min_cutoff, "smoothing_beta": self.smoothing_beta, "partial_eraser": self.partial_eraser, "snap_enabled": self.snap_enabled, "snap_grid": self.snap_grid, "shape_recognition": self.shape_recognition, "variable_width": self.variable_width, "eraser_size": self.eraser_size, "autosave_enabled": self.autosave_enabled, "default_thickness": self.default_thickness, "enable_fill": self.enable_fill, "toolbar_orientation": self.toolbar_orientation, "current_theme": self.current_theme, "layers": self.layers.to_config()}, f, indent=2)
 
     def hide_toolbar_permanent(self):
         self.is_hidden = True
@@ -638,6 +1566,7 @@ class TutorCanvas(QWidget):
             self.finish_text(self.input_box_pos)
         self.setWindowFlag(Qt.WindowTransparentForInput, mode == "mouse")
         self.setCursor(Qt.ArrowCursor if mode in ["mouse", "select"] else Qt.CrossCursor)
+        self.hover_handle = None
         if mode == "laser":
             self.setCursor(Qt.BlankCursor)
         self.hide()
@@ -686,20 +1615,15 @@ class TutorCanvas(QWidget):
         self.hide_handle.show()
         
     def clear_canvas_func(self):
-        """Clear all canvas drawings"""
-        self.shapes = []
-        self.laser_trails = []
-        self.undo_stack = []
-        self.redo_stack = []
-        if self.input_box:
-            self.input_box.deleteLater()
-            self.input_box = None
-        self.update()
+        """Clear all canvas drawings; the original toolbar's name for clear_canvas"""
+        self.clear_canvas()
     
     def toggle_text_bold(self):
         """Toggle bold formatting for selected text"""
         if self.selected_shape and self.selected_shape.mode == "text":
             self.selected_shape.font_bold = not self.selected_shape.font_bold
+            self.selected_shape.invalidate_bounds()
+            self.shapes.mark_restyled(self.selected_shape)
             self.save_state()
             self.update()
     
@@ -707,6 +1631,8 @@ class TutorCanvas(QWidget):
         """Toggle italic formatting for selected text"""
         if self.selected_shape and self.selected_shape.mode == "text":
             self.selected_shape.font_italic = not self.selected_shape.font_italic
+            self.selected_shape.invalidate_bounds()
+            self.shapes.mark_restyled(self.selected_shape)
             self.save_state()
             self.update()
     
@@ -714,6 +1640,8 @@ class TutorCanvas(QWidget):
         """Increase font size for selected text"""
         if self.selected_shape and self.selected_shape.mode == "text":
             self.selected_shape.font_size = min(100, self.selected_shape.font_size + 2)
+            self.selected_shape.invalidate_bounds()
+            self.shapes.mark_restyled(self.selected_shape)
             self.save_state()
             self.update()
     
@@ -721,6 +1649,8 @@ class TutorCanvas(QWidget):
         """Decrease font size for selected text"""
         if self.selected_shape and self.selected_shape.mode == "text":
             self.selected_shape.font_size = max(8, self.selected_shape.font_size - 2)
+            self.selected_shape.invalidate_bounds()
+            self.shapes.mark_restyled(self.selected_shape)
             self.save_state()
             self.update()
 
@@ -742,6 +1672,7 @@ class TutorCanvas(QWidget):
                 # Create text shape with current font properties
                 shape = TutorShape("text", pos, self.current_color, self.current_thickness, txt,
                                  font_size=22, font_bold=False, font_italic=False)
+                shape.layer = self.layers.active_id
                 self.shapes.append(shape)
                 self.save_state()
             self.input_box.deleteLater()
@@ -749,15 +1680,398 @@ class TutorCanvas(QWidget):
             self.update()
 
     def clear_canvas(self):
-        self.shapes = []
+        """Clear all canvas drawings, their history and the autosave journal"""
+        self.cancel_restore()
+        self.shapes.clear()
+        self.shapes.changes.flush()
+        self.history.reset()
+        self.geometry_sources = {}
+        if self.autosave is not None:
+            self.autosave.clear()
+        self.history_changed()
+        self.selected_shape = None
         self.laser_trails = []
-        self.undo_stack = []
-        self.redo_stack = []
         if self.input_box:
             self.input_box.deleteLater()
             self.input_box = None
         self.update()
 
+    def save_session(self, path):
+        """Write the scene, bottom to top, and the layer setup to a session file"""
+        self.complete_restore()
+        self.shapes.changes.flush()
+        records = [shape.to_record() for shape in self.shapes]
+        geometries = {}
+        for shape in self.shapes:
+            shared_geometries(shape, geometries)
+        sources = {key: geometry.source.to_record() for key, geometry in geometries.items()}
+        reader = self.session_reader
+        if reader is not None and os.path.abspath(reader.path) == os.path.abspath(path):
+            # The undo base still reads the file being replaced
+            reader.detach()
+        write_session(path, records, {"layers": self.layers.to_config()}, sources)
+
+    def load_session(self, path):
+        """Replace the scene with a session file's content, streamed in by a worker.
+
+        The file stays mapped: freehand strokes decode their points when
+        first drawn or edited, and the undo base refers to file rows instead
+        of packing every shape.  Files that are not sessions raise ValueError
+        before the scene is touched; corrupt rows are found by the worker,
+        which leaves them out and reports them when it is done.
+        """
+        reader = SessionReader(path)
+        # Nothing may read the previous file in the background once it is closed
+        self.stop_restore()
+        self.clear_selection()
+        previous = self.session_reader
+        if previous is not None and self.clipboard_shape is not None:
+            # The clipboard may still decode its points from the previous file
+            self.clipboard_shape = self.detached_copy(self.clipboard_shape)
+        self.layers.load_config(reader.meta.get("layers", {}))
+        self.shapes.clear()
+        self.shapes.changes.flush()
+        self.history.reset()
+        self.geometry_sources = {}
+        if self.autosave is not None:
+            # The writer thread packs the loaded scene from its own mapping of the file
+            self.autosave.replace(functools.partial(journal_session_state, path))
+        self.session_reader = reader
+        if previous is not None:
+            previous.close()
+        # Shapes drawn while the file streams in go above it, with ids of their own
+        self.shapes.reserve(reader.max_id() + 1, reader.scene_count)
+        self.restore_read = True
+        self.restore_journal = self.autosave
+        self.restore_session = path
+        self.restore_loader = BackgroundLoader(functools.partial(session_rows, reader))
+        self.restore_loader.start()
+        self.history_changed()
+        self.layers_changed()
+
+    def detached_copy(self, shape):
+        """Copy of a shape that shares nothing with the scene or a session file"""
+        return TutorShape.from_record(unpack_record(self.snapshot_shape(shape)), self.geometry_sources, registry={})
+
+    def start_autosave(self):
+        """Restore the previous run's scene in the background and journal every change.
+
+        The first frame does not wait: a worker reads the journal and decodes
+        the shapes, which update_canvas adds a chunk at a time.  The journal
+        queues changes until the worker has read it, so anything drawn in the
+        meantime is kept, and it goes above the restored shapes.
+        """
+        self.autosave = self.restore_journal = AutosaveJournal(AUTOSAVE_DIR, on_error=self.autosave_failed.emit)
+        self.shapes.reserve(RESTORE_RESERVED, RESTORE_RESERVED)
+        self.restore_loader = BackgroundLoader(functools.partial(autosave_restore, AUTOSAVE_DIR))
+        self.restore_loader.start()
+
+    def poll_restore(self):
+        """Add the restored shapes that arrived, within this frame's budget"""
+        if not self.restore_loader.poll(self.apply_restored, RESTORE_BUDGET):
+            return
+        if self.restore_loader.error is not None:
+            if self.restore_session is not None:
+                QMessageBox.warning(self, "Open Session",
+                                    f"Could not read all of the session:\n{self.restore_loader.error}")
+            else:
+                print(f"Restore stopped: {self.restore_loader.error}")
+            if not self.restore_read and self.autosave is self.restore_journal:
+                # Never read the journal; starting it now could overwrite what it holds
+                self.autosave = None
+        self.restore_loader = None
+        self.restore_journal = None
+        self.restore_session = None
+        self.restore_read = False
+        self.restore_early_ids = set()
+        self.restore_newer = False
+
+    def apply_restored(self, item):
+        """GUI side of the startup restore and of opening a session: add each chunk of shapes.
+
+        The startup restore starts the journal first.
+        """
+        if item[0] == "state":
+            _, generation, state, geometries, top_id, top_z = item
+            self.restore_read = True
+            # Undo may need sources whose last live instance is gone
+            self.geometry_sources.update(geometries)
+            # Later shapes follow the saved ones; ones drawn already keep their reserved range
+            self.shapes.reserve(top_id + 1, top_z + 1)
+            if self.autosave is self.restore_journal:
+                # The writer thread opens the journal; failures come back as autosave_failed
+                self.autosave.start(generation, state, geometries)
+            return
+        if self.restore_loader.cancelled:
+            return
+        if item[0] == "rows":
+            _, rows, records = item
+            reader = self.session_reader
+            chunk = [(row, shape_from_session(reader, row, record), (reader, row))
+                     for row, record in zip(rows, records)]
+        else:
+            chunk = item[1]
+        # Pending user changes are journaled as usual, not with the chunk
+        self.shapes.changes.flush()
+        adopted = {}
+        renumbered = []
+        for z, shape, payload in chunk:
+            if shape.id in self.restore_early_ids or self.shapes.get(shape.id) is not None:
+                # A shape drawn before the saved ids were known took this id
+                shape.id = None
+                self.shapes.add(shape, z)
+                renumbered.append(shape)
+                adopted[shape.id] = (z, self.snapshot_shape(shape))
+            else:
+                self.shapes.add(shape, z)
+                adopted[shape.id] = (z, payload)
+        self.restore_chunk_ids = set(adopted)
+        try:
+            self.shapes.changes.flush()
+        finally:
+            self.restore_chunk_ids = set()
+        if self.autosave is not None:
+            # The journal being restored holds the rest already; a newer one has none of them
+            journaled = self.autosave is self.restore_journal
+            for shape in renumbered if journaled else [shape for _, shape, _ in chunk]:
+                z, payload = adopted[shape.id]
+                self.autosave.put(shape.id, z, self.journal_payload(shape, payload), self.journal_geometries(shape))
+        self.history.adopt(adopted)
+
+    def cancel_restore(self):
+        """Drop the shapes not restored yet, e.g. when the canvas is cleared or replaced"""
+        if self.restore_loader is not None:
+            self.restore_loader.cancel()
+
+    def stop_restore(self):
+        """Cancel a running restore or session load and wait until its worker has stopped"""
+        if self.restore_loader is not None:
+            self.restore_loader.cancel()
+            self.complete_restore()
+
+    def complete_restore(self):
+        """Add everything a running restore or session load has still to deliver, e.g. before saving"""
+        if self.restore_loader is not None:
+            self.restore_loader.wait(self.apply_restored)
+            self.poll_restore()
+
+    def track_restore_changes(self, events):
+        """Note changes that matter to a running restore; chunk flushes themselves are skipped"""
+        if self.restore_loader is None or self.restore_chunk_ids:
+            return
+        for event in events:
+            if event.kind not in [scene_events.CLEARED, scene_events.REMOVED]:
+                self.restore_newer = True
+                if not self.restore_read and event.kind == scene_events.ADDED:
+                    self.restore_early_ids.update(event.shape_ids)
+
+    def restored_on_top(self, shape, rect):
+        """True if nothing but shapes of its own restore chunk lies above shape in rect"""
+        if not self.restore_newer:
+            return True
+        for other in self.shape_index.query_rect(rect):
+            if other is shape:
+                return True
+            if other.id not in self.restore_chunk_ids:
+                return False
+        return True
+
+    def set_autosave(self, enabled):
+        """Turn journaling on or off; turning it on saves the current scene as the new checkpoint"""
+        self.autosave_enabled = enabled
+        if not enabled:
+            self.stop_autosave()
+            return
+        if self.autosave is not None:
+            return
+        # Committed, the scene is history's current state, whose payloads the journal reuses
+        self.save_state()
+        state = {}
+        geometries = {}
+        for shape_id, (z, payload) in self.history.state_at(self.history.position).items():
+            shape = self.shapes.get(shape_id)
+            state[shape_id] = (z, self.journal_payload(shape, payload))
+            geometries.update(self.journal_geometries(shape) or {})
+        journal = AutosaveJournal(AUTOSAVE_DIR, on_error=self.autosave_failed.emit)
+        # The writer thread continues the saved generation, then checkpoints this scene
+        journal.start()
+        journal.replace(lambda: (state, geometries))
+        self.autosave = journal
+
+    def autosave_stopped(self, error):
+        """The journal's writer failed: stop journaling and tell the user"""
+        if self.autosave is not None and self.autosave.error is error:
+            self.autosave.close()
+            self.autosave = None
+        QMessageBox.warning(self, "Autosave", f"Autosave stopped; changes are no longer saved:\n{error}")
+
+    def save_on_quit(self):
+        """aboutToQuit (also Esc): get everything drawn into the journal, even mid-restore"""
+        # Shapes still to come are in the journal already; it only has to be started
+        self.stop_restore()
+        self.stop_autosave()
+
+    def stop_autosave(self):
+        """Hand the last changes to the journal and wait for them to reach the disk"""
+        if self.autosave is None:
+            return
+        # The journal follows history, so pending edits become a step first
+        self.save_state()
+        self.autosave.close()
+        self.autosave = None
+
+    def journal_history_changes(self, changes):
+        """History's on_change: append the recorded shape states to the autosave journal.
+
+        Packed payloads go to the journal as they are; nothing is packed
+        twice on the GUI thread.
+        """
+        journal = self.autosave
+        if journal is None:
+            return
+        for shape_id, target in changes.items():
+            if target is None:
+                journal.delete(shape_id)
+            else:
+                z, payload = target
+                shape = self.shapes.get(shape_id)
+                journal.put(shape_id, z, self.journal_payload(shape, payload), self.journal_geometries(shape))
+
+    def journal_payload(self, shape, payload):
+        """Packed shape for the journal from a history payload"""
+        if isinstance(payload, tuple):
+            # A row of the loaded session file, which the journal cannot refer to
+            return self.snapshot_shape(shape)
+        return payload
+
+    def journal_geometries(self, shape):
+        """Packed sources (key -> blob) of the shared geometry a shape references, for the journal"""
+        if shape.mode not in ["instance", "group"]:
+            return None
+        return {key: self.geometry_source(geometry) for key, geometry in shared_geometries(shape).items()}
+
+    def geometry_source(self, geometry):
+        """Packed source of shared geometry, kept for as long as history may restore its instances"""
+        blob = self.geometry_sources.get(geometry.key)
+        if blob is None:
+            blob = self.geometry_sources[geometry.key] = geometry.packed()
+        return blob
+
+    def snapshot_shape(self, shape):
+        """History payload of a shape, packed exactly: undo must put shapes back where they were.
+
+        Instances only reference their geometry; its source is packed once
+        into geometry_sources, not into every step that moves an instance.
+        """
+        if shape.mode in ["instance", "group"]:
+            for geometry in shared_geometries(shape).values():
+                self.geometry_source(geometry)
+        return pack_record(shape.to_record(), exact=True)
+
+    def restore_snapshot(self, payload):
+        """Live shape for a history payload: packed bytes or a (reader, row) file reference"""
+        if isinstance(payload, tuple):
+            return shape_from_session(*payload)
+        return TutorShape.from_record(unpack_record(payload), self.geometry_sources)
+
+    def save_session_dialog(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Session", "", "TutorDraw Session (*.tds)")
+        if not path:
+            return
+        if not path.endswith(".tds"):
+            path += ".tds"
+        try:
+            self.save_session(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Save Session", f"Could not save the session:\n{e}")
+
+    def open_session_dialog(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Session", "", "TutorDraw Session (*.tds)")
+        if not path:
+            return
+        try:
+            self.load_session(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Open Session", f"Could not open the session:\n{e}")
+
+    def export_image(self, path=None, scale=1.0, background=None):
+        """Render the scene into a QImage of the canvas area at scale times its size, on a worker thread.
+
+        ``background`` (e.g. a screen grab) is stretched underneath the
+        annotations; with a path the image is also encoded there as PNG.
+        Returns the running ExportJob, whose result is the QImage.  The
+        scene exported is history's committed state, as is: a gesture in
+        progress is not committed for it, and shapes a restore has still to
+        deliver are left out.  Only its payloads are taken here; the worker
+        decodes them into copies that share nothing with the canvas, the
+        session file or the geometry registry (see export_scene).
+        """
+        entries = list(self.history.state_at(self.history.position).values())
+        openers = {}
+        for _, payload in entries:
+            if isinstance(payload, tuple) and id(payload[0]) not in openers:
+                openers[id(payload[0])] = payload[0].opener()
+        layers = [(layer.id, layer.opacity if layer.visible else 0.0) for layer in self.layers]
+        job = ExportJob(functools.partial(export_scene, entries, dict(self.geometry_sources), openers, layers,
+                                          (self.width(), self.height()), scale, background, path))
+        job.start()
+        return job
+
+    def export_image_dialog(self):
+        """Ask for a file, scale and background, then export while the canvas stays usable"""
+        path, _ = QFileDialog.getSaveFileName(self, "Export Image", "", "PNG Image (*.png)")
+        if not path:
+            return
+        if not path.lower().endswith(".png"):
+            path += ".png"
+        choice, ok = QInputDialog.getItem(self, "Export Image", "Scale:", EXPORT_SCALES, 0, False)
+        if not ok:
+            return
+        scale = float(choice.rstrip("×"))
+        reply = QMessageBox.question(self, "Export Image", "Include the screen behind the annotations?",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            self.start_export(path, scale)
+            return
+        # The overlay has to be out of the way of the grab; it comes back right after
+        toolbar_visible = self.toolbar.isVisible()
+        self.toolbar.hide()
+        self.hide()
+        QTimer.singleShot(200, lambda: self.grab_and_export(path, scale, toolbar_visible))
+
+    def grab_and_export(self, path, scale, toolbar_visible):
+        background = QApplication.primaryScreen().grabWindow(0).toImage()
+        self.show()
+        if toolbar_visible:
+            self.toolbar.show()
+            self.toolbar.raise_()
+        self.start_export(path, scale, background)
+
+    def start_export(self, path, scale, background=None):
+        """Run an export to path with a non-modal progress dialog; a running one is cancelled"""
+        if self.export_job is not None:
+            self.export_job.cancel()
+            self.export_progress.close()
+        self.export_job = self.export_image(path, scale, background)
+        self.export_progress = QProgressDialog("Exporting image…", "Cancel", 0, 100, self)
+        self.export_progress.setWindowTitle("Export Image")
+        self.export_progress.setWindowModality(Qt.NonModal)
+        self.export_progress.setMinimumDuration(300)
+        self.export_progress.canceled.connect(self.export_job.cancel)
+
+    def poll_export(self):
+        """Follow the running export from the frame timer"""
+        job = self.export_job
+        if not job.done:
+            self.export_progress.setValue(int(job.progress * 100))
+            return
+        self.export_job = None
+        self.export_progress.close()
+        self.export_progress.deleteLater()
+        self.export_progress = None
+        if job.error is not None:
+            QMessageBox.warning(self, "Export Image", f"Could not export the image:\n{job.error}")
+
     def confirm_clear(self):
         reply = QMessageBox.question(self, 'Clear Canvas', 'Clear all drawings?', QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
@@ -777,36 +2091,106 @@ class TutorCanvas(QWidget):
                 self.toolbar.update_tooltips()
 
     def save_state(self):
-        self.undo_stack.append([TutorShape(s.mode, s.points[0], s.color.name(), s.thickness, s.text, 
-                                         s.fill_color.name() if s.fill_color else None,
-                                         s.font_size if hasattr(s, 'font_size') else 22,
-                                         s.font_bold if hasattr(s, 'font_bold') else False,
-                                         s.font_italic if hasattr(s, 'font_italic') else False) for s in self.shapes])
-        self.redo_stack = []
-        if len(self.undo_stack) > 50:
-            self.undo_stack.pop(0)
+        """Record the scene changes made since the last call as one history step"""
+        self.shapes.changes.flush()
+        if self.history.commit(self.shapes):
+            self.history_changed()
 
     def undo(self):
-        if self.undo_stack:
-            self.redo_stack.append([TutorShape(s.mode, s.points[0], s.color.name(), s.thickness, s.text, 
-                                             s.fill_color.name() if s.fill_color else None,
-                                             s.font_size if hasattr(s, 'font_size') else 22,
-                                             s.font_bold if hasattr(s, 'font_bold') else False,
-                                             s.font_italic if hasattr(s, 'font_italic') else False) for s in self.shapes])
-            self.shapes = self.undo_stack.pop()
-            self.update()
+        self.seek_history(self.history.position - 1)
 
     def redo(self):
-        if self.redo_stack:
-            self.undo_stack.append([TutorShape(s.mode, s.points[0], s.color.name(), s.thickness, s.text, 
-                                             s.fill_color.name() if s.fill_color else None,
-                                             s.font_size if hasattr(s, 'font_size') else 22,
-                                             s.font_bold if hasattr(s, 'font_bold') else False,
-                                             s.font_italic if hasattr(s, 'font_italic') else False) for s in self.shapes])
-            self.shapes = self.redo_stack.pop()
-            self.update()
+        self.seek_history(self.history.position + 1)
+
+    def seek_history(self, position):
+        """Jump to any position of the editing history (0 is the empty/base scene)"""
+        # Pending edits become a step of their own before travelling
+        self.save_state()
+        self.clear_selection()
+        self.history.seek(self.shapes, position)
+        self.history_changed()
+        self.update()
+
+    def history_length(self):
+        return len(self.history)
+
+    def history_changed(self):
+        """Keep the scrubber (if shown) in sync with the history"""
+        if self.history_scrubber:
+            self.history_scrubber.sync()
+
+    def toggle_history_scrubber(self):
+        """Show or hide the history slider"""
+        if self.history_scrubber and self.history_scrubber.isVisible():
+            self.history_scrubber.hide()
+            return
+        if not self.history_scrubber:
+            from src.history_scrubber import HistoryScrubber
+            self.history_scrubber = HistoryScrubber(self)
+        self.history_scrubber.sync()
+        self.history_scrubber.show()
+        self.history_scrubber.raise_()
+
+    def layers_changed(self, sync_panel=True):
+        """Persist the layer setup and refresh the layers panel"""
+        self.save_config()
+        if sync_panel and self.layers_panel:
+            self.layers_panel.sync()
+        self.update()
+
+    def add_layer(self):
+        self.layers.add()
+        self.layers_changed()
+
+    def delete_layer(self, layer_id):
+        """Remove a layer together with its shapes (the shapes are one undo step)"""
+        if len(self.layers) == 1:
+            return
+        doomed = [s.id for s in self.shapes if self.layers.resolve(s.layer).id == layer_id]
+        self.shapes.delete_many(doomed)
+        self.save_state()
+        self.layers.remove(layer_id)
+        self.layer_rasters.pop(layer_id, None)
+        self.layer_dirty.pop(layer_id, None)
+        self.layers_changed()
+
+    def set_active_layer(self, layer_id):
+        """New shapes are drawn on the active layer"""
+        self.layers.active_id = layer_id
+        self.layers.active.visible = True
+        self.layers_changed()
+
+    def set_layer_visible(self, layer_id, visible):
+        # Only the composite changes, the layer raster is kept as is
+        self.layers.get(layer_id).visible = visible
+        self.layers_changed(sync_panel=False)
+
+    def set_layer_opacity(self, layer_id, opacity):
+        # Called while the slider is dragged; the panel saves the config on release
+        self.layers.get(layer_id).opacity = opacity
+        self.update()
+
+    def move_layer(self, layer_id, steps):
+        self.layers.move(layer_id, steps)
+        self.layers_changed()
+
+    def toggle_layers_panel(self):
+        """Show or hide the layers panel"""
+        if self.layers_panel and self.layers_panel.isVisible():
+            self.layers_panel.hide()
+            return
+        if not self.layers_panel:
+            from src.layers_panel import LayersPanel
+            self.layers_panel = LayersPanel(self)
+        self.layers_panel.sync()
+        self.layers_panel.show()
+        self.layers_panel.raise_()
 
     def update_canvas(self):
+        if self.restore_loader is not None:
+            self.poll_restore()
+        if self.export_job is not None:
+            self.poll_export()
         if self.is_hidden and self.toolbar.isVisible() and not self.toolbar.underMouse() and not self.hide_handle.underMouse():
             self.toolbar.hide()
         
@@ -827,80 +2211,52 @@ class TutorCanvas(QWidget):
         painter.setRenderHint(QPainter.Antialiasing)
         painter.fillRect(self.rect(), QColor(0, 0, 0, 1))
         
-        # Apply zoom transformation if active
-        if self.is_zoom_active and self.zoom_factor > 1.0:
-            painter.translate(self.zoom_center)
-            painter.scale(self.zoom_factor, self.zoom_factor)
-            painter.translate(-self.zoom_center)
-        
-        for s in self.shapes + ([self.current_shape] if self.current_shape else []):
-            if not s:
+        # Apply the pointer samples gathered since the last frame, then deliver
+        # this frame's coalesced scene changes before using the index
+        self.input_pipeline.flush()
+        self.shapes.changes.flush()
+        selected = [s for s in self.shapes if s.is_selected]
+        self.sync_layer_rasters(selected)
+        view = self.visible_scene_bounds()
+        
+        # Composite the layers; selected shapes and the shape being drawn are
+        # drawn live on top of their layer so the rasters stay valid meanwhile
+        live_shapes = {}
+        for s in selected:
+            live_shapes.setdefault(self.layers.resolve(s.layer).id, []).append(s)
+        if self.current_shape:
+            live_shapes.setdefault(self.layers.active.id, []).append(self.current_shape)
+        for layer in self.layers:
+            if not layer.visible:
                 continue
-            w = self.current_thickness if not hasattr(s, 'thickness') else s.thickness
-            w = w + 2 if s.is_selected else w
-            painter.setPen(QPen(s.color, w, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-            
-            if s.fill_color:
-                painter.setBrush(QBrush(s.fill_color))
-            else:
-                painter.setBrush(Qt.NoBrush)
-            
-            if s.mode == "pencil":
-                path = QPainterPath()
-                if len(s.points) > 1:
-                    path.moveTo(s.points[0])
-                    for i in range(1, len(s.points)):
-                        path.quadTo(s.points[i-1], (s.points[i-1] + s.points[i]) / 2)
-                    path.lineTo(s.points[-1])
-                    painter.drawPath(path)
-            elif s.mode == "highlighter":
-                # Text-aware highlighter
-                if hasattr(s, 'text_bounds') and s.text_bounds:
-                    # Highlight existing text - align with text bounds
-                    highlight_color = QColor(255, 255, 0, 128)  # Yellow with 50% transparency
-                    painter.setPen(QPen(highlight_color, max(8, w * 2), Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-                    painter.setBrush(QBrush(highlight_color))
-                    # Draw highlight rectangle that matches text bounds
-                    painter.drawRect(s.text_bounds)
-                else:
-                    # Free-form highlighter drawing
-                    highlight_color = QColor(255, 255, 0, 128)  # Yellow with 50% transparency
-                    painter.setPen(QPen(highlight_color, max(8, w * 2), Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-                    path = QPainterPath()
-                    if len(s.points) > 1:
-                        path.moveTo(s.points[0])
-                        for i in range(1, len(s.points)):
-                            path.quadTo(s.points[i-1], (s.points[i-1] + s.points[i]) / 2)
-                        path.lineTo(s.points[-1])
-                        painter.drawPath(path)
-            elif s.mode == "text":
-                # Use the shape's font properties
-                font_weight = QFont.Bold if s.font_bold else QFont.Normal
-                font_style = QFont.StyleItalic if s.font_italic else QFont.StyleNormal
-                font = QFont("Segoe Print", s.font_size, font_weight)
-                font.setStyle(font_style)
-                painter.setFont(font)
-                painter.drawText(s.points[0], s.text)
-            elif s.mode == "rect":
-                painter.drawRect(QRectF(s.points[0], s.end_pos).normalized())
-            elif s.mode == "ellipse":
-                painter.drawEllipse(QRectF(s.points[0], s.end_pos).normalized())
-            elif s.mode == "circle":
-                radius = math.hypot(s.end_pos.x() - s.points[0].x(), s.end_pos.y() - s.points[0].y())
-                painter.drawEllipse(s.points[0], radius, radius)
-            elif s.mode == "diamond":
-                r = QRectF(s.points[0], s.end_pos).normalized()
-                painter.drawPolygon([QPointF(r.center().x(), r.top()), QPointF(r.right(), r.center().y()), 
-                                   QPointF(r.center().x(), r.bottom()), QPointF(r.left(), r.center().y())])
+            painter.setOpacity(layer.opacity)
+            painter.drawPixmap(0, 0, self.layer_raster(layer, view))
+            if layer.id in live_shapes:
+                painter.save()
+                self.apply_view_transform(painter)
+                for s in live_shapes[layer.id]:
+                    if self.selection_matrix is not None and s.is_selected:
+                        # Dragged selection: drawn through the matrix, geometry is untouched until release
+                        painter.save()
+                        painter.setTransform(QTransform(*self.shape_transform(s, self.selection_matrix).coefficients()), True)
+                        self.draw_shape(painter, s)
+                        painter.restore()
+                    else:
+                        self.draw_shape(painter, s, view)
+                painter.restore()
+        painter.setOpacity(1.0)
+        
+        # Apply zoom transformation if active
+        self.apply_view_transform(painter)
 
         # Enhanced Smooth Laser Rendering
         now = time.monotonic()
         for trail in self.laser_trails:
-            interpolated = trail.get_interpolated_points(self.laser_smoothness)
-            if len(interpolated) >= 2:
-                for i in range(len(interpolated) - 1):
-                    age1 = now - trail.timestamps[min(i, len(trail.timestamps) - 1)]
-                    age2 = now - trail.timestamps[min(i + 1, len(trail.timestamps) - 1)]
+            points = trail.points
+            if len(points) >= 2:
+                for i in range(len(points) - 1):
+                    age1 = now - trail.timestamps[i]
+                    age2 = now - trail.timestamps[i + 1]
                     alpha1 = max(0, 255 * (1 - age1 / self.laser_duration))
                     alpha2 = max(0, 255 * (1 - age2 / self.laser_duration))
                     c1 = QColor(trail.color)
@@ -915,90 +2271,303 @@ class TutorCanvas(QWidget):
                             glow_c = QColor(trail.color)
                             glow_c.setAlpha(int(glow_alpha))
                             painter.setPen(QPen(glow_c, trail.thickness + glow_size * 2, Qt.SolidLine, Qt.RoundCap))
-                            painter.drawLine(interpolated[i], interpolated[i + 1])
+                            painter.drawLine(points[i], points[i + 1])
                     
                     # Draw main laser line
-                    grad = QRadialGradient(interpolated[i], trail.thickness / 2)
+                    grad = QRadialGradient(points[i], trail.thickness / 2)
                     grad.setColorAt(0, c1)
                     grad.setColorAt(1, c2)
                     painter.setPen(QPen(QBrush(grad), trail.thickness, Qt.SolidLine, Qt.RoundCap))
-                    painter.drawLine(interpolated[i], interpolated[i + 1])
-
-        # Draw selection handles for selected shapes
-        for s in self.shapes:
-            if s.is_selected:
-                # Calculate the bounding rectangle of the shape
-                bounding_rect = self.calculate_shape_bounding_rect(s)
-                if bounding_rect:
-                    # Draw selection box
-                    painter.setPen(QPen(QColor(0, 120, 215), 2, Qt.DashLine))  # Blue dashed outline
-                    painter.setBrush(Qt.NoBrush)
-                    painter.drawRect(bounding_rect)
-                    
-                    # Draw resize handles at corners and edges
-                    handle_size = 8  # Visual size of handles
-                    handle_color = QColor(0, 120, 215)
-                    painter.setPen(QPen(handle_color, 1))
-                    painter.setBrush(handle_color)
-                    
-                    # Corner handles
-                    corners = [
-                        (bounding_rect.topLeft(), 'top-left'),
-                        (bounding_rect.topRight(), 'top-right'),
-                        (bounding_rect.bottomLeft(), 'bottom-left'),
-                        (bounding_rect.bottomRight(), 'bottom-right'),
-                        # Edge handles
-                        (QPointF(bounding_rect.center().x(), bounding_rect.top()), 'top-center'),
-                        (QPointF(bounding_rect.center().x(), bounding_rect.bottom()), 'bottom-center'),
-                        (QPointF(bounding_rect.left(), bounding_rect.center().y()), 'left-center'),
-                        (QPointF(bounding_rect.right(), bounding_rect.center().y()), 'right-center'),
-                    ]
-                    
-                    for pos, handle_type in corners:
-                        # Adjust position to center the handle
-                        handle_rect = QRectF(pos.x() - handle_size/2, pos.y() - handle_size/2, handle_size, handle_size)
-                        painter.drawRect(handle_rect)
-                    
-                    # Draw rotation handle (a circle above the shape)
-                    rotation_handle_pos = QPointF(bounding_rect.center().x(), bounding_rect.top() - 25)
-                    painter.setBrush(QColor(255, 0, 0))  # Red color for rotation handle
-                    rotation_handle_rect = QRectF(rotation_handle_pos.x() - handle_size/2, rotation_handle_pos.y() - handle_size/2, handle_size, handle_size)
-                    painter.drawEllipse(rotation_handle_rect)
+                    painter.drawLine(points[i], points[i + 1])
+
+        self.draw_predicted_ink(painter)
+
+        if self.mode == "eraser" and self.partial_eraser and self.erase_last_pos is not None:
+            painter.setPen(QPen(QColor(120, 120, 120, 200), 1, Qt.DashLine))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawEllipse(self.erase_last_pos, self.eraser_size / 2, self.eraser_size / 2)
+
+        # Draw selection boxes for selected shapes
+        selected = [s for s in selected if self.is_shape_visible(s)]
+        painter.setPen(QPen(QColor(0, 120, 215), 2, Qt.DashLine))  # Blue dashed outline
+        painter.setBrush(Qt.NoBrush)
+        for s in selected:
+            bounding_rect = self.calculate_shape_bounding_rect(s)
+            if self.selection_matrix is not None:
+                painter.drawPolygon(QTransform(*self.shape_transform(s, self.selection_matrix).coefficients()).map(QPolygonF(bounding_rect)))
+            else:
+                painter.drawRect(bounding_rect)
+        if not selected:
+            self.handle_layout = None
+        elif self.selection_matrix is None:
+            # Handles act on the whole selection; groups and instances are only moved as a whole
+            layout = self.selection_handle_layout(selected)
+            if len(selected) > 1:
+                x0, y0, x1, y1 = layout.bounds
+                painter.drawRect(QRectF(x0, y0, x1 - x0, y1 - y0))
+            self.draw_selection_handles(painter, layout)
+
+        if self.snap_guides is not None:
+            x0, y0, x1, y1 = view
+            guide_x, guide_y = self.snap_guides
+            painter.setPen(QPen(QColor(255, 0, 160), 1, Qt.DashLine))
+            if guide_x is not None:
+                painter.drawLine(QPointF(guide_x, y0), QPointF(guide_x, y1))
+            if guide_y is not None:
+                painter.drawLine(QPointF(x0, guide_y), QPointF(x1, guide_y))
+
+        if self.marquee_points is not None:
+            painter.setPen(QPen(QColor(0, 120, 215), 1, Qt.DashLine))
+            painter.setBrush(QColor(0, 120, 215, 30))
+            if self.marquee_lasso:
+                painter.drawPolygon(QPolygonF(self.marquee_points))
+            else:
+                painter.drawRect(QRectF(self.marquee_points[0], self.marquee_points[1]).normalized())
+
+    def draw_selection_handles(self, painter, layout):
+        """Resize handles at the corners and edges of the selection box, rotation handle above it"""
+        handle_size = 8  # Visual size of handles
+        handle_color = QColor(0, 120, 215)
+        painter.setPen(QPen(handle_color, 1))
+        for name, x, y in layout.handles:
+            handle_rect = QRectF(x - handle_size/2, y - handle_size/2, handle_size, handle_size)
+            if name == 'rotation':
+                painter.setBrush(QColor(255, 0, 0))  # Red color for rotation handle
+                painter.drawEllipse(handle_rect)
+            else:
+                painter.setBrush(handle_color)
+                painter.drawRect(handle_rect)
+
+    def draw_predicted_ink(self, painter):
+        """Extend the live stroke or laser to the predicted pen tip; drawn only, never stored"""
+        if self.current_shape and self.current_shape.mode in ["pencil", "highlighter"]:
+            s = self.current_shape
+            if s.mode == "highlighter":
+                pen = QPen(QColor(255, 255, 0, 128), max(8, s.thickness * 2), Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+            elif s.pressures is not None:
+                width = 2 * pressure_radius(s.thickness, s.pressures[-1])
+                pen = QPen(s.color, width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+            else:
+                pen = QPen(s.color, s.thickness, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+            start = s.points[-1]
+        elif self.current_laser and self.current_laser.points:
+            pen = QPen(QColor(self.current_laser.color), self.current_laser.thickness, Qt.SolidLine, Qt.RoundCap)
+            start = self.current_laser.points[-1]
+        else:
+            return
+        tip = self.stroke_predictor.predict(time.monotonic())
+        if tip is not None:
+            painter.setPen(pen)
+            painter.drawLine(start, QPointF(*tip))
+
+    def apply_view_transform(self, painter):
+        """Map scene coordinates to widget coordinates (zoom)"""
+        if self.is_zoom_active and self.zoom_factor > 1.0:
+            painter.translate(self.zoom_center)
+            painter.scale(self.zoom_factor, self.zoom_factor)
+            painter.translate(-self.zoom_center)
+
+    def invalidate_layer(self, layer_id, rect=None):
+        """Schedule part (rect in scene coordinates) or all of a layer raster for re-rendering"""
+        key = self.layers.resolve(layer_id).id
+        current = self.layer_dirty.get(key)
+        if rect is None or current is True:
+            self.layer_dirty[key] = True
+        else:
+            self.layer_dirty[key] = scene_events.union_rect(current, rect)
+
+    def sync_layer_rasters(self, selected):
+        """Invalidate rasters for zoom/size changes and for shapes whose selection changed"""
+        dpr = self.devicePixelRatioF()
+        zoomed = self.is_zoom_active and self.zoom_factor > 1.0
+        view_key = (self.width(), self.height(), dpr, zoomed,
+                    self.zoom_factor if zoomed else 1.0,
+                    (self.zoom_center.x(), self.zoom_center.y()) if zoomed else None)
+        if view_key != self.raster_view:
+            self.raster_view = view_key
+            self.layer_rasters.clear()
+            self.layer_dirty.clear()
+        ids = {s.id for s in selected}
+        for shape_id in ids ^ self.raster_selection:
+            shape = self.shapes.get(shape_id)
+            if shape is not None:
+                self.invalidate_layer(shape.layer, self.shape_index.bounds_of(shape_id))
+        self.raster_selection = ids
+
+    def layer_raster(self, layer, view):
+        """Cached raster of a layer, re-rendering only its dirty area"""
+        raster = self.layer_rasters.get(layer.id)
+        dirty = self.layer_dirty.pop(layer.id, None)
+        overdraw = [s for s in self.layer_overdraw.pop(layer.id, ()) if s in self.shapes]
+        if raster is None:
+            dpr = self.devicePixelRatioF()
+            raster = QPixmap(math.ceil(self.width() * dpr), math.ceil(self.height() * dpr))
+            raster.setDevicePixelRatio(dpr)
+            raster.fill(Qt.transparent)
+            self.layer_rasters[layer.id] = raster
+            dirty = True
+        if dirty is None and overdraw:
+            # Nothing above them: drawn onto the raster as it is, bottom to top
+            raster_painter = QPainter(raster)
+            raster_painter.setRenderHint(QPainter.Antialiasing)
+            self.apply_view_transform(raster_painter)
+            for s in overdraw:
+                if not s.is_selected and self.layers.resolve(s.layer) is layer:
+                    self.draw_shape(raster_painter, s, view)
+            raster_painter.end()
+            return raster
+        if dirty is None:
+            return raster
+        if dirty is not True:
+            # Shapes waiting to be painted over are re-rendered with the dirty area instead
+            for s in overdraw:
+                dirty = scene_events.union_rect(dirty, self.shape_index.bounds_of(s.id))
+        x0, y0, x1, y1 = view if dirty is True else dirty
+        # Whole pixels plus a margin so antialiased edges are repainted too
+        x0, y0, x1, y1 = math.floor(x0) - 2, math.floor(y0) - 2, math.ceil(x1) + 2, math.ceil(y1) + 2
+        area = QRectF(x0, y0, x1 - x0, y1 - y0)
+        raster_painter = QPainter(raster)
+        raster_painter.setRenderHint(QPainter.Antialiasing)
+        self.apply_view_transform(raster_painter)
+        raster_painter.setClipRect(area)
+        raster_painter.setCompositionMode(QPainter.CompositionMode_Clear)
+        raster_painter.fillRect(area, Qt.transparent)
+        raster_painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        for s in reversed(self.shape_index.query_rect((x0, y0, x1, y1))):
+            if not s.is_selected and self.layers.resolve(s.layer) is layer:
+                self.draw_shape(raster_painter, s, view)
+        raster_painter.end()
+        return raster
+
+    def draw_shape(self, painter, s, view=None, tint=None):
+        """Draw one scene shape; view is the visible area used to cull group children,
+        tint replaces the shape's own colors (used by tinted instances)"""
+        if s.mode == "group":
+            self.draw_group(painter, s, view, tint)
+            return
+        if s.mode == "instance":
+            self.draw_instance(painter, s, view)
+            return
+        draw_primitive(painter, s, tint)
+
+    def draw_group(self, painter, group, view=None, tint=None):
+        """Draw a group from its cached raster, or only its visible children when zoomed"""
+        painter.save()
+        painter.translate(group.offset)
+        x0, y0, x1, y1 = group.local_bounds()
+        # Room for stroke widths (and the selection bump) outside the geometry bounds
+        pad = max(4, group.thickness) + 2
+        x0, y0, x1, y1 = x0 - pad, y0 - pad, x1 + pad, y1 + pad
+        zoomed = self.is_zoom_active and self.zoom_factor > 1.0
+        cached = tint is None and not zoomed
+        dpr = self.devicePixelRatioF() if cached else 1.0
+        if cached and (x1 - x0) * (y1 - y0) * dpr * dpr <= group.MAX_RASTER_PIXELS:
+            if group.raster is None:
+                raster = QPixmap(math.ceil((x1 - x0) * dpr), math.ceil((y1 - y0) * dpr))
+                raster.setDevicePixelRatio(dpr)
+                raster.fill(Qt.transparent)
+                raster_painter = QPainter(raster)
+                raster_painter.setRenderHint(QPainter.Antialiasing)
+                raster_painter.translate(-x0, -y0)
+                for child in group.children:
+                    self.draw_shape(raster_painter, child)
+                raster_painter.end()
+                group.raster = raster
+            painter.drawPixmap(QPointF(x0, y0), group.raster)
+        else:
+            children = group.children
+            if view is not None:
+                dx, dy = group.offset.x(), group.offset.y()
+                view = (view[0] - dx, view[1] - dy, view[2] - dx, view[3] - dy)
+                children = reversed(self.group_bvh(group).query_rect(view))
+            for child in children:
+                self.draw_shape(painter, child, view, tint)
+        painter.restore()
+
+    def draw_instance(self, painter, instance, view=None):
+        """Draw an instance by blitting its geometry's shared raster for the tint in use"""
+        painter.save()
+        painter.translate(instance.offset)
+        geometry = instance.geometry
+        zoomed = self.is_zoom_active and self.zoom_factor > 1.0
+        raster = None if zoomed else self.geometry_raster(geometry, instance.tint)
+        if raster is not None:
+            painter.drawPixmap(raster[0], raster[1])
+        else:
+            if view is not None:
+                dx, dy = instance.offset.x(), instance.offset.y()
+                view = (view[0] - dx, view[1] - dy, view[2] - dx, view[3] - dy)
+            self.draw_shape(painter, geometry.source, view, instance.tint)
+        painter.restore()
+
+    def geometry_raster(self, geometry, tint):
+        """Cached (origin, pixmap) of shared geometry, or None when too large to cache"""
+        key = tint.rgba() if tint else None
+        if key in geometry.rasters:
+            return geometry.rasters[key]
+        x0, y0, x1, y1 = geometry.bounds()
+        pad = max(4, geometry.source.thickness) + 2
+        x0, y0, x1, y1 = x0 - pad, y0 - pad, x1 + pad, y1 + pad
+        dpr = self.devicePixelRatioF()
+        if (x1 - x0) * (y1 - y0) * dpr * dpr > ShapeGroup.MAX_RASTER_PIXELS:
+            geometry.rasters[key] = None
+            return None
+        pixmap = QPixmap(math.ceil((x1 - x0) * dpr), math.ceil((y1 - y0) * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.transparent)
+        raster_painter = QPainter(pixmap)
+        raster_painter.setRenderHint(QPainter.Antialiasing)
+        raster_painter.translate(-x0, -y0)
+        self.draw_shape(raster_painter, geometry.source, None, tint)
+        raster_painter.end()
+        geometry.rasters[key] = (QPointF(x0, y0), pixmap)
+        return geometry.rasters[key]
 
     def get_handle_at_position(self, shape, pos):
         """Check if the position is on any of the selection handles"""
-        bounding_rect = self.calculate_shape_bounding_rect(shape)
-        if not bounding_rect:
+        return self.get_selection_handle([shape], pos)
+
+    def selected_shapes(self):
+        """Selected shapes, bottom to top"""
+        return [s for s in self.shapes if s.is_selected]
+
+    def clear_selection(self):
+        for s in self.selected_shapes():
+            s.is_selected = False
+        self.selected_shape = None
+        self.handle_layout = None
+
+    def selection_rect(self, shapes):
+        """Bounding rectangle around all given shapes"""
+        rect = None
+        for s in shapes:
+            r = self.calculate_shape_bounding_rect(s)
+            rect = r if rect is None else rect.united(r)
+        return rect
+
+    def selection_handle_layout(self, shapes):
+        """Handle geometry of the given selection, rebuilt only when it or the scene changed"""
+        key = tuple(s.id for s in shapes)
+        if self.handle_layout is None or self.handle_layout_key != key:
+            r = self.selection_rect(shapes)
+            resizable = not any(s.mode in ["group", "instance"] for s in shapes)
+            self.handle_layout = HandleLayout((r.left(), r.top(), r.right(), r.bottom()), resizable)
+            self.handle_layout_key = key
+        return self.handle_layout
+
+    def get_selection_handle(self, shapes, pos):
+        """Handle of the selection's bounding box under pos, 'move' inside it, or None"""
+        if not shapes:
             return None
-        
-        handle_size = 12  # Larger hit area for handles (was 8)
-        
-        # Define handles at corners and edges
-        handles = {
-            'top-left': bounding_rect.topLeft(),
-            'top-right': bounding_rect.topRight(),
-            'bottom-left': bounding_rect.bottomLeft(),
-            'bottom-right': bounding_rect.bottomRight(),
-            'top-center': QPointF(bounding_rect.center().x(), bounding_rect.top()),
-            'bottom-center': QPointF(bounding_rect.center().x(), bounding_rect.bottom()),
-            'left-center': QPointF(bounding_rect.left(), bounding_rect.center().y()),
-            'right-center': QPointF(bounding_rect.right(), bounding_rect.center().y()),
-        }
-        
-        # Add rotation handle at top center (a bit above)
-        rotation_handle_pos = QPointF(bounding_rect.center().x(), bounding_rect.top() - 25)
-        handles['rotation'] = rotation_handle_pos
-        
-        for handle_name, handle_pos in handles.items():
-            handle_rect = QRectF(handle_pos.x() - handle_size/2, handle_pos.y() - handle_size/2, handle_size, handle_size)
-            if handle_rect.contains(pos):
-                return handle_name
-        
-        # Also check if the position is inside the shape for moving
-        if bounding_rect.contains(pos):
-            return 'move'
-        
-        return None
+        return self.selection_handle_layout(shapes).hit(pos.x(), pos.y())
+
+    def update_hover_cursor(self, pos):
+        """Cursor for the handle under the pointer; Qt is only called when the handle changes"""
+        layout = self.handle_layout
+        handle = layout.hit(pos.x(), pos.y()) if layout is not None else None
+        if handle != self.hover_handle:
+            self.hover_handle = handle
+            self.setCursor(self.get_cursor_for_handle(handle) if handle else Qt.ArrowCursor)
 
     def get_cursor_for_handle(self, handle_type):
         """Return appropriate cursor for the given handle type"""
@@ -1017,186 +2586,415 @@ class TutorCanvas(QWidget):
         else:
             return Qt.ArrowCursor
 
-    def resize_shape(self, pos):
-        """Resize the selected shape based on the active handle"""
-        if not self.selected_shape or not self.active_handle:
-            return
-            
-        # Handle rotation separately
-        if self.active_handle == 'rotation':
-            self.rotate_shape(pos)
-            return
-                
-        # Calculate the scale factors based on drag distance
-        if self.original_bounding_rect and self.drag_start_pos:
-            # Calculate the new position relative to the drag start
-            dx = pos.x() - self.drag_start_pos.x()
-            dy = pos.y() - self.drag_start_pos.y()
-                
-            # Calculate relative position within the original bounding box
-            orig_width = self.original_bounding_rect.width()
-            orig_height = self.original_bounding_rect.height()
-                
-            if orig_width == 0: orig_width = 1
-            if orig_height == 0: orig_height = 1
-                
-            # Different behavior depending on which handle is being dragged
-            if self.active_handle == 'top-left':
-                # Resize from top-left corner - adjust both width and height negatively
-                new_width = max(10, orig_width - dx)
-                new_height = max(10, orig_height - dy)
-                scale_x = new_width / orig_width
-                scale_y = new_height / orig_height
-                self.apply_scale_to_shape(scale_x, scale_y, self.original_bounding_rect.topLeft())
-            elif self.active_handle == 'top-right':
-                # Resize from top-right corner - adjust width positively, height negatively
-                new_width = max(10, orig_width + dx)
-                new_height = max(10, orig_height - dy)
-                scale_x = new_width / orig_width
-                scale_y = new_height / orig_height
-                self.apply_scale_to_shape(scale_x, scale_y, self.original_bounding_rect.topRight())
-            elif self.active_handle == 'bottom-left':
-                # Resize from bottom-left corner - adjust width negatively, height positively
-                new_width = max(10, orig_width - dx)
-                new_height = max(10, orig_height + dy)
-                scale_x = new_width / orig_width
-                scale_y = new_height / orig_height
-                self.apply_scale_to_shape(scale_x, scale_y, self.original_bounding_rect.bottomLeft())
-            elif self.active_handle == 'bottom-right':
-                # Resize from bottom-right corner - adjust both width and height positively
-                new_width = max(10, orig_width + dx)
-                new_height = max(10, orig_height + dy)
-                scale_x = new_width / orig_width
-                scale_y = new_height / orig_height
-                self.apply_scale_to_shape(scale_x, scale_y, self.original_bounding_rect.bottomRight())
-            elif self.active_handle == 'top-center':
-                # Resize vertically from top edge only
-                new_height = max(10, orig_height - dy)
-                scale_y = new_height / orig_height
-                self.apply_scale_to_shape(1.0, scale_y, self.original_bounding_rect.bottomLeft())
-            elif self.active_handle == 'bottom-center':
-                # Resize vertically from bottom edge only
-                new_height = max(10, orig_height + dy)
-                scale_y = new_height / orig_height
-                self.apply_scale_to_shape(1.0, scale_y, self.original_bounding_rect.topLeft())
-            elif self.active_handle == 'left-center':
-                # Resize horizontally from left edge only
-                new_width = max(10, orig_width - dx)
-                scale_x = new_width / orig_width
-                self.apply_scale_to_shape(scale_x, 1.0, self.original_bounding_rect.topRight())
-            elif self.active_handle == 'right-center':
-                # Resize horizontally from right edge only
-                new_width = max(10, orig_width + dx)
-                scale_x = new_width / orig_width
-                self.apply_scale_to_shape(scale_x, 1.0, self.original_bounding_rect.topLeft())
-    
-    def rotate_shape(self, pos):
-        """Rotate the selected shape based on mouse movement"""
-        if not self.selected_shape or not self.original_bounding_rect:
-            return
-                
-        # Calculate the center of the shape
-        center = self.original_bounding_rect.center()
-            
-        # Calculate angle between original position and current position
-        original_angle = math.atan2(self.drag_start_pos.y() - center.y(), self.drag_start_pos.x() - center.x())
-        current_angle = math.atan2(pos.y() - center.y(), pos.x() - center.x())
-            
-        # Calculate rotation angle in degrees
-        angle_delta = (current_angle - original_angle) * 180 / math.pi
-            
-        # Store the rotation angle in the shape
-        if not hasattr(self.selected_shape, 'rotation'):
-            self.selected_shape.rotation = 0
-        self.selected_shape.rotation = angle_delta
-
-    def apply_scale_to_shape(self, scale_x, scale_y, anchor_point):
-        """Apply scaling transformation to the shape with respect to an anchor point"""
-        if not self.selected_shape or not self.original_shape_points:
+    def selection_matrix_at(self, pos):
+        """Transform of the selection for the active handle dragged to pos"""
+        rect = self.original_bounding_rect
+        start = self.drag_start_pos
+        dx = pos.x() - start.x()
+        dy = pos.y() - start.y()
+        handle = self.active_handle
+        if handle == 'move':
+            return Affine.translation(dx, dy)
+        if handle == 'rotation':
+            center = rect.center()
+            angle = (math.atan2(pos.y() - center.y(), pos.x() - center.x()) -
+                     math.atan2(start.y() - center.y(), start.x() - center.x()))
+            return Affine.rotation(angle, center.x(), center.y())
+        width = rect.width() or 1
+        height = rect.height() or 1
+        # Each handle scales away from the opposite corner or edge, down to 10px
+        scale_x = scale_y = 1.0
+        if handle in ['top-left', 'bottom-left', 'left-center']:
+            scale_x = max(10, width - dx) / width
+        elif handle in ['top-right', 'bottom-right', 'right-center']:
+            scale_x = max(10, width + dx) / width
+        if handle in ['top-left', 'top-right', 'top-center']:
+            scale_y = max(10, height - dy) / height
+        elif handle in ['bottom-left', 'bottom-right', 'bottom-center']:
+            scale_y = max(10, height + dy) / height
+        anchor_x = rect.right() if handle in ['top-left', 'bottom-left', 'left-center'] else rect.left()
+        anchor_y = rect.bottom() if handle in ['top-left', 'top-right', 'top-center'] else rect.top()
+        return Affine.scaling(scale_x, scale_y, anchor_x, anchor_y)
+
+    def shape_transform(self, shape, m):
+        """The part of the selection transform a shape can take.
+
+        Freehand strokes and arrows follow the matrix exactly. Boxes stay axis
+        aligned, so under rotation only their center moves; text keeps its
+        font and only its anchor moves; groups and instances are moved whole.
+        """
+        if m.is_translation():
+            return m
+        mode = shape.mode
+        if mode in ["pencil", "highlighter", "arrow", "circle"] and not getattr(shape, 'text_bounds', None):
+            return m
+        if mode in ["rect", "ellipse", "diamond"] and not m.has_rotation():
+            return m
+        if mode == "text":
+            x, y = shape.points[0].x(), shape.points[0].y()
+        else:
+            x0, y0, x1, y1 = shape.bounds()
+            x, y = (x0 + x1) / 2, (y0 + y1) / 2
+        nx, ny = m.map(x, y)
+        return Affine.translation(nx - x, ny - y)
+
+    def begin_selection_transform(self, shapes, handle, pos):
+        """Start moving, scaling or rotating the given shapes with a handle"""
+        self.transform_selection = shapes
+        self.active_handle = handle
+        self.drag_start_pos = pos
+        self.original_bounding_rect = self.selection_rect(shapes)
+        self.selection_matrix = Affine()
+
+    def commit_selection_transform(self):
+        """Apply the dragged transform to the selection's geometry in one batch.
+
+        While dragging, the selection is only drawn through the matrix; here
+        every affected coordinate array is mapped at once and written back.
+        """
+        m, shapes = self.selection_matrix, self.transform_selection
+        self.selection_matrix = None
+        self.transform_selection = []
+        self.active_handle = None
+        if m is None or m == Affine():
             return
-        
-        # Scale the shape based on the anchor point
-        for i, orig_point in enumerate(self.original_shape_points):
-            if i < len(self.selected_shape.points):
-                # Calculate offset from anchor point
-                offset_x = orig_point.x() - anchor_point.x()
-                offset_y = orig_point.y() - anchor_point.y()
-                
-                # Apply scaling
-                new_offset_x = offset_x * scale_x
-                new_offset_y = offset_y * scale_y
-                
-                # Calculate new position
-                new_x = anchor_point.x() + new_offset_x
-                new_y = anchor_point.y() + new_offset_y
-                
-                self.selected_shape.points[i] = QPointF(new_x, new_y)
-        
-        # Also scale the end_pos if it exists
-        if self.original_shape_end_pos and hasattr(self.selected_shape, 'end_pos'):
-            offset_x = self.original_shape_end_pos.x() - anchor_point.x()
-            offset_y = self.original_shape_end_pos.y() - anchor_point.y()
-            
-            new_offset_x = offset_x * scale_x
-            new_offset_y = offset_y * scale_y
-            
-            new_x = anchor_point.x() + new_offset_x
-            new_y = anchor_point.y() + new_offset_y
-            
-            self.selected_shape.end_pos = QPointF(new_x, new_y)
+        mapped = []
+        for shape in shapes:
+            em = self.shape_transform(shape, m)
+            if shape.mode in ["group", "instance"]:
+                shape.translate(QPointF(em.e, em.f))
+            else:
+                mapped.append((shape, em))
+        batches = {}
+        for shape, em in mapped:
+            if shape.mode == "circle" and not em.is_uniform() and not em.has_rotation():
+                # Scaled unevenly, a circle becomes the ellipse its preview showed
+                c = shape.points[0]
+                r = math.hypot(shape.end_pos.x() - c.x(), shape.end_pos.y() - c.y())
+                x0, y0, x1, y1 = em.map_bounds((c.x() - r, c.y() - r, c.x() + r, c.y() + r))
+                shape.mode = "ellipse"
+                shape.points = [QPointF(x0, y0)]
+                shape.end_pos = QPointF(x1, y1)
+                shape.invalidate_bounds()
+                continue
+            batches.setdefault(em.coefficients(), []).append(shape)
+        for coefficients, batch in batches.items():
+            em = Affine(*coefficients)
+            arrays = [[c for p in shape.points + [shape.end_pos] for c in (p.x(), p.y())] for shape in batch]
+            for shape, coords in zip(batch, map_many(em, arrays)):
+                shape.points = [QPointF(coords[i], coords[i + 1]) for i in range(0, len(coords) - 2, 2)]
+                shape.end_pos = QPointF(coords[-2], coords[-1])
+                tb = getattr(shape, 'text_bounds', None)
+                if tb:
+                    x0, y0, x1, y1 = em.map_bounds((tb.left(), tb.top(), tb.right(), tb.bottom()))
+                    shape.text_bounds = QRectF(x0, y0, x1 - x0, y1 - y0)
+                shape.invalidate_bounds()
+        for shape in shapes:
+            self.shapes.mark_transformed(shape)
 
     def calculate_shape_bounding_rect(self, shape):
-        """Calculate the bounding rectangle for a given shape"""
-        if shape.mode == "text":
-            # For text, calculate based on font metrics
-            font = QFont("Segoe Print", 22, QFont.Bold)
-            fm = QFontMetrics(font)
-            text_width = fm.horizontalAdvance(shape.text)
-            text_height = fm.height()
-            return QRectF(shape.points[0].x(), shape.points[0].y() - fm.ascent(), text_width, text_height)
-        elif shape.mode in ["rect", "ellipse", "diamond"]:
-            # For geometric shapes, use the two defining points
-            top_left = QPointF(min(shape.points[0].x(), shape.end_pos.x()), min(shape.points[0].y(), shape.end_pos.y()))
-            bottom_right = QPointF(max(shape.points[0].x(), shape.end_pos.x()), max(shape.points[0].y(), shape.end_pos.y()))
-            return QRectF(top_left, bottom_right)
-        elif shape.mode in ["pencil", "highlighter"]:
-            # For freehand drawing, calculate from all points
-            if not shape.points:
-                return QRectF()
-            min_x = min(p.x() for p in shape.points)
-            max_x = max(p.x() for p in shape.points)
-            min_y = min(p.y() for p in shape.points)
-            max_y = max(p.y() for p in shape.points)
-            return QRectF(min_x, min_y, max_x - min_x, max_y - min_y)
-        else:
-            # For other shapes, use a reasonable bounding box
-            return QRectF(shape.points[0].x() - 10, shape.points[0].y() - 10, 20, 20)
+        """Calculate the bounding rectangle for a given shape (O(1) once cached on the shape)"""
+        x0, y0, x1, y1 = shape.bounds()
+        return QRectF(x0, y0, x1 - x0, y1 - y0)
+
+    def stroke_width(self, shape):
+        """Pen width the shape is actually drawn with"""
+        if shape.mode == "highlighter":
+            return max(8, shape.thickness * 2)
+        if getattr(shape, 'pressures', None) is not None:
+            return max_width(shape.thickness)
+        return shape.thickness
+
+    def hit_tolerance(self, shape):
+        """Pick tolerance for a shape, scaled by its stroke width"""
+        return hit_testing.hit_tolerance(self.stroke_width(shape))
 
     def is_point_in_shape(self, shape, point):
-        """Check if a point is inside a shape for selection purposes"""
+        """Check if a point is on (or inside) a shape for selection purposes"""
+        x, y = point.x(), point.y()
+        tol = self.hit_tolerance(shape)
+        # Bounding-box prefilter using the padded bounds kept in the spatial index
+        bounds = self.shape_index.bounds_of(shape.id)
+        if bounds is not None and not hit_testing.in_bounds(bounds, x, y):
+            return False
+        if shape.mode == "group":
+            # Descend only into the children whose BVH branches contain the point
+            local = point - shape.offset
+            return any(self.is_point_in_shape(child, local)
+                       for child in self.group_bvh(shape).query_point(local.x(), local.y()))
+        if shape.mode == "instance":
+            return self.is_point_in_shape(shape.geometry.source, point - shape.offset)
         if shape.mode == "text":
-            text_rect = QRectF(shape.points[0].x(), shape.points[0].y() - 20, 200, 40)
-            return text_rect.contains(point)
-        elif shape.mode in ["rect", "ellipse", "diamond"]:
-            rect = QRectF(shape.points[0], shape.end_pos).normalized()
-            return rect.contains(point)
+            r = self.calculate_shape_bounding_rect(shape)
+            return hit_testing.point_in_rect((r.left(), r.top(), r.right(), r.bottom()), x, y)
+        p1, p2 = shape.points[0], shape.end_pos
+        two_point = (p1.x(), p1.y(), p2.x(), p2.y())
+        if shape.mode == "rect":
+            return hit_testing.point_in_rect(two_point, x, y, tol)
+        elif shape.mode == "ellipse":
+            return hit_testing.point_in_ellipse(two_point, x, y, tol)
+        elif shape.mode == "diamond":
+            return hit_testing.point_in_diamond(two_point, x, y, tol)
+        elif shape.mode == "circle":
+            radius = math.hypot(p2.x() - p1.x(), p2.y() - p1.y())
+            return hit_testing.point_in_circle(p1.x(), p1.y(), radius, x, y, tol)
         elif shape.mode == "arrow":
-            p1, p2 = shape.points[0], shape.end_pos
-            # Simple distance check for arrow
-            dist = ((point.x() - p1.x()) * (p2.y() - p1.y()) - (point.y() - p1.y()) * (p2.x() - p1.x())) / math.sqrt((p2.x() - p1.x())**2 + (p2.y() - p1.y())**2)
-            return abs(dist) < 10  # 10 pixel tolerance
+            return hit_testing.point_near_segment(*two_point, x, y, tol)
         elif shape.mode in ["pencil", "highlighter"]:
-            # For freehand shapes, check if point is near any of the points
-            for p in shape.points:
-                if math.hypot(point.x() - p.x(), point.y() - p.y()) < 15:  # 15 pixel tolerance
-                    return True
+            return hit_testing.point_near_polyline(shape.flat_coords(), x, y, tol)
+        return False
+
+    def segment_hits_shape(self, shape, a, b):
+        """Check if the segment a-b passes over a shape, with the same tolerance as picking"""
+        ax, ay, bx, by = a.x(), a.y(), b.x(), b.y()
+        tol = self.hit_tolerance(shape)
+        bounds = self.shape_index.bounds_of(shape.id)
+        if bounds is not None and not hit_testing.segment_in_bounds(bounds, ax, ay, bx, by):
             return False
+        if shape.mode == "group":
+            la, lb = a - shape.offset, b - shape.offset
+            rect = (min(la.x(), lb.x()), min(la.y(), lb.y()), max(la.x(), lb.x()), max(la.y(), lb.y()))
+            return any(self.segment_hits_shape(child, la, lb)
+                       for child in self.group_bvh(shape).query_rect(rect))
+        if shape.mode == "instance":
+            return self.segment_hits_shape(shape.geometry.source, a - shape.offset, b - shape.offset)
+        if shape.mode == "text":
+            r = self.calculate_shape_bounding_rect(shape)
+            return hit_testing.segment_in_bounds((r.left(), r.top(), r.right(), r.bottom()), ax, ay, bx, by)
+        p1, p2 = shape.points[0], shape.end_pos
+        two_point = (p1.x(), p1.y(), p2.x(), p2.y())
+        if shape.mode == "rect":
+            rect = (min(p1.x(), p2.x()), min(p1.y(), p2.y()), max(p1.x(), p2.x()), max(p1.y(), p2.y()))
+            return hit_testing.segment_in_bounds(rect, ax, ay, bx, by, tol)
+        elif shape.mode == "ellipse":
+            return hit_testing.segment_in_ellipse(two_point, ax, ay, bx, by, tol)
+        elif shape.mode == "diamond":
+            return hit_testing.segment_in_diamond(two_point, ax, ay, bx, by, tol)
+        elif shape.mode == "circle":
+            radius = math.hypot(p2.x() - p1.x(), p2.y() - p1.y()) + tol
+            return hit_testing.segment_distance_sq(ax, ay, bx, by, p1.x(), p1.y()) <= radius * radius
+        elif shape.mode == "arrow":
+            return hit_testing.segment_segment_distance_sq(ax, ay, bx, by, *two_point) <= tol * tol
+        elif shape.mode in ["pencil", "highlighter"]:
+            return hit_testing.segment_near_polyline(shape.flat_coords(), ax, ay, bx, by, tol)
         return False
 
+    def shape_index_bounds(self, shape):
+        """Bounds registered in the spatial index, padded by the pick tolerance"""
+        x0, y0, x1, y1 = shape.bounds()
+        pad = self.hit_tolerance(shape)
+        return (x0 - pad, y0 - pad, x1 + pad, y1 + pad)
+
+    def group_bvh(self, group):
+        """BVH over a group's children, padded like the spatial index entries"""
+        if group.bvh is None:
+            group.bvh = BVH([(child, self.shape_index_bounds(child)) for child in group.children])
+        return group.bvh
+
+    def group_selection(self):
+        """Combine all selected shapes into one group at the topmost member's depth"""
+        members = [s for s in self.shapes if s.is_selected]
+        if len(members) < 2:
+            return
+        z = self.shapes.z_of(members[-1].id)
+        for member in members:
+            member.is_selected = False
+        self.shapes.delete_many([member.id for member in members])
+        group = ShapeGroup(members)
+        self.shapes.add(group, z=z)
+        group.is_selected = True
+        self.selected_shape = group
+        self.save_state()
+        self.update()
+
+    def ungroup_selection(self):
+        """Split the selected group back into its shapes"""
+        group = self.selected_shape
+        if not group or group.mode != "group":
+            return
+        self.shapes.delete(group.id)
+        children = group.ungrouped()
+        self.shapes.add_many(children)
+        for child in children:
+            child.is_selected = True
+        self.selected_shape = None
+        self.save_state()
+        self.update()
+
+    def share_geometry(self, shape):
+        """Turn a scene shape into an instance of shared geometry (in place, same depth)"""
+        if shape.mode == "instance":
+            return shape
+        z = self.shapes.z_of(shape.id)
+        self.shapes.delete(shape.id)
+        instance = ShapeInstance(SharedGeometry(shape))
+        self.shapes.add(instance, z=z)
+        return instance
+
+    def place_copy(self, shape, delta, tint=None):
+        """Add a copy of shape moved by delta on top of the scene.
+
+        Strokes, groups and instances are placed as instances sharing one
+        geometry; simple two-point shapes are cheaper to copy outright.
+        """
+        if shape.mode in ["pencil", "highlighter", "group", "instance"]:
+            if shape.mode != "instance" and shape in self.shapes:
+                shape = self.share_geometry(shape)
+            elif shape.mode != "instance":
+                shape = ShapeInstance(SharedGeometry(shape.copy()))
+            copy = ShapeInstance(shape.geometry, shape.offset + delta, tint or shape.tint)
+        else:
+            copy = shape.copy()
+            copy.id = None
+            copy.translate(delta)
+            if tint:
+                copy.color = QColor(tint)
+        copy.layer = self.layers.active_id
+        self.shapes.append(copy)
+        return copy
+
+    def duplicate_selection(self):
+        """Ctrl+D: duplicate the selected shape next to the original"""
+        if not self.selected_shape:
+            return
+        source = self.selected_shape
+        source.is_selected = False
+        copy = self.place_copy(source, QPointF(20, 20))
+        copy.is_selected = True
+        self.selected_shape = copy
+        self.save_state()
+        self.update()
+
+    def copy_selection(self):
+        """Ctrl+C: remember the selected shape for pasting/stamping; the scene is left as it is"""
+        if self.selected_shape:
+            self.clipboard_shape = self.clipboard_copy(self.selected_shape)
+
+    def clipboard_copy(self, shape):
+        """Detached copy for the clipboard; strokes and groups become an instance every paste shares"""
+        if shape.mode in ["pencil", "highlighter", "group"]:
+            return ShapeInstance(SharedGeometry(shape.copy()))
+        copy = shape.copy()
+        copy.id = None
+        return copy
+
+    def paste_clipboard(self, stamp=False):
+        """Ctrl+V: paste the copied shape centred under the cursor;
+        Ctrl+Shift+V stamps it in the current color"""
+        shape = self.clipboard_shape
+        if not shape:
+            return
+        x0, y0, x1, y1 = shape.bounds()
+        cursor = QPointF(self.mapFromGlobal(QCursor.pos()))
+        delta = cursor - QPointF((x0 + x1) / 2, (y0 + y1) / 2)
+        if self.selected_shape:
+            self.selected_shape.is_selected = False
+        copy = self.place_copy(shape, delta, QColor(self.current_color) if stamp else None)
+        copy.is_selected = True
+        self.selected_shape = copy
+        self.save_state()
+        self.update()
+
+    def snap_skip(self, moving=()):
+        """Predicate excluding the given shape ids and shapes on hidden layers from snapping"""
+        def skip(shape_id):
+            shape = self.shapes.get(shape_id)
+            return shape_id in moving or shape is None or not self.is_shape_visible(shape)
+        return skip
+
+    def snap_position(self, pos):
+        """Pointer position snapped to nearby shape edges/centers or the grid; updates the guides"""
+        if not self.snap_enabled and not self.snap_grid:
+            return pos
+        tolerance = self.snap_tolerance if self.snap_enabled else 0
+        x, y, guide_x, guide_y = self.snap_index.snap_point(pos.x(), pos.y(), tolerance, self.snap_grid, self.snap_skip())
+        self.snap_guides = (guide_x, guide_y) if guide_x is not None or guide_y is not None else None
+        return QPointF(x, y)
+
+    def snap_selection_move(self, m):
+        """Adjust a move of the selection so its box lines up with other shapes or the grid"""
+        if not self.snap_enabled and not self.snap_grid:
+            return m
+        r = self.original_bounding_rect
+        moved = (r.left() + m.e, r.top() + m.f, r.right() + m.e, r.bottom() + m.f)
+        tolerance = self.snap_tolerance if self.snap_enabled else 0
+        moving = {s.id for s in self.transform_selection}
+        dx, dy, guide_x, guide_y = self.snap_index.snap_box(moved, tolerance, self.snap_grid, self.snap_skip(moving))
+        self.snap_guides = (guide_x, guide_y) if guide_x is not None or guide_y is not None else None
+        return Affine.translation(m.e + dx, m.f + dy)
+
+    def on_scene_changed(self, events):
+        """Apply coalesced scene changes to the spatial index"""
+        # Any change may have moved or removed a selected shape
+        self.handle_layout = None
+        for event in events:
+            if event.kind == scene_events.CLEARED:
+                self.shape_index.clear()
+                self.snap_index.clear()
+                self.layer_of_shape.clear()
+                self.layer_dirty = {layer.id: True for layer in self.layers}
+                self.layer_overdraw.clear()
+            elif event.kind == scene_events.REMOVED:
+                for shape_id in event.shape_ids:
+                    old_rect = self.shape_index.bounds_of(shape_id)
+                    self.shape_index.remove(shape_id)
+                    self.snap_index.remove(shape_id)
+                    self.invalidate_layer(self.layer_of_shape.pop(shape_id, None), old_rect)
+            else:
+                snap_items = []
+                for shape_id in event.shape_ids:
+                    shape = self.shapes.get(shape_id)
+                    if shape is None:
+                        continue
+                    old_rect = self.shape_index.bounds_of(shape_id)
+                    self.shape_index.insert(shape_id, shape, self.shape_index_bounds(shape), self.shapes.z_of(shape_id))
+                    snap_items.append((shape_id, shape.bounds()))
+                    if shape_id in self.raster_selection:
+                        # Drawn live while selected; its raster area is refreshed on deselection
+                        continue
+                    if old_rect is not None:
+                        self.invalidate_layer(self.layer_of_shape.get(shape_id), old_rect)
+                    self.layer_of_shape[shape_id] = shape.layer
+                    rect = self.shape_index.bounds_of(shape_id)
+                    if shape_id in self.restore_chunk_ids and self.restored_on_top(shape, rect):
+                        # Streamed in by the restore above what the raster shows: painted over it
+                        self.layer_overdraw.setdefault(self.layers.resolve(shape.layer).id, []).append(shape)
+                    else:
+                        self.invalidate_layer(shape.layer, rect)
+                # A loaded file arrives as one big event; its snap lines are sorted in once
+                self.snap_index.set_many(snap_items)
+
+    def visible_scene_bounds(self):
+        """Widget area in scene coordinates, taking the zoom transform into account"""
+        r = QRectF(self.rect())
+        if self.is_zoom_active and self.zoom_factor > 1.0:
+            c, f = self.zoom_center, self.zoom_factor
+            r = QRectF(c.x() + (r.left() - c.x()) / f, c.y() + (r.top() - c.y()) / f,
+                       r.width() / f, r.height() / f)
+        return (r.left(), r.top(), r.right(), r.bottom())
+
+    def is_shape_visible(self, shape):
+        return self.layers.resolve(shape.layer).visible
+
+    def shapes_at_position(self, pos):
+        """All shapes on visible layers under the given position, topmost first"""
+        self.shapes.changes.flush()
+        hits = [s for s in self.shape_index.query_point(pos.x(), pos.y())
+                if self.is_shape_visible(s) and self.is_point_in_shape(s, pos)]
+        # Shapes on higher layers are on top regardless of when they were drawn
+        hits.sort(key=lambda s: self.layers.order_of(s.layer), reverse=True)
+        return hits
+
+    def shapes_on_segment(self, a, b):
+        """All shapes on visible layers the segment a-b passes over, topmost first"""
+        self.shapes.changes.flush()
+        return [s for s in self.shape_index.query_segment(a.x(), a.y(), b.x(), b.y())
+                if self.is_shape_visible(s) and self.segment_hits_shape(s, a, b)]
+
     def get_text_shape_at_position(self, pos):
         """Find text shape at given position"""
-        for s in reversed(self.shapes):
-            if s.mode == "text" and self.is_point_in_shape(s, pos):
+        for s in self.shapes_at_position(pos):
+            if s.mode == "text":
                 return s
         return None
     
@@ -1206,8 +3004,7 @@ class TutorCanvas(QWidget):
             return None
         
         # Use QFontMetrics to get accurate text dimensions
-        font = QFont("Segoe Print", 22, QFont.Bold)
-        fm = QFontMetrics(font)
+        fm = QFontMetrics(text_shape.font())
         text_width = fm.horizontalAdvance(text_shape.text)
         text_height = fm.height()
         
@@ -1220,13 +3017,110 @@ class TutorCanvas(QWidget):
         padding = 2
         return QRectF(x - padding, y - padding, text_width + 2 * padding, text_height + 2 * padding)
     
-    def erase_at(self, pos):
-        for s in self.shapes[:]:
-            if self.is_point_in_shape(s, pos):
-                self.shapes.remove(s)
-                self.save_state()
-                break
+    def begin_marquee(self, pos, lasso):
+        """Start dragging a selection rectangle, or a free-form lasso"""
+        self.marquee_points = [pos, pos] if not lasso else [pos]
+        self.marquee_lasso = lasso
+
+    def outline_samples(self, shape):
+        """A few points on a shape's outline, used to test it against a lasso"""
+        if shape.mode in ["pencil", "highlighter"] and not getattr(shape, 'text_bounds', None):
+            coords = shape.flat_coords()
+            step = max(1, len(coords) // 128) * 2
+            samples = [(coords[i], coords[i + 1]) for i in range(0, len(coords) - 1, step)]
+            samples.append((coords[-2], coords[-1]))
+            return samples
+        x0, y0, x1, y1 = shape.bounds()
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        return [(cx, y0), (x1, cy), (cx, y1), (x0, cy)]
+
+    def finish_marquee(self):
+        """Select the shapes enclosed by the marquee or lasso"""
+        points, self.marquee_points = self.marquee_points, None
+        if self.marquee_lasso:
+            if len(points) < 3:
+                return
+            polygon = [c for p in points for c in (p.x(), p.y())]
+            xs, ys = polygon[0::2], polygon[1::2]
+            area = (min(xs), min(ys), max(xs), max(ys))
+            encloses = lambda s: all(hit_testing.point_in_polygon(polygon, x, y) for x, y in self.outline_samples(s))
+        else:
+            a, b = points
+            area = (min(a.x(), b.x()), min(a.y(), b.y()), max(a.x(), b.x()), max(a.y(), b.y()))
+            encloses = lambda s: hit_testing.in_bounds(area, s.bounds()[0], s.bounds()[1]) and \
+                hit_testing.in_bounds(area, s.bounds()[2], s.bounds()[3])
+        self.shapes.changes.flush()
+        hits = [s for s in self.shape_index.query_rect(area) if self.is_shape_visible(s) and encloses(s)]
+        for s in hits:
+            s.is_selected = True
+        if hits:
+            self.selected_shape = hits[0]
+
+    def erase_along(self, a, b):
+        """Remove every shape the eraser swept over between two pointer positions.
+
+        The gesture's removals become one undo step when the button is released.
+        """
+        if self.partial_eraser:
+            self.cut_strokes_along(a, b)
+        else:
+            hits = self.shapes_on_segment(a, b)
+            if hits:
+                if self.selected_shape in hits:
+                    self.selected_shape = None
+                self.shapes.delete_many([s.id for s in hits])
+        self.erase_last_pos = b
         self.update()
+
+    def cut_strokes_along(self, a, b):
+        """Erase the parts of freehand strokes under the eraser footprint.
+
+        The surviving pieces replace each cut stroke at its depth; strokes the
+        footprint misses keep their caches and index entries. Other shapes are
+        still removed whole.
+        """
+        self.shapes.changes.flush()
+        radius = self.eraser_size / 2
+        footprint = Capsule(a.x(), a.y(), b.x(), b.y(), radius)
+        removed = []
+        pieces = []
+        for s in self.shape_index.query_rect(footprint.bounds):
+            if not self.is_shape_visible(s):
+                continue
+            if s.mode in ["pencil", "highlighter"] and not getattr(s, 'text_bounds', None):
+                # Ink reaches half the pen width beyond the centerline
+                capsule = Capsule(a.x(), a.y(), b.x(), b.y(), radius + self.stroke_width(s) / 2)
+                if s.pressures is not None:
+                    parts = split_polyline(s.flat_coords(), capsule, values=s.pressures)
+                else:
+                    parts = split_polyline(s.flat_coords(), capsule)
+                if parts is None:
+                    continue
+                z = self.shapes.z_of(s.id)
+                if s.pressures is not None:
+                    pieces.extend((self.stroke_piece(s, coords, pressures), z) for coords, pressures in parts)
+                else:
+                    pieces.extend((self.stroke_piece(s, coords), z) for coords in parts)
+                removed.append(s)
+            elif self.segment_hits_shape(s, a, b):
+                removed.append(s)
+        if not removed:
+            return
+        if self.selected_shape in removed:
+            self.selected_shape = None
+        self.shapes.delete_many([s.id for s in removed])
+        for piece, z in pieces:
+            self.shapes.add(piece, z)
+
+    def stroke_piece(self, stroke, coords, pressures=None):
+        """New freehand shape styled like stroke, following the flat polyline coords"""
+        piece = TutorShape(stroke.mode, QPointF(coords[0], coords[1]), QColor(stroke.color), stroke.thickness)
+        piece.points = [QPointF(coords[i], coords[i + 1]) for i in range(0, len(coords) - 1, 2)]
+        piece.layer = stroke.layer
+        piece._coords = coords
+        if pressures is not None:
+            piece.pressures = array('f', pressures)
+        return piece
     
     def apply_zoom_area(self):
         """Apply zoom to the selected area"""
@@ -1276,61 +3170,54 @@ class TutorCanvas(QWidget):
             return
         
         if self.mode == "select":
-            # First, check if we're clicking on a handle of an already selected shape
-            if self.selected_shape and self.selected_shape.is_selected:
-                handle_at_pos = self.get_handle_at_position(self.selected_shape, pos)
-                if handle_at_pos:
-                    # We're interacting with a handle of the selected shape
-                    self.active_handle = handle_at_pos
-                    self.drag_start_pos = pos
-                    self.original_shape_points = [QPointF(p) for p in self.selected_shape.points]
-                    if hasattr(self.selected_shape, 'end_pos'):
-                        self.original_shape_end_pos = QPointF(self.selected_shape.end_pos)
-                    self.original_bounding_rect = self.calculate_shape_bounding_rect(self.selected_shape)
-                    self.last_pos = pos
-                    self.update()
-                    return  # Early return to prevent deselection
+            # Shift+click adds a shape to (or drops it from) the selection, e.g. for grouping;
+            # Shift+drag on empty space adds a marquee (or Alt: lasso) to it
+            if event.modifiers() & Qt.ShiftModifier:
+                hits = self.shapes_at_position(pos)
+                if hits:
+                    hits[0].is_selected = not hits[0].is_selected
+                    self.selected_shape = hits[0] if hits[0].is_selected else None
+                    self.active_handle = None
+                else:
+                    self.begin_marquee(pos, bool(event.modifiers() & Qt.AltModifier))
+                self.update()
+                return
+            # First, check if we're clicking on a handle (or inside the box) of the current selection
+            selection = self.selected_shapes()
+            handle_at_pos = self.get_selection_handle(selection, pos) if selection else None
+            if handle_at_pos:
+                self.begin_selection_transform(selection, handle_at_pos, pos)
+                self.update()
+                return  # Early return to prevent deselection
             
             # If we reach here, either no shape was selected or click was not on a handle
-            # Deselect any currently selected shape
-            if self.selected_shape:
-                self.selected_shape.is_selected = False
-            self.selected_shape = None
+            self.clear_selection()
             self.active_handle = None
             
-            # Now check if clicked on any shape
-            for s in reversed(self.shapes):
-                if self.is_point_in_shape(s, pos):
-                    # Deselect any other selected shapes
-                    for other_shape in self.shapes:
-                        other_shape.is_selected = False
-                    self.selected_shape = s
-                    s.is_selected = True
-                    # Check if clicked on a handle
-                    self.active_handle = self.get_handle_at_position(s, pos)
-                    if self.active_handle:
-                        self.drag_start_pos = pos
-                        self.original_shape_points = [QPointF(p) for p in s.points]
-                        if hasattr(s, 'end_pos'):
-                            self.original_shape_end_pos = QPointF(s.end_pos)
-                        self.original_bounding_rect = self.calculate_shape_bounding_rect(s)
-                    self.last_pos = pos
-                    break
+            # Now check if clicked on any shape (topmost first via the spatial index)
+            hits = self.shapes_at_position(pos)
+            if hits:
+                s = hits[0]
+                self.selected_shape = s
+                s.is_selected = True
+                # A click on the shape's handle resizes it, anywhere else drags it
+                self.begin_selection_transform([s], self.get_handle_at_position(s, pos) or 'move', pos)
             else:
-                # Clicked on empty space - deselect all
-                for s in self.shapes:
-                    s.is_selected = False
-                self.selected_shape = None
+                # Clicked on empty space - start a marquee, or a lasso with Alt held
+                self.begin_marquee(pos, bool(event.modifiers() & Qt.AltModifier))
         elif self.mode == "text":
             self.open_text_input(pos)
         elif self.mode == "laser":
-            self.current_laser = LaserTrail(pos, self.laser_color, self.laser_thickness, self.laser_duration, self.laser_smoothness)
+            self.current_laser = LaserTrail(pos, self.laser_color, self.laser_thickness, self.laser_duration, self.laser_smoothness,
+                                            self.smoothing_beta)
             self.laser_trails.append(self.current_laser)
+            self.stroke_predictor.reset()
+            self.stroke_predictor.add_sample(pos.x(), pos.y(), time.monotonic())
         elif self.mode == "zoom":
             self.zoom_start_pos = pos
             self.is_zoom_active = True
         elif self.mode == "eraser":
-            self.erase_at(pos)
+            self.erase_along(pos, pos)
         elif self.mode == "highlighter":
             # Check if we're highlighting over existing text
             text_shape = self.get_text_shape_at_position(pos)
@@ -1342,10 +3229,35 @@ class TutorCanvas(QWidget):
                 # Free-form highlighter drawing
                 self.current_shape = TutorShape(self.mode, pos, self.current_color, self.current_thickness)
         else:
+            if self.mode in SNAPPING_MODES:
+                pos = self.snap_position(pos)
             self.current_shape = TutorShape(self.mode, pos, self.current_color, self.current_thickness)
             if self.enable_fill and self.mode in ["rect", "ellipse", "diamond"]:
                 self.current_shape.fill_color = self.current_color
         
+        if self.current_shape:
+            self.current_shape.layer = self.layers.active_id
+        if self.current_shape and self.mode in ["pencil", "highlighter"]:
+            # Fit the stroke on the fly so only its Bezier control points are kept
+            self.curve_fitter = CurveFitter(self.stroke_fit_error)
+            self.curve_fitter.add_point(pos.x(), pos.y())
+            pressure = event.pressure() if event.type() == QEvent.TabletPress else 1.0
+            self.input_pipeline.clear()
+            self.stroke_samples = array('d', (pos.x(), pos.y(), pressure, time.monotonic()))
+            self.stroke_predictor.reset()
+            self.stroke_predictor.add_sample(pos.x(), pos.y(), self.stroke_samples[3])
+            self.stroke_smoother.configure(self.smoothing_min_cutoff, self.smoothing_beta)
+            self.stroke_smoother.reset()
+            self.stroke_smoother(pos.x(), pos.y(), self.stroke_samples[3])
+            self.stroke_from_tablet = event.type() == QEvent.TabletPress
+            if self.variable_width and self.mode == "pencil":
+                # Variable-width strokes keep their raw samples: pressures are per sample
+                self.curve_fitter = None
+                self.speed_pressure.reset()
+                if not self.stroke_from_tablet:
+                    pressure = self.speed_pressure(pos.x(), pos.y(), self.stroke_samples[3])
+                self.current_shape.begin_live_outline(pressure)
+        
         self.update()
 
     def mouseMoveEvent(self, event):
@@ -1354,63 +3266,39 @@ class TutorCanvas(QWidget):
             
         pos = event.pos()
         
-        # Handle cursor changes based on hover position when in select mode
         if self.mode == "select":
-            if self.selected_shape and not self.active_handle:
-                # Check if we're hovering over a handle (only when not actively dragging)
-                handle = self.get_handle_at_position(self.selected_shape, pos)
-                if handle:
-                    cursor = self.get_cursor_for_handle(handle)
-                    self.setCursor(cursor)
-                else:
-                    self.setCursor(Qt.ArrowCursor)
-            elif self.selected_shape and self.active_handle:
-                # During active dragging, don't change cursor as it's handled by the transformation
-                pass
-            else:
-                self.setCursor(Qt.ArrowCursor)
-        
-        if self.mode == "select" and self.selected_shape:
-            if self.active_handle:
-                # Handle resizing and transformation
+            if self.marquee_points is not None:
+                if not self.marquee_lasso:
+                    self.marquee_points[1:] = [pos]
+                elif (pos - self.marquee_points[-1]).manhattanLength() >= 3:
+                    self.marquee_points.append(pos)
+            elif self.active_handle:
+                # Only the matrix changes while dragging; geometry is updated on release
+                m = self.selection_matrix_at(pos)
                 if self.active_handle == 'move':
-                    # Moving the shape
-                    delta = pos - self.last_pos
-                    # For line/pencil shapes, move all points
-                    if self.selected_shape.mode in ["pencil", "highlighter"]:
-                        for i in range(len(self.selected_shape.points)):
-                            self.selected_shape.points[i] += delta
-                    else:
-                        # For other shapes, move the main points
-                        self.selected_shape.points[0] += delta
-                        if hasattr(self.selected_shape, 'end_pos'):
-                            self.selected_shape.end_pos += delta
-                    self.last_pos = pos
-                else:
-                    # Resizing the shape based on handle
-                    self.resize_shape(pos)
+                    m = self.snap_selection_move(m)
+                self.selection_matrix = m
             else:
-                # Moving the entire shape
-                delta = pos - self.last_pos
-                # For line/pencil shapes, move all points
-                if self.selected_shape.mode in ["pencil", "highlighter"]:
-                    for i in range(len(self.selected_shape.points)):
-                        self.selected_shape.points[i] += delta
-                else:
-                    # For other shapes, move the main points
-                    self.selected_shape.points[0] += delta
-                    if hasattr(self.selected_shape, 'end_pos'):
-                        self.selected_shape.end_pos += delta
-                self.last_pos = pos
+                # Hovering: show what a press would do, using the handles of the last painted selection
+                self.update_hover_cursor(pos)
+                return
         elif self.mode == "laser" and self.current_laser:
             self.current_laser.add_point(pos)
+            self.stroke_predictor.add_sample(pos.x(), pos.y(), time.monotonic())
         elif self.mode == "zoom" and self.zoom_start_pos:
             self.zoom_end_pos = pos
+        elif self.mode == "eraser" and self.erase_last_pos is not None:
+            self.erase_along(self.erase_last_pos, pos)
+            return
         elif self.current_shape:
             if self.mode in ["pencil", "highlighter"]:
-                self.current_shape.points.append(pos)
+                # Only buffer here; the frame timer repaints and consume_samples applies them
+                self.input_pipeline.push(pos.x(), pos.y(), 1.0, time.monotonic())
+                return
             else:
-                self.current_shape.end_pos = pos
+                if self.mode in SNAPPING_MODES:
+                    pos = self.snap_position(pos)
+                self.current_shape.set_end_pos(pos)
         
         self.update()
 
@@ -1420,9 +3308,19 @@ class TutorCanvas(QWidget):
             
         if self.mode == "select":
             # Don't deselect the shape - keep it selected until another tool is chosen or another element is selected
-            pass
+            if self.marquee_points is not None:
+                self.finish_marquee()
+            else:
+                # A finished move/resize/rotate becomes one undo step
+                self.commit_selection_transform()
+                self.save_state()
         elif self.mode == "laser":
             self.current_laser = None
+            self.stroke_predictor.reset()
+        elif self.mode == "eraser":
+            # Everything erased during the drag is a single undo step
+            self.erase_last_pos = None
+            self.save_state()
         elif self.mode == "zoom" and self.zoom_start_pos and self.zoom_end_pos:
             self.apply_zoom_area()
             self.zoom_start_pos = None
@@ -1430,15 +3328,92 @@ class TutorCanvas(QWidget):
             self.is_zoom_active = False
         elif self.current_shape:
             if self.mode in ["pencil", "highlighter"]:
-                self.current_shape.points.append(event.pos())
+                self.input_pipeline.flush()
+                # The release point goes through the filter too, or every stroke ends in a raw jitter hook
+                x, y = self.stroke_smoother(event.pos().x(), event.pos().y(), time.monotonic())
+                self.current_shape.add_point(QPointF(x, y))
+                recognized = None
+                if self.shape_recognition and self.mode == "pencil":
+                    recognized = self.recognize_stroke(self.current_shape)
+                if recognized:
+                    self.current_shape = recognized
+                    self.curve_fitter = None
+                elif self.current_shape.pressures is not None:
+                    self.current_shape.end_live_outline()
+                elif self.curve_fitter:
+                    self.curve_fitter.add_point(x, y)
+                    segments = self.curve_fitter.finish()
+                    if segments:
+                        self.current_shape.set_curve(segments)
+                    self.curve_fitter = None
             else:
-                self.current_shape.end_pos = event.pos()
+                end = self.snap_position(event.pos()) if self.mode in SNAPPING_MODES else event.pos()
+                self.current_shape.set_end_pos(end)
             self.shapes.append(self.current_shape)
             self.save_state()
             self.current_shape = None
+            self.stroke_predictor.reset()
         
+        # Guides are only shown while a drag is snapping
+        self.snap_guides = None
         self.update()
 
+    def recognize_stroke(self, stroke):
+        """Two-point shape equivalent to a finished pencil stroke, or None"""
+        result = recognize(stroke.flat_coords())
+        if result is None:
+            return None
+        mode, x0, y0, x1, y1 = result
+        if mode == "line":
+            # Straight strokes stay pencil strokes, reduced to their two end points
+            shape = TutorShape("pencil", QPointF(x0, y0), stroke.color, stroke.thickness)
+            shape.add_point(QPointF(x1, y1))
+        else:
+            shape = TutorShape(mode, QPointF(x0, y0), stroke.color, stroke.thickness)
+            shape.set_end_pos(QPointF(x1, y1))
+            if self.enable_fill and mode in ["rect", "ellipse", "diamond"]:
+                shape.fill_color = QColor(stroke.color)
+        shape.layer = stroke.layer
+        return shape
+
+    def consume_samples(self, samples):
+        """Apply one frame's worth of buffered freehand samples to the current stroke"""
+        shape = self.current_shape
+        if not shape or shape.mode not in ["pencil", "highlighter"]:
+            return
+        self.stroke_samples.extend(samples)
+        fitter = self.curve_fitter
+        predictor = self.stroke_predictor
+        smoother = self.stroke_smoother
+        speed_pressure = None if self.stroke_from_tablet or shape.pressures is None else self.speed_pressure
+        for i in range(0, len(samples), SAMPLE_STRIDE):
+            x, y, t = samples[i], samples[i + 1], samples[i + 3]
+            # The predictor wants the raw pen motion; the stroke keeps the smoothed point
+            predictor.add_sample(x, y, t)
+            pressure = speed_pressure(x, y, t) if speed_pressure else samples[i + 2]
+            x, y = smoother(x, y, t)
+            shape.add_point(QPointF(x, y), pressure)
+            if fitter:
+                fitter.add_point(x, y)
+
+    def tabletEvent(self, event):
+        """Pen input for freehand strokes, with sub-pixel positions and pressure.
+
+        Other tools ignore the event so Qt delivers the synthesized mouse event.
+        """
+        if self.mode not in ["pencil", "highlighter"]:
+            event.ignore()
+            return
+        if event.type() == QEvent.TabletPress:
+            self.mousePressEvent(event)
+        elif event.type() == QEvent.TabletMove:
+            if self.current_shape:
+                pos = event.posF()
+                self.input_pipeline.push(pos.x(), pos.y(), event.pressure(), time.monotonic())
+        elif event.type() == QEvent.TabletRelease:
+            self.mouseReleaseEvent(event)
+        event.accept()
+
     def keyPressEvent(self, event):
         # Handle Ctrl+ combinations for tool switching
         if event.modifiers() & Qt.ControlModifier:
@@ -1475,6 +3450,18 @@ class TutorCanvas(QWidget):
             self.undo()
         elif event.key() == Qt.Key_Y and event.modifiers() & Qt.ControlModifier:
             self.redo()
+        elif event.key() == Qt.Key_G and event.modifiers() & Qt.ControlModifier:
+            # Ctrl+G groups the selection, Ctrl+Shift+G ungroups
+            if event.modifiers() & Qt.ShiftModifier:
+                self.ungroup_selection()
+            else:
+                self.group_selection()
+        elif event.key() == Qt.Key_D and event.modifiers() & Qt.ControlModifier:
+            self.duplicate_selection()
+        elif event.key() == Qt.Key_C and event.modifiers() & Qt.ControlModifier:
+            self.copy_selection()
+        elif event.key() == Qt.Key_V and event.modifiers() & Qt.ControlModifier:
+            self.paste_clipboard(stamp=bool(event.modifiers() & Qt.ShiftModifier))
         elif event.key() == Qt.Key_H and event.modifiers() & Qt.ControlModifier and event.modifiers() & Qt.ShiftModifier:
             # Toggle toolbar hide/unhide with Ctrl+Shift+H
             self.toggle_toolbar_visibility()
@@ -0,0 +1,259 @@
+"""
+Cubic Bezier curve fitting for freehand strokes
+Schneider's algorithm ("An Algorithm for Automatically Fitting Digitized
+Curves", Graphics Gems 1990) plus a streaming wrapper used while drawing
+"""
+
+import math
+
+MAX_ITERATIONS = 4  # Newton-Raphson reparameterization passes per segment
+
+
+def _sub(a, b):
+    return (a[0] - b[0], a[1] - b[1])
+
+
+def _add(a, b):
+    return (a[0] + b[0], a[1] + b[1])
+
+
+def _scale(a, s):
+    return (a[0] * s, a[1] * s)
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1]
+
+
+def _normalize(v):
+    length = math.hypot(v[0], v[1])
+    if length == 0.0:
+        return (0.0, 0.0)
+    return (v[0] / length, v[1] / length)
+
+
+def bezier_point(seg, t):
+    """Point on the cubic segment (p0, c1, c2, p3) at parameter t"""
+    p0, c1, c2, p3 = seg
+    mt = 1.0 - t
+    a = mt * mt * mt
+    b = 3.0 * mt * mt * t
+    c = 3.0 * mt * t * t
+    d = t * t * t
+    return (a * p0[0] + b * c1[0] + c * c2[0] + d * p3[0],
+            a * p0[1] + b * c1[1] + c * c2[1] + d * p3[1])
+
+
+def _bezier_derivatives(seg, t):
+    p0, c1, c2, p3 = seg
+    mt = 1.0 - t
+    d1 = (3.0 * (mt * mt * (c1[0] - p0[0]) + 2.0 * mt * t * (c2[0] - c1[0]) + t * t * (p3[0] - c2[0])),
+          3.0 * (mt * mt * (c1[1] - p0[1]) + 2.0 * mt * t * (c2[1] - c1[1]) + t * t * (p3[1] - c2[1])))
+    d2 = (6.0 * (mt * (c2[0] - 2.0 * c1[0] + p0[0]) + t * (p3[0] - 2.0 * c2[0] + c1[0])),
+          6.0 * (mt * (c2[1] - 2.0 * c1[1] + p0[1]) + t * (p3[1] - 2.0 * c2[1] + c1[1])))
+    return d1, d2
+
+
+def _chord_length_parameterize(points, first, last):
+    u = [0.0]
+    total = 0.0
+    for i in range(first + 1, last + 1):
+        total += math.hypot(points[i][0] - points[i - 1][0], points[i][1] - points[i - 1][1])
+        u.append(total)
+    if total == 0.0:
+        return [i / max(1, last - first) for i in range(last - first + 1)]
+    return [v / total for v in u]
+
+
+def _generate_bezier(points, first, last, u, left, right):
+    """Least-squares control points for fixed end points and end tangents"""
+    p0 = points[first]
+    p3 = points[last]
+    c00 = c01 = c11 = x0 = x1 = 0.0
+    for i, t in enumerate(u):
+        mt = 1.0 - t
+        b1 = 3.0 * mt * mt * t
+        b2 = 3.0 * mt * t * t
+        a0 = (left[0] * b1, left[1] * b1)
+        a1 = (right[0] * b2, right[1] * b2)
+        c00 += _dot(a0, a0)
+        c01 += _dot(a0, a1)
+        c11 += _dot(a1, a1)
+        b0 = mt * mt * mt
+        b3 = t * t * t
+        p = points[first + i]
+        tmp = (p[0] - p0[0] * (b0 + b1) - p3[0] * (b2 + b3),
+               p[1] - p0[1] * (b0 + b1) - p3[1] * (b2 + b3))
+        x0 += _dot(a0, tmp)
+        x1 += _dot(a1, tmp)
+    det = c00 * c11 - c01 * c01
+    alpha_l = alpha_r = 0.0
+    if det != 0.0:
+        alpha_l = (x0 * c11 - x1 * c01) / det
+        alpha_r = (c00 * x1 - c01 * x0) / det
+    seg_length = math.hypot(p3[0] - p0[0], p3[1] - p0[1])
+    epsilon = 1e-6 * seg_length
+    if alpha_l < epsilon or alpha_r < epsilon:
+        # Fall back to the Wu/Barsky heuristic
+        alpha_l = alpha_r = seg_length / 3.0
+    return (p0, _add(p0, _scale(left, alpha_l)), _add(p3, _scale(right, alpha_r)), p3)
+
+
+def _max_error(points, first, last, seg, u):
+    max_dist = 0.0
+    split = (last - first + 1) // 2 + first
+    for i in range(1, len(u) - 1):
+        q = bezier_point(seg, u[i])
+        p = points[first + i]
+        dist = (q[0] - p[0]) ** 2 + (q[1] - p[1]) ** 2
+        if dist >= max_dist:
+            max_dist = dist
+            split = first + i
+    return max_dist, split
+
+
+def _reparameterize(points, first, seg, u):
+    result = []
+    for i, t in enumerate(u):
+        q = bezier_point(seg, t)
+        d1, d2 = _bezier_derivatives(seg, t)
+        d = _sub(q, points[first + i])
+        denominator = _dot(d1, d1) + _dot(d, d2)
+        result.append(t if denominator == 0.0 else t - _dot(d, d1) / denominator)
+    return result
+
+
+def _fit_range(points, first, last, left, right, error, out):
+    """Fit points[first:last + 1]; appends (segment, first, last) to out in order"""
+    error_sq = error * error
+    stack = [(first, last, left, right)]
+    while stack:
+        first, last, left, right = stack.pop()
+        p0 = points[first]
+        p3 = points[last]
+        if last - first == 1:
+            dist = math.hypot(p3[0] - p0[0], p3[1] - p0[1]) / 3.0
+            out.append(((p0, _add(p0, _scale(left, dist)), _add(p3, _scale(right, dist)), p3), first, last))
+            continue
+        u = _chord_length_parameterize(points, first, last)
+        seg = _generate_bezier(points, first, last, u, left, right)
+        max_err, split = _max_error(points, first, last, seg, u)
+        if max_err < error_sq:
+            out.append((seg, first, last))
+            continue
+        if max_err < error_sq * 4.0:
+            for _ in range(MAX_ITERATIONS):
+                u = _reparameterize(points, first, seg, u)
+                seg = _generate_bezier(points, first, last, u, left, right)
+                max_err, split = _max_error(points, first, last, seg, u)
+                if max_err < error_sq:
+                    break
+            if max_err < error_sq:
+                out.append((seg, first, last))
+                continue
+        center = _normalize(_sub(points[split - 1], points[split + 1]))
+        if center == (0.0, 0.0):
+            center = _normalize(_sub(points[split - 1], points[split]))
+        # Right half is pushed first so the left half is emitted first
+        stack.append((split, last, _scale(center, -1.0), right))
+        stack.append((first, split, left, center))
+
+
+def _dedupe(points):
+    result = []
+    for p in points:
+        p = (float(p[0]), float(p[1]))
+        if not result or p != result[-1]:
+            result.append(p)
+    return result
+
+
+def fit_curve(points, error=1.5):
+    """Fit cubic segments to a sequence of (x, y) samples within error pixels.
+
+    Returns a list of (p0, c1, c2, p3) tuples; consecutive segments share
+    their end points and tangents.
+    """
+    points = _dedupe(points)
+    if len(points) < 2:
+        return []
+    left = _normalize(_sub(points[1], points[0]))
+    right = _normalize(_sub(points[-2], points[-1]))
+    out = []
+    _fit_range(points, 0, len(points) - 1, left, right, error, out)
+    return [seg for seg, _, _ in out]
+
+
+class CurveFitter:
+    """Incremental fitter fed one sample at a time while a stroke is drawn.
+
+    The raw tail is refitted every ``refit_interval`` samples; every segment
+    except the last one is then frozen so the work per sample stays bounded.
+    """
+
+    def __init__(self, error=1.5, refit_interval=32, max_tail=256):
+        self.error = error
+        self.refit_interval = refit_interval
+        self.max_tail = max_tail
+        self.segments = []
+        self._tail = []
+        self._left = None  # Tangent carried over from the last frozen segment
+        self._pending = 0
+
+    def add_point(self, x, y):
+        p = (float(x), float(y))
+        if self._tail and p == self._tail[-1]:
+            return
+        self._tail.append(p)
+        self._pending += 1
+        if self._pending >= self.refit_interval:
+            self._pending = 0
+            self._refit()
+
+    def _fit_tail(self):
+        tail = self._tail
+        left = self._left or _normalize(_sub(tail[1], tail[0]))
+        right = _normalize(_sub(tail[-2], tail[-1]))
+        out = []
+        _fit_range(tail, 0, len(tail) - 1, left, right, self.error, out)
+        return out
+
+    def _refit(self):
+        if len(self._tail) < 4:
+            return
+        out = self._fit_tail()
+        if len(out) > 1:
+            keep_from = out[-1][1]
+        elif len(self._tail) >= self.max_tail:
+            keep_from = len(self._tail) - 1
+        else:
+            return
+        frozen = [seg for seg, _, last in out if last <= keep_from]
+        self.segments.extend(frozen)
+        last_seg = frozen[-1]
+        self._left = _normalize(_sub(last_seg[3], last_seg[2]))
+        self._tail = self._tail[keep_from:]
+
+    def finish(self):
+        """Fit whatever is left and return all segments of the stroke"""
+        if len(self._tail) >= 2:
+            self.segments.extend(seg for seg, _, _ in self._fit_tail())
+        self._tail = self._tail[-1:]
+        return self.segments
+
+
+def flatten(segments, spacing=4.0):
+    """Sample segments into a flat [x0, y0, x1, y1, ...] polyline"""
+    if not segments:
+        return []
+    coords = [segments[0][0][0], segments[0][0][1]]
+    for seg in segments:
+        p0, c1, c2, p3 = seg
+        hull = (math.hypot(c1[0] - p0[0], c1[1] - p0[1]) + math.hypot(c2[0] - c1[0], c2[1] - c1[1]) +
+                math.hypot(p3[0] - c2[0], p3[1] - c2[1]))
+        steps = max(1, min(64, int(hull / spacing)))
+        for i in range(1, steps + 1):
+            x, y = bezier_point(seg, i / steps)
+            coords.append(x)
+            coords.append(y)
+    return coords
@@ -0,0 +1,196 @@
+"""
+Editing history for TutorDraw
+Linear history stored as per-shape deltas with periodic keyframe snapshots,
+so undo/redo cost O(change) and any position can be rebuilt in bounded time
+"""
+
+from src import scene_events
+
+
+class History:
+    """Delta/keyframe history of a Scene.
+
+    Entry ``i`` turns the state at position ``i`` into the state at ``i + 1``
+    and maps shape id -> ``(before, after)``, where each side is
+    ``(z, payload)`` or None when the shape does not exist.  Payloads are made
+    by ``snapshot(shape)`` and turned back into live shapes by
+    ``restore(payload)`` only when a seek reaches them; with a packing
+    snapshot (see shape_codec) inactive history stays in compact binary form.
+    Without ``restore``, ``snapshot`` must return independent copies and is
+    used both ways.  A full keyframe (id -> (z, payload)) is kept every
+    ``keyframe_interval`` entries; payloads are shared, never duplicated.
+
+    ``on_change``, if given, is called with id -> ``(z, payload)`` or None
+    for the shapes whose recorded state a commit or seek changed, so e.g.
+    an autosave journal can reuse the payloads instead of packing again.
+    """
+
+    def __init__(self, snapshot, restore=None, keyframe_interval=20, max_entries=2000, on_change=None):
+        self._snapshot = snapshot
+        self._restore = restore or snapshot
+        self._on_change = on_change
+        self.keyframe_interval = keyframe_interval
+        self.max_entries = max_entries
+        self.reset()
+
+    def reset(self, scene=None, snapshot=None):
+        """Start a new history whose base state is the scene's current content.
+
+        ``snapshot`` replaces the payload function for the base state only,
+        e.g. with references into a just-loaded file so nothing is packed up
+        front; ``restore`` must accept those payloads as well.
+        """
+        self._entries = []
+        self._shadow = {}
+        if scene is not None:
+            snapshot = snapshot or self._snapshot
+            for shape in scene:
+                self._shadow[shape.id] = (scene.z_of(shape.id), snapshot(shape))
+        self._keyframes = {0: dict(self._shadow)}
+        self._dirty = set()
+        self.position = 0
+
+    def adopt(self, items):
+        """Make shapes part of every recorded state without an undo step.
+
+        ``items`` maps id -> (z, payload) for shapes that were in the scene
+        all along but arrived late, e.g. streamed in by a background restore;
+        undo and seeks keep them instead of removing them.
+        """
+        self._shadow.update(items)
+        for frame in self._keyframes.values():
+            frame.update(items)
+        self._dirty.difference_update(items)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self._entries)
+
+    def has_uncommitted(self):
+        return bool(self._dirty)
+
+    def on_scene_changed(self, events):
+        """Change-bus subscriber collecting the ids touched since the last commit"""
+        for event in events:
+            if event.kind == scene_events.CLEARED:
+                self._dirty.update(self._shadow)
+            else:
+                self._dirty.update(event.shape_ids)
+
+    def commit(self, scene):
+        """Record the collected changes as one history entry; returns True if any"""
+        delta = {}
+        for shape_id in self._dirty:
+            before = self._shadow.get(shape_id)
+            shape = scene.get(shape_id)
+            after = (scene.z_of(shape_id), self._snapshot(shape)) if shape is not None else None
+            if before is None and after is None:
+                continue
+            if before is not None and after is not None and before == after:
+                # e.g. a click in select mode that moved nothing
+                continue
+            delta[shape_id] = (before, after)
+            if after is None:
+                del self._shadow[shape_id]
+            else:
+                self._shadow[shape_id] = after
+        self._dirty.clear()
+        if not delta:
+            return False
+        # A new edit discards the redo branch
+        del self._entries[self.position:]
+        for pos in [p for p in self._keyframes if p > self.position]:
+            del self._keyframes[pos]
+        self._entries.append(delta)
+        self.position += 1
+        if self.position % self.keyframe_interval == 0:
+            self._keyframes[self.position] = dict(self._shadow)
+        self._trim()
+        self._changed({shape_id: after for shape_id, (_, after) in delta.items()})
+        return True
+
+    def _changed(self, changes):
+        if changes and self._on_change is not None:
+            self._on_change(changes)
+
+    def _trim(self):
+        """Drop the oldest block of entries once the history grows past its limit"""
+        step = self.keyframe_interval
+        if len(self._entries) <= self.max_entries + step or self.position < step:
+            return
+        del self._entries[:step]
+        self._keyframes = {pos - step: frame for pos, frame in self._keyframes.items() if pos >= step}
+        self.position -= step
+
+    def state_at(self, position):
+        """Scene content (id -> (z, payload)) at a history position.
+
+        Starts from the nearest keyframe at or before position and applies at
+        most ``keyframe_interval`` deltas.
+        """
+        position = max(0, min(position, len(self._entries)))
+        base = max(p for p in self._keyframes if p <= position)
+        state = dict(self._keyframes[base])
+        for delta in self._entries[base:position]:
+            for shape_id, (_, after) in delta.items():
+                if after is None:
+                    state.pop(shape_id, None)
+                else:
+                    state[shape_id] = after
+        return state
+
+    def _apply(self, scene, delta, forward, changes):
+        for shape_id, (before, after) in delta.items():
+            target = after if forward else before
+            scene.delete(shape_id)
+            if target is None:
+                self._shadow.pop(shape_id, None)
+            else:
+                z, payload = target
+                scene.add(self._restore(payload), z=z)
+                self._shadow[shape_id] = target
+            changes[shape_id] = target
+
+    def seek(self, scene, position):
+        """Move the scene to any history position; returns the new position.
+
+        Nearby positions are reached by replaying deltas on the live scene;
+        far jumps rebuild from the closest keyframe instead.
+        """
+        position = max(0, min(position, len(self._entries)))
+        if position == self.position:
+            return position
+        changes = {}
+        if abs(position - self.position) <= self.keyframe_interval:
+            while self.position < position:
+                self._apply(scene, self._entries[self.position], True, changes)
+                self.position += 1
+            while self.position > position:
+                self.position -= 1
+                self._apply(scene, self._entries[self.position], False, changes)
+        else:
+            state = self.state_at(position)
+            scene.clear()
+            for shape_id, (z, payload) in sorted(state.items(), key=lambda item: item[1][0]):
+                scene.add(self._restore(payload), z=z)
+            changes = {shape_id: None for shape_id in self._shadow if shape_id not in state}
+            changes.update((shape_id, target) for shape_id, target in state.items()
+                           if self._shadow.get(shape_id) != target)
+            self._shadow = state
+            self.position = position
+        # The replay above is not a new edit
+        scene.changes.flush()
+        self._dirty.clear()
+        self._changed(changes)
+        return self.position
+
+    def undo(self, scene):
+        return self.seek(scene, self.position - 1)
+
+    def redo(self, scene):
+        return self.seek(scene, self.position + 1)
@@ -0,0 +1,70 @@
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLabel, QSlider, QPushButton, QFrame, QApplication
+from PyQt5.QtCore import Qt, QPoint
+
+class HistoryScrubber(QWidget):
+    """Floating slider that jumps the canvas to any point of its editing history"""
+
+    def __init__(self, canvas):
+        super().__init__()
+        self.canvas = canvas
+        self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setFixedSize(420, 56)
+        screen = QApplication.primaryScreen().geometry()
+        self.move(screen.center().x() - self.width() // 2, screen.bottom() - self.height() - 40)
+        self.oldPos = QPoint(0, 0)
+
+        main_layout = QHBoxLayout(self)
+        main_layout.setContentsMargins(5, 5, 5, 5)
+
+        self.bg_frame = QFrame(self)
+        self.bg_frame.setStyleSheet("background-color: rgba(40, 40, 40, 200); border-radius: 15px;")
+        controls_layout = QHBoxLayout(self.bg_frame)
+        controls_layout.setContentsMargins(12, 5, 10, 5)
+        controls_layout.setSpacing(10)
+
+        title = QLabel("🕘", self)
+        title.setStyleSheet("color: white; font-size: 16px; background: transparent;")
+        controls_layout.addWidget(title)
+
+        self.slider = QSlider(Qt.Horizontal, self)
+        # Seek only when the value changes, dragging replays at most a keyframe interval per step
+        self.slider.valueChanged.connect(self._on_value_changed)
+        controls_layout.addWidget(self.slider)
+
+        self.step_label = QLabel("0 / 0", self)
+        self.step_label.setFixedWidth(70)
+        self.step_label.setStyleSheet("color: white; font-weight: bold; font-size: 12px; background: transparent;")
+        controls_layout.addWidget(self.step_label)
+
+        close_btn = QPushButton("✕", self)
+        close_btn.setFixedSize(24, 24)
+        close_btn.setCursor(Qt.PointingHandCursor)
+        close_btn.setStyleSheet("background-color: #555; color: white; border-radius: 12px; border: none;")
+        close_btn.clicked.connect(self.hide)
+        controls_layout.addWidget(close_btn)
+
+        main_layout.addWidget(self.bg_frame)
+
+    def sync(self):
+        """Refresh range and position from the canvas history"""
+        self.slider.blockSignals(True)
+        self.slider.setRange(0, self.canvas.history_length())
+        self.slider.setValue(self.canvas.history.position)
+        self.slider.blockSignals(False)
+        self.step_label.setText(f"{self.canvas.history.position} / {self.canvas.history_length()}")
+
+    def _on_value_changed(self, value):
+        self.canvas.seek_history(value)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.oldPos = event.globalPos()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() == Qt.LeftButton:
+            delta = event.globalPos() - self.oldPos
+            self.move(self.pos() + delta)
+            self.oldPos = event.globalPos()
+        super().mouseMoveEvent(event)
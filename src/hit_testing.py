@@ -0,0 +1,233 @@
+"""
+Hit testing for TutorDraw shapes
+Exact point-to-outline tests with a bounding-box prefilter
+"""
+
+import math
+
+BASE_TOLERANCE = 8  # Pixels added on top of half the stroke width
+
+
+def hit_tolerance(stroke_width):
+    """Pick tolerance for a stroke drawn with the given pen width"""
+    return BASE_TOLERANCE + stroke_width / 2.0
+
+
+def in_bounds(bounds, x, y, tol=0.0):
+    """Bounding-box prefilter; bounds is an (x0, y0, x1, y1) tuple"""
+    x0, y0, x1, y1 = bounds
+    return x0 - tol <= x <= x1 + tol and y0 - tol <= y <= y1 + tol
+
+
+def segment_distance_sq(ax, ay, bx, by, x, y):
+    """Squared distance from (x, y) to the segment a-b; safe for a == b"""
+    dx = bx - ax
+    dy = by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0.0:
+        px = x - ax
+        py = y - ay
+        return px * px + py * py
+    t = ((x - ax) * dx + (y - ay) * dy) / length_sq
+    if t < 0.0:
+        t = 0.0
+    elif t > 1.0:
+        t = 1.0
+    px = ax + t * dx - x
+    py = ay + t * dy - y
+    return px * px + py * py
+
+
+def point_near_segment(ax, ay, bx, by, x, y, tol):
+    return segment_distance_sq(ax, ay, bx, by, x, y) <= tol * tol
+
+
+def point_near_polyline(coords, x, y, tol, bounds=None):
+    """True if (x, y) lies within tol of the polyline.
+
+    ``coords`` is a flat ``[x0, y0, x1, y1, ...]`` sequence.  The whole array
+    is tested in a single pass over its segments, comparing squared
+    distances so no square roots are taken.
+    """
+    if bounds is not None and not in_bounds(bounds, x, y, tol):
+        return False
+    n = len(coords)
+    if n < 2:
+        return False
+    tol_sq = tol * tol
+    ax = coords[0]
+    ay = coords[1]
+    if n == 2:
+        return (x - ax) ** 2 + (y - ay) ** 2 <= tol_sq
+    for i in range(2, n, 2):
+        bx = coords[i]
+        by = coords[i + 1]
+        # Cheap per-segment box rejection before the projection
+        if ((ax < x - tol and bx < x - tol) or (ax > x + tol and bx > x + tol) or
+                (ay < y - tol and by < y - tol) or (ay > y + tol and by > y + tol)):
+            ax = bx
+            ay = by
+            continue
+        if segment_distance_sq(ax, ay, bx, by, x, y) <= tol_sq:
+            return True
+        ax = bx
+        ay = by
+    return False
+
+
+def point_in_rect(rect, x, y, tol=0.0):
+    """rect is (x0, y0, x1, y1), normalized or not"""
+    x0, y0, x1, y1 = rect
+    return in_bounds((min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)), x, y, tol)
+
+
+def point_in_ellipse(rect, x, y, tol=0.0):
+    """Inside the ellipse inscribed in rect, grown by tol on each semi-axis"""
+    x0, y0, x1, y1 = rect
+    a = abs(x1 - x0) / 2.0 + tol
+    b = abs(y1 - y0) / 2.0 + tol
+    if a <= 0.0 or b <= 0.0:
+        return False
+    dx = (x - (x0 + x1) / 2.0) / a
+    dy = (y - (y0 + y1) / 2.0) / b
+    return dx * dx + dy * dy <= 1.0
+
+
+def point_in_circle(cx, cy, radius, x, y, tol=0.0):
+    r = radius + tol
+    return (x - cx) ** 2 + (y - cy) ** 2 <= r * r
+
+
+def point_in_diamond(rect, x, y, tol=0.0):
+    """Inside the diamond inscribed in rect or within tol of its edges"""
+    x0, y0, x1, y1 = rect
+    cx = (x0 + x1) / 2.0
+    cy = (y0 + y1) / 2.0
+    hw = abs(x1 - x0) / 2.0
+    hh = abs(y1 - y0) / 2.0
+    if hw > 0.0 and hh > 0.0 and abs(x - cx) / hw + abs(y - cy) / hh <= 1.0:
+        return True
+    outline = (cx, cy - hh, cx + hw, cy, cx, cy + hh, cx - hw, cy, cx, cy - hh)
+    return point_near_polyline(outline, x, y, tol)
+
+
+def segment_in_bounds(bounds, ax, ay, bx, by, tol=0.0):
+    """True if the segment a-b touches the box grown by tol (Liang-Barsky clip)"""
+    x0, y0, x1, y1 = bounds
+    x0 -= tol
+    y0 -= tol
+    x1 += tol
+    y1 += tol
+    t0, t1 = 0.0, 1.0
+    dx = bx - ax
+    dy = by - ay
+    for p, q in ((-dx, ax - x0), (dx, x1 - ax), (-dy, ay - y0), (dy, y1 - ay)):
+        if p == 0.0:
+            if q < 0.0:
+                return False
+        else:
+            t = q / p
+            if p < 0.0:
+                if t > t1:
+                    return False
+                if t > t0:
+                    t0 = t
+            else:
+                if t < t0:
+                    return False
+                if t < t1:
+                    t1 = t
+    return True
+
+
+def segments_intersect(ax, ay, bx, by, cx, cy, dx, dy):
+    """True if the segments a-b and c-d cross or touch"""
+    def side(px, py, qx, qy, rx, ry):
+        return (qx - px) * (ry - py) - (qy - py) * (rx - px)
+    d1 = side(cx, cy, dx, dy, ax, ay)
+    d2 = side(cx, cy, dx, dy, bx, by)
+    d3 = side(ax, ay, bx, by, cx, cy)
+    d4 = side(ax, ay, bx, by, dx, dy)
+    if ((d1 > 0.0 and d2 < 0.0) or (d1 < 0.0 and d2 > 0.0)) and \
+            ((d3 > 0.0 and d4 < 0.0) or (d3 < 0.0 and d4 > 0.0)):
+        return True
+    # Collinear or touching cases are caught by the endpoint distances
+    return False
+
+
+def segment_segment_distance_sq(ax, ay, bx, by, cx, cy, dx, dy):
+    """Squared distance between the segments a-b and c-d"""
+    if segments_intersect(ax, ay, bx, by, cx, cy, dx, dy):
+        return 0.0
+    return min(segment_distance_sq(ax, ay, bx, by, cx, cy),
+               segment_distance_sq(ax, ay, bx, by, dx, dy),
+               segment_distance_sq(cx, cy, dx, dy, ax, ay),
+               segment_distance_sq(cx, cy, dx, dy, bx, by))
+
+
+def segment_near_polyline(coords, ax, ay, bx, by, tol):
+    """True if the segment a-b passes within tol of the flat polyline ``coords``"""
+    n = len(coords)
+    if n < 2:
+        return False
+    tol_sq = tol * tol
+    if n == 2:
+        return segment_distance_sq(ax, ay, bx, by, coords[0], coords[1]) <= tol_sq
+    lx = min(ax, bx) - tol
+    rx = max(ax, bx) + tol
+    ly = min(ay, by) - tol
+    ry = max(ay, by) + tol
+    cx = coords[0]
+    cy = coords[1]
+    for i in range(2, n, 2):
+        dx = coords[i]
+        dy = coords[i + 1]
+        if not ((cx < lx and dx < lx) or (cx > rx and dx > rx) or
+                (cy < ly and dy < ly) or (cy > ry and dy > ry)):
+            if segment_segment_distance_sq(ax, ay, bx, by, cx, cy, dx, dy) <= tol_sq:
+                return True
+        cx = dx
+        cy = dy
+    return False
+
+
+def segment_in_ellipse(rect, ax, ay, bx, by, tol=0.0):
+    """True if the segment a-b enters the ellipse inscribed in rect, grown by tol"""
+    x0, y0, x1, y1 = rect
+    a = abs(x1 - x0) / 2.0 + tol
+    b = abs(y1 - y0) / 2.0 + tol
+    if a <= 0.0 or b <= 0.0:
+        return False
+    cx = (x0 + x1) / 2.0
+    cy = (y0 + y1) / 2.0
+    # In coordinates where the ellipse is the unit circle
+    return segment_distance_sq((ax - cx) / a, (ay - cy) / b, (bx - cx) / a, (by - cy) / b, 0.0, 0.0) <= 1.0
+
+
+def segment_in_diamond(rect, ax, ay, bx, by, tol=0.0):
+    """True if the segment a-b enters the diamond inscribed in rect or passes within tol of it"""
+    if point_in_diamond(rect, ax, ay, tol):
+        return True
+    x0, y0, x1, y1 = rect
+    cx = (x0 + x1) / 2.0
+    cy = (y0 + y1) / 2.0
+    hw = abs(x1 - x0) / 2.0
+    hh = abs(y1 - y0) / 2.0
+    outline = (cx, cy - hh, cx + hw, cy, cx, cy + hh, cx - hw, cy, cx, cy - hh)
+    return segment_near_polyline(outline, ax, ay, bx, by, tol)
+
+
+def point_in_polygon(coords, x, y):
+    """Even-odd test of (x, y) against the closed flat polygon ``coords``"""
+    n = len(coords)
+    inside = False
+    jx = coords[n - 2]
+    jy = coords[n - 1]
+    for i in range(0, n, 2):
+        ix = coords[i]
+        iy = coords[i + 1]
+        if (iy > y) != (jy > y) and x < (jx - ix) * (y - iy) / (jy - iy) + ix:
+            inside = not inside
+        jx = ix
+        jy = iy
+    return inside
@@ -0,0 +1,128 @@
+"""
+Image export for TutorDraw
+A cancellable job on a worker thread with progress reporting, and a PNG
+encoder that compresses a strip of rows at a time so it can report
+progress and stop early
+"""
+
+import os
+import struct
+import tempfile
+import threading
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+IDAT_SIZE = 1 << 16  # Compressed bytes collected per IDAT chunk
+STRIP_ROWS = 64      # Rows compressed between progress reports
+
+
+class ExportCancelled(Exception):
+    """Raised on the worker by ExportJob.check() once the job is cancelled"""
+
+
+class ExportJob:
+    """Runs ``work(job)`` on a worker thread.
+
+    The work reports its progress (0-1) with ``job.report`` and calls
+    ``job.check`` between steps, which ends it with ExportCancelled once
+    ``cancel`` was called.  The GUI reads ``progress``, ``done``, ``error``
+    and ``result`` (the work's return value) from its timer, like
+    BackgroundLoader results; nothing is called back on the worker.
+    """
+
+    def __init__(self, work):
+        self._work = work
+        self._thread = None
+        self.progress = 0.0
+        self.cancelled = False
+        self.done = False
+        self.error = None
+        self.result = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="export", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report(self, fraction):
+        self.progress = min(1.0, max(0.0, fraction))
+
+    def check(self):
+        if self.cancelled:
+            raise ExportCancelled()
+
+    def _run(self):
+        try:
+            self.result = self._work(self)
+        except ExportCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+        self.done = True
+
+    def wait(self, timeout=None):
+        """Block until the job is done; for shutdown and tests"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.done
+
+
+def _chunk(out, kind, data):
+    out.write(struct.pack(">I", len(data)))
+    out.write(kind)
+    out.write(data)
+    out.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+
+def write_png(out, width, height, rows, job=None, start=0.0, end=1.0, level=6):
+    """Encode 8-bit RGBA rows (``height`` buffers of ``width * 4`` bytes) as PNG into a binary file.
+
+    With a job, progress is reported from ``start`` to ``end`` and
+    cancellation is checked after every strip of rows.
+    """
+    out.write(PNG_SIGNATURE)
+    _chunk(out, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+    compressor = zlib.compressobj(level)
+    pending = bytearray()
+    strip = bytearray()
+    stride = width * 4
+    for y, row in enumerate(rows):
+        if len(row) != stride:
+            raise ValueError(f"Row {y} has {len(row)} bytes, expected {stride}")
+        # Filter type 0: rows are stored as they are
+        strip.append(0)
+        strip += row
+        if (y + 1) % STRIP_ROWS == 0 or y + 1 == height:
+            # zlib releases the GIL while compressing, so the GUI keeps running
+            pending += compressor.compress(bytes(strip))
+            strip.clear()
+            while len(pending) >= IDAT_SIZE:
+                _chunk(out, b"IDAT", bytes(pending[:IDAT_SIZE]))
+                del pending[:IDAT_SIZE]
+            if job is not None:
+                job.check()
+                job.report(start + (end - start) * (y + 1) / height)
+    pending += compressor.flush()
+    if pending:
+        _chunk(out, b"IDAT", bytes(pending))
+    _chunk(out, b"IEND", b"")
+
+
+def save_png(path, width, height, rows, job=None, start=0.0, end=1.0):
+    """write_png into path; a cancelled or failed export leaves no partial file behind.
+
+    Each export writes its own temporary file next to path, so exports
+    running at the same time never write into each other's file.
+    """
+    fd, tmp = tempfile.mkstemp(suffix=".part", prefix=os.path.basename(path) + ".",
+                               dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_png(f, width, height, rows, job, start, end)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
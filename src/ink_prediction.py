@@ -0,0 +1,69 @@
+"""
+Predictive ink for TutorDraw
+Extrapolates the pen tip a few milliseconds ahead from recent velocity so the
+in-progress stroke keeps up with the pen; predictions are only ever drawn
+"""
+
+from collections import deque
+
+
+class StrokePredictor:
+    """Short-horizon linear predictor over the most recent samples.
+
+    Velocity is the least-squares slope of x(t) and y(t) over the samples
+    of the last ``window`` seconds.  No prediction is made when the pen is
+    (nearly) still, when the newest sample is older than the horizon, or
+    for a zero horizon; the predicted offset is capped at ``max_distance``.
+    """
+
+    def __init__(self, horizon=0.016, window=0.012, max_distance=48.0, min_speed=30.0):
+        self.horizon = horizon
+        self.window = window
+        self.max_distance = max_distance
+        self.min_speed = min_speed  # px/s below which the pen counts as resting
+        self._samples = deque()
+
+    def reset(self):
+        self._samples.clear()
+
+    def add_sample(self, x, y, t):
+        samples = self._samples
+        if samples and t <= samples[-1][2]:
+            # Same timestamp (coalesced events): keep the newest position only
+            samples.pop()
+        samples.append((x, y, t))
+        while len(samples) > 2 and t - samples[0][2] > self.window:
+            samples.popleft()
+
+    def velocity(self):
+        """Least-squares (vx, vy) in px/s, or None with fewer than two samples"""
+        samples = self._samples
+        n = len(samples)
+        if n < 2:
+            return None
+        mt = sum(s[2] for s in samples) / n
+        mx = sum(s[0] for s in samples) / n
+        my = sum(s[1] for s in samples) / n
+        stt = sum((s[2] - mt) ** 2 for s in samples)
+        if stt <= 0:
+            return None
+        vx = sum((s[2] - mt) * (s[0] - mx) for s in samples) / stt
+        vy = sum((s[2] - mt) * (s[1] - my) for s in samples) / stt
+        return vx, vy
+
+    def predict(self, now=None):
+        """Predicted tip (x, y) ``horizon`` seconds past the newest sample, or None"""
+        if self.horizon <= 0 or not self._samples:
+            return None
+        x, y, t = self._samples[-1]
+        if now is not None and now - t > self.horizon:
+            return None
+        v = self.velocity()
+        if v is None:
+            return None
+        vx, vy = v
+        speed = (vx * vx + vy * vy) ** 0.5
+        if speed < self.min_speed:
+            return None
+        distance = min(speed * self.horizon, self.max_distance)
+        return x + vx / speed * distance, y + vy / speed * distance
@@ -0,0 +1,51 @@
+"""
+Pointer input pipeline for TutorDraw
+Buffers high-rate mouse and tablet samples in a compact array so strokes keep
+every sample while per-sample bookkeeping and repaints happen once per frame
+"""
+
+from array import array
+
+SAMPLE_STRIDE = 4  # x, y, pressure, timestamp in seconds
+
+
+def iter_samples(data):
+    """Yield (x, y, pressure, t) tuples from a flat sample array"""
+    for i in range(0, len(data) - SAMPLE_STRIDE + 1, SAMPLE_STRIDE):
+        yield data[i], data[i + 1], data[i + 2], data[i + 3]
+
+
+class InputPipeline:
+    """Collects pointer samples between frames and hands them over in one batch.
+
+    Event handlers only ``push`` (an append to a float64 array); ``flush``
+    is called once per displayed frame and passes every pending sample to
+    ``consumer`` as one flat array.
+    """
+
+    def __init__(self, consumer):
+        self.consumer = consumer
+        self._pending = array('d')
+        # Largest number of samples delivered in one frame, for diagnostics
+        self.max_batch = 0
+
+    def __len__(self):
+        return len(self._pending) // SAMPLE_STRIDE
+
+    def push(self, x, y, pressure=1.0, t=0.0):
+        self._pending.extend((x, y, pressure, t))
+
+    def flush(self):
+        """Deliver the pending samples; returns how many there were"""
+        if not self._pending:
+            return 0
+        batch = self._pending
+        self._pending = array('d')
+        count = len(batch) // SAMPLE_STRIDE
+        self.max_batch = max(self.max_batch, count)
+        self.consumer(batch)
+        return count
+
+    def clear(self):
+        """Drop pending samples, e.g. when a stroke is cancelled"""
+        self._pending = array('d')
@@ -0,0 +1,117 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QPushButton, QCheckBox, QFrame, QApplication
+)
+from PyQt5.QtCore import Qt, QPoint
+
+class LayersPanel(QWidget):
+    """Floating list of annotation layers: active target, visibility, opacity and order"""
+
+    def __init__(self, canvas):
+        super().__init__()
+        self.canvas = canvas
+        self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setFixedWidth(340)
+        screen = QApplication.primaryScreen().geometry()
+        self.move(screen.right() - self.width() - 40, screen.top() + 140)
+        self.oldPos = QPoint(0, 0)
+
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(5, 5, 5, 5)
+
+        self.bg_frame = QFrame(self)
+        self.bg_frame.setStyleSheet("background-color: rgba(40, 40, 40, 200); border-radius: 15px;")
+        self.frame_layout = QVBoxLayout(self.bg_frame)
+        self.frame_layout.setContentsMargins(12, 8, 12, 8)
+        self.frame_layout.setSpacing(6)
+
+        header = QHBoxLayout()
+        title = QLabel("🗂️ Layers", self)
+        title.setStyleSheet("color: white; font-weight: bold; font-size: 13px; background: transparent;")
+        header.addWidget(title)
+        header.addStretch()
+        add_btn = self._button("＋", "Add layer")
+        add_btn.clicked.connect(self.canvas.add_layer)
+        header.addWidget(add_btn)
+        close_btn = self._button("✕", "Close")
+        close_btn.clicked.connect(self.hide)
+        header.addWidget(close_btn)
+        self.frame_layout.addLayout(header)
+
+        self.rows_layout = QVBoxLayout()
+        self.rows_layout.setSpacing(4)
+        self.frame_layout.addLayout(self.rows_layout)
+
+        main_layout.addWidget(self.bg_frame)
+
+    def _button(self, text, tooltip):
+        btn = QPushButton(text, self)
+        btn.setFixedSize(24, 24)
+        btn.setToolTip(tooltip)
+        btn.setCursor(Qt.PointingHandCursor)
+        btn.setStyleSheet("background-color: #555; color: white; border-radius: 12px; border: none;")
+        return btn
+
+    def sync(self):
+        """Rebuild the rows from the canvas layer stack (top layer first)"""
+        while self.rows_layout.count():
+            row = self.rows_layout.takeAt(0).widget()
+            if row:
+                row.deleteLater()
+        for layer in reversed(self.canvas.layers.layers):
+            self.rows_layout.addWidget(self._make_row(layer))
+        self.adjustSize()
+
+    def _make_row(self, layer):
+        row = QWidget(self)
+        layout = QHBoxLayout(row)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(6)
+
+        visible = QCheckBox(row)
+        visible.setToolTip("Show layer")
+        visible.setChecked(layer.visible)
+        visible.toggled.connect(lambda checked, lid=layer.id: self.canvas.set_layer_visible(lid, checked))
+        layout.addWidget(visible)
+
+        active = layer.id == self.canvas.layers.active_id
+        name = QPushButton(layer.name, row)
+        name.setToolTip("Draw on this layer")
+        name.setCursor(Qt.PointingHandCursor)
+        name.setStyleSheet("color: white; text-align: left; border: none; background: %s; padding: 2px 6px; border-radius: 6px;"
+                           % ("rgba(0, 120, 215, 180)" if active else "transparent"))
+        name.clicked.connect(lambda _, lid=layer.id: self.canvas.set_active_layer(lid))
+        layout.addWidget(name, 1)
+
+        opacity = QSlider(Qt.Horizontal, row)
+        opacity.setToolTip("Opacity")
+        opacity.setRange(0, 100)
+        opacity.setFixedWidth(80)
+        opacity.setValue(int(layer.opacity * 100))
+        opacity.valueChanged.connect(lambda value, lid=layer.id: self.canvas.set_layer_opacity(lid, value / 100))
+        opacity.sliderReleased.connect(self.canvas.save_config)
+        layout.addWidget(opacity)
+
+        up = self._button("▲", "Move up")
+        up.clicked.connect(lambda _, lid=layer.id: self.canvas.move_layer(lid, 1))
+        layout.addWidget(up)
+        down = self._button("▼", "Move down")
+        down.clicked.connect(lambda _, lid=layer.id: self.canvas.move_layer(lid, -1))
+        layout.addWidget(down)
+        remove = self._button("🗑", "Delete layer and its drawings")
+        remove.setEnabled(len(self.canvas.layers) > 1)
+        remove.clicked.connect(lambda _, lid=layer.id: self.canvas.delete_layer(lid))
+        layout.addWidget(remove)
+        return row
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.oldPos = event.globalPos()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() == Qt.LeftButton:
+            delta = event.globalPos() - self.oldPos
+            self.move(self.pos() + delta)
+            self.oldPos = event.globalPos()
+        super().mouseMoveEvent(event)
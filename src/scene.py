@@ -0,0 +1,160 @@
+"""
+Scene store for TutorDraw
+Keeps shapes under stable integer IDs with O(1) lookup/removal and an
+explicit z-order (bottom-most first when iterated)
+"""
+
+from src.scene_events import SceneChangeBus, ADDED, REMOVED, TRANSFORMED, RESTYLED, CLEARED, union_rect
+
+
+def _shape_rect(shape):
+    bounds = getattr(shape, 'bounds', None)
+    return bounds() if callable(bounds) else None
+
+
+class Scene:
+    """Ordered shape container.
+
+    Shapes get a stable ``id`` attribute on insertion (kept if already set,
+    e.g. for copies restored by undo).  Iteration yields shapes bottom to top;
+    ``reversed()`` yields them topmost first.  The store also offers the small
+    list-like surface (``append``, ``remove``, ``len``, ``in``) the canvas
+    code relies on.  Every mutation is reported on ``self.changes``.
+    """
+
+    def __init__(self, changes=None):
+        self.changes = changes if changes is not None else SceneChangeBus()
+        # id -> shape, kept in z-order; dicts preserve insertion order so
+        # appending on top and deleting never require re-sorting
+        self._shapes = {}
+        self._z = {}
+        self._next_id = 1
+        self._next_z = 0
+        self._needs_sort = False
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def __bool__(self):
+        return bool(self._shapes)
+
+    def __iter__(self):
+        return iter(list(self._ordered().values()))
+
+    def __reversed__(self):
+        return reversed(list(self._ordered().values()))
+
+    def __contains__(self, shape):
+        shape_id = getattr(shape, 'id', None)
+        return shape_id is not None and self._shapes.get(shape_id) is shape
+
+    def _ordered(self):
+        if self._needs_sort:
+            z = self._z
+            self._shapes = dict(sorted(self._shapes.items(), key=lambda item: z[item[0]]))
+            self._needs_sort = False
+        return self._shapes
+
+    def get(self, shape_id):
+        return self._shapes.get(shape_id)
+
+    def ids(self):
+        """Shape IDs bottom to top"""
+        return list(self._ordered().keys())
+
+    def z_of(self, shape_id):
+        return self._z[shape_id]
+
+    def add(self, shape, z=None):
+        """Insert a shape (on top unless z is given) and return its ID"""
+        shape_id = getattr(shape, 'id', None)
+        if shape_id is None:
+            shape_id = self._next_id
+            shape.id = shape_id
+        if shape_id in self._shapes:
+            raise ValueError(f"Shape id {shape_id} is already in the scene")
+        self._next_id = max(self._next_id, shape_id + 1)
+        if z is None:
+            z = self._next_z
+        elif z < self._next_z:
+            self._needs_sort = True
+        self._next_z = max(self._next_z, z + 1)
+        self._shapes[shape_id] = shape
+        self._z[shape_id] = z
+        self.changes.emit(ADDED, (shape_id,), _shape_rect(shape))
+        return shape_id
+
+    def reserve(self, next_id, next_z):
+        """Give shapes inserted from now on ids and z from the given values upward.
+
+        For content still being restored in the background: new shapes must
+        not take its ids and should stay above it.  The counters never move
+        below what the scene already uses.
+        """
+        self._next_id = max(next_id, max(self._shapes, default=0) + 1)
+        self._next_z = max(next_z, max(self._z.values(), default=-1) + 1)
+
+    def append(self, shape):
+        self.add(shape)
+
+    def add_many(self, shapes):
+        """Bulk insert on top, preserving the given order"""
+        return [self.add(shape) for shape in shapes]
+
+    def delete(self, shape_id):
+        """Remove a shape by ID and return it (None if unknown)"""
+        shape = self._shapes.pop(shape_id, None)
+        if shape is not None:
+            del self._z[shape_id]
+            self.changes.emit(REMOVED, (shape_id,), _shape_rect(shape))
+        return shape
+
+    def delete_many(self, shape_ids):
+        """Bulk removal reported as a single event; returns the removed shapes"""
+        removed = []
+        rect = None
+        for shape_id in shape_ids:
+            shape = self._shapes.pop(shape_id, None)
+            if shape is not None:
+                del self._z[shape_id]
+                removed.append(shape)
+                rect = union_rect(rect, _shape_rect(shape))
+        if removed:
+            self.changes.emit(REMOVED, [s.id for s in removed], rect)
+        return removed
+
+    def remove(self, shape):
+        if self.delete(shape.id) is None:
+            raise ValueError("Shape is not in the scene")
+
+    def raise_to_top(self, shape_id):
+        shape = self._shapes.pop(shape_id)
+        self._shapes[shape_id] = shape
+        self._z[shape_id] = self._next_z
+        self._next_z += 1
+        self.changes.emit(TRANSFORMED, (shape_id,), _shape_rect(shape))
+
+    def lower_to_bottom(self, shape_id):
+        self._z[shape_id] = min(self._z.values()) - 1
+        self._needs_sort = True
+        self.changes.emit(TRANSFORMED, (shape_id,), _shape_rect(self._shapes[shape_id]))
+
+    def mark_transformed(self, shape):
+        """Report that a shape's geometry changed (move, resize, rotate)"""
+        self.changes.emit(TRANSFORMED, (shape.id,), _shape_rect(shape))
+
+    def mark_restyled(self, shape):
+        """Report that a shape's appearance changed (color, width, font)"""
+        self.changes.emit(RESTYLED, (shape.id,), _shape_rect(shape))
+
+    def clear(self):
+        self._shapes.clear()
+        self._z.clear()
+        self._next_z = 0
+        self._needs_sort = False
+        self.changes.emit(CLEARED)
+
+    def reset(self, shapes):
+        """Replace the contents, e.g. with an undo snapshot (IDs are kept)"""
+        self.clear()
+        self.add_many(shapes)
@@ -0,0 +1,111 @@
+"""
+Scene change events for TutorDraw
+Typed change notifications coalesced once per frame so caches, the spatial
+index, autosave and export can do incremental work
+"""
+
+ADDED = "added"
+REMOVED = "removed"
+TRANSFORMED = "transformed"
+RESTYLED = "restyled"
+CLEARED = "cleared"
+
+# Order in which coalesced events are delivered within one flush
+_DELIVERY_ORDER = (REMOVED, ADDED, TRANSFORMED, RESTYLED)
+
+
+def union_rect(a, b):
+    """Union of two (x0, y0, x1, y1) rects; either may be None"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+class SceneEvent:
+    def __init__(self, kind, shape_ids=(), rect=None):
+        self.kind = kind
+        self.shape_ids = list(shape_ids)
+        self.rect = rect  # Affected area as (x0, y0, x1, y1), or None if unknown
+
+    def __repr__(self):
+        return f"SceneEvent({self.kind!r}, {self.shape_ids!r}, {self.rect!r})"
+
+
+class SceneChangeBus:
+    """Collects change events and delivers them coalesced on flush().
+
+    Per shape, events within one frame collapse to what a subscriber needs:
+    added + transformed is still just added, added + removed cancels out,
+    and a clear drops everything queued before it.  ``added`` should be
+    treated as an upsert, since undo can remove and re-add the same id.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._cleared = False
+        self._clear_rect = None
+        self._pending = {}  # shape id -> set of kinds
+        self._rects = {}    # kind -> union rect
+        self._flushing = False
+
+    def subscribe(self, callback):
+        """callback(events) receives a list of SceneEvent per flush"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def has_pending(self):
+        return self._cleared or bool(self._pending)
+
+    def emit(self, kind, shape_ids=(), rect=None):
+        if kind == CLEARED:
+            self._cleared = True
+            self._clear_rect = union_rect(self._clear_rect, union_rect(rect, self._rects.get(ADDED)))
+            self._pending.clear()
+            self._rects.clear()
+            return
+        for shape_id in shape_ids:
+            kinds = self._pending.get(shape_id)
+            if kinds is None:
+                self._pending[shape_id] = {kind}
+            elif kind == REMOVED:
+                if ADDED in kinds and REMOVED not in kinds:
+                    # Created and deleted within the same frame
+                    del self._pending[shape_id]
+                else:
+                    self._pending[shape_id] = {REMOVED}
+            elif kind == ADDED:
+                self._pending[shape_id] = {REMOVED, ADDED} if REMOVED in kinds else {ADDED}
+            elif ADDED not in kinds and REMOVED not in kinds:
+                kinds.add(kind)
+        self._rects[kind] = union_rect(self._rects.get(kind), rect)
+
+    def flush(self):
+        """Deliver the coalesced events of this frame to every subscriber"""
+        if self._flushing or not self.has_pending():
+            return []
+        events = []
+        if self._cleared:
+            events.append(SceneEvent(CLEARED, (), self._clear_rect))
+        grouped = {kind: [] for kind in _DELIVERY_ORDER}
+        for shape_id, kinds in self._pending.items():
+            for kind in kinds:
+                grouped[kind].append(shape_id)
+        for kind in _DELIVERY_ORDER:
+            if grouped[kind]:
+                events.append(SceneEvent(kind, grouped[kind], self._rects.get(kind)))
+        self._cleared = False
+        self._clear_rect = None
+        self._pending = {}
+        self._rects = {}
+        self._flushing = True
+        try:
+            for callback in list(self._subscribers):
+                callback(events)
+        finally:
+            self._flushing = False
+        return events
@@ -0,0 +1,61 @@
+"""
+Selection handles for TutorDraw
+Handle positions around a selection box, computed once per selection change
+and resolved with plain arithmetic on every pointer move
+"""
+
+ROTATION_OFFSET = 25  # Distance of the rotation handle above the box
+
+# (column, row) on the 3x3 grid of box corners and edge centers
+_GRID_NAMES = {
+    (0, 0): 'top-left', (1, 0): 'top-center', (2, 0): 'top-right',
+    (0, 1): 'left-center', (2, 1): 'right-center',
+    (0, 2): 'bottom-left', (1, 2): 'bottom-center', (2, 2): 'bottom-right',
+}
+
+
+class HandleLayout:
+    """Handle geometry of one selection box given as (x0, y0, x1, y1).
+
+    ``handles`` lists ``(name, x, y)`` centers for drawing.  ``hit`` maps a
+    pointer position to a handle name, ``'move'`` inside the box, or None.
+    Boxes that are not ``resizable`` (groups, instances) only offer 'move'.
+    """
+
+    def __init__(self, bounds, resizable=True, hit_size=12):
+        x0, y0, x1, y1 = bounds
+        self.bounds = bounds
+        self.resizable = resizable
+        self.half = hit_size / 2
+        self._xs = (x0, (x0 + x1) / 2, x1)
+        self._ys = (y0, (y0 + y1) / 2, y1)
+        self.rotation = ((x0 + x1) / 2, y0 - ROTATION_OFFSET)
+        self.handles = []
+        if resizable:
+            self.handles = [(name, self._xs[c], self._ys[r]) for (c, r), name in _GRID_NAMES.items()]
+            self.handles.append(('rotation',) + self.rotation)
+
+    def _slot(self, v, stops):
+        h = self.half
+        for i, stop in enumerate(stops):
+            if stop - h <= v <= stop + h:
+                return i
+        return None
+
+    def hit(self, x, y):
+        x0, y0, x1, y1 = self.bounds
+        h = self.half
+        if self.resizable:
+            if x0 - h <= x <= x1 + h and y0 - h <= y <= y1 + h:
+                col = self._slot(x, self._xs)
+                if col is not None:
+                    row = self._slot(y, self._ys)
+                    name = _GRID_NAMES.get((col, row))
+                    if name:
+                        return name
+            rx, ry = self.rotation
+            if abs(x - rx) <= h and abs(y - ry) <= h:
+                return 'rotation'
+        if x0 <= x <= x1 and y0 <= y <= y1:
+            return 'move'
+        return None
@@ -0,0 +1,495 @@
+"""
+Session files for TutorDraw
+Versioned binary format with a header, a style table and columnar
+little-endian shape, coordinate and text arrays addressed by per-shape
+offsets; files are memory-mapped and rows decoded only when asked for
+"""
+
+import functools
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b"TDSF"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHHIII")  # magic, version, section count, rows, scene rows, styles
+_SECTION = struct.Struct("<QQ")      # offset, length
+_STYLE = struct.Struct("<IIfHBx")    # color, fill, thickness, font size, style flags
+_ALIGN = 8
+
+_STYLE_FILL = 1
+_STYLE_BOLD = 2
+_STYLE_ITALIC = 4
+
+_ROW_CURVE = 1
+_ROW_TEXT_BOUNDS = 2
+_ROW_PRESSURE = 4
+_ROW_TINT = 8
+
+# Parent column: scene shapes, shared-geometry sources, otherwise the parent group's row
+SCENE = -1
+GEOMETRY = -2
+
+# Shape table columns as (name, typecode, values per row); offset columns
+# hold one extra entry so row i spans [offsets[i], offsets[i + 1])
+_COLUMNS = (
+    ("mode", "B", 1),
+    ("flags", "B", 1),
+    ("parent", "i", 1),
+    ("id", "I", 1),
+    ("layer", "I", 1),
+    ("style", "I", 1),
+    ("ref", "I", 1),       # Groups: first child row; instances: geometry source row
+    ("count", "I", 1),     # Groups: number of children
+    ("tint", "I", 1),
+    ("transform", "f", 3),  # rotation, scale_x, scale_y
+    ("bounds", "f", 4),     # Cached geometry bounds, NaN when unknown
+    ("text_bounds", "f", 4),
+    ("coord_offsets", "Q", 1),
+    ("text_offsets", "Q", 1),
+    ("pressure_offsets", "Q", 1),
+)
+_OFFSET_COLUMNS = ("coord_offsets", "text_offsets", "pressure_offsets")
+# Sections after the columns
+_META, _STYLES, _COORDS, _TEXT, _PRESSURES = range(len(_COLUMNS), len(_COLUMNS) + 5)
+_SECTION_COUNT = len(_COLUMNS) + 5
+
+_LITTLE = sys.byteorder == "little"
+
+
+def _le_bytes(values):
+    """Little-endian bytes of an array"""
+    if not _LITTLE:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _rows(records, geometries=None):
+    """Flatten records into (record, parent) rows: scene shapes first, then nested content.
+
+    Returns the rows plus each group's first child row and each instance's
+    geometry row.  Instances sharing a geometry key share one source row,
+    taken from the instance's embedded children or else from ``geometries``.
+    """
+    rows = [(record, SCENE) for record in records]
+    refs = {}
+    geometry_rows = {}
+    i = 0
+    while i < len(rows):
+        record = rows[i][0]
+        if record["mode"] == "group":
+            refs[i] = len(rows)
+            rows.extend((child, i) for child in record["children"])
+        elif record["mode"] == "instance":
+            key = record.get("geometry")
+            if key is None or key not in geometry_rows:
+                geometry_rows[key] = len(rows)
+                source = record["children"][0] if record.get("children") else geometries[key]
+                rows.append((source, GEOMETRY))
+            refs[i] = geometry_rows[key]
+        i += 1
+    return rows, refs
+
+
+def encode_session(records, meta=None, geometries=None):
+    """Session file bytes for shape records (see TutorShape.to_record), bottom to top.
+
+    Records may carry their cached "bounds" so a loaded scene can be indexed
+    without touching any geometry.  ``meta`` is stored as JSON (layers etc.).
+    Instances that only reference their geometry key find the source record
+    in ``geometries`` (key -> record).
+    """
+    rows, refs = _rows(records, geometries)
+    n = len(rows)
+    columns = {name: array(typecode) for name, typecode, _ in _COLUMNS}
+    styles = {}
+    style_table = bytearray()
+    modes = {}
+    coords = array('f')
+    text = bytearray()
+    pressures = bytearray()
+    nan = float("nan")
+    for i, (record, parent) in enumerate(rows):
+        flags = 0
+        if record.get("is_curve"):
+            flags |= _ROW_CURVE
+        if record.get("text_bounds") is not None:
+            flags |= _ROW_TEXT_BOUNDS
+        if record.get("pressures") is not None:
+            flags |= _ROW_PRESSURE
+        if record.get("tint") is not None:
+            flags |= _ROW_TINT
+        style_flags = ((_STYLE_FILL if record.get("fill") is not None else 0) |
+                       (_STYLE_BOLD if record.get("font_bold") else 0) |
+                       (_STYLE_ITALIC if record.get("font_italic") else 0))
+        style = (record["color"] & 0xFFFFFFFF, (record.get("fill") or 0) & 0xFFFFFFFF,
+                 float(record.get("thickness", 4)), record.get("font_size", 22), style_flags)
+        style_index = styles.get(style)
+        if style_index is None:
+            style_index = styles[style] = len(styles)
+            style_table += _STYLE.pack(*style)
+        columns["mode"].append(modes.setdefault(record["mode"], len(modes)))
+        columns["flags"].append(flags)
+        columns["parent"].append(parent)
+        columns["id"].append(record.get("id") or 0)
+        columns["layer"].append(record.get("layer") or 0)
+        columns["style"].append(style_index)
+        columns["ref"].append(refs.get(i, 0))
+        columns["count"].append(len(record["children"]) if record["mode"] == "group" else 0)
+        columns["tint"].append((record.get("tint") or 0) & 0xFFFFFFFF)
+        columns["transform"].extend((record.get("rotation", 0.0), record.get("scale_x", 1.0),
+                                     record.get("scale_y", 1.0)))
+        columns["bounds"].extend(record.get("bounds") or (nan, nan, nan, nan))
+        columns["text_bounds"].extend(record.get("text_bounds") or (0.0, 0.0, 0.0, 0.0))
+        columns["coord_offsets"].append(len(coords))
+        coords.extend(record["points"])
+        coords.extend(record["end"])
+        columns["text_offsets"].append(len(text))
+        text += record.get("text", "").encode("utf-8")
+        columns["pressure_offsets"].append(len(pressures))
+        if flags & _ROW_PRESSURE:
+            pressures += bytes(min(255, max(0, int(round(p * 255)))) for p in record["pressures"])
+    columns["coord_offsets"].append(len(coords))
+    columns["text_offsets"].append(len(text))
+    columns["pressure_offsets"].append(len(pressures))
+
+    meta = dict(meta or {})
+    meta["modes"] = sorted(modes, key=modes.get)
+    sections = [_le_bytes(columns[name]) for name, _, _ in _COLUMNS]
+    sections += [json.dumps(meta).encode("utf-8"), bytes(style_table), _le_bytes(coords),
+                 bytes(text), bytes(pressures)]
+
+    out = bytearray(_HEADER.pack(MAGIC, FORMAT_VERSION, _SECTION_COUNT, n, len(records), len(styles)))
+    directory = len(out)
+    out += bytes(_SECTION.size * _SECTION_COUNT)
+    for k, data in enumerate(sections):
+        out += bytes(-len(out) % _ALIGN)
+        _SECTION.pack_into(out, directory + k * _SECTION.size, len(out), len(data))
+        out += data
+    return bytes(out)
+
+
+def write_session(path, records, meta=None, geometries=None):
+    """Encode and write a session file; the old file is only replaced once the new one is complete"""
+    data = encode_session(records, meta, geometries)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class SessionReader:
+    """Read-only view of a session file.
+
+    Opening maps the file and validates the header and the section table,
+    so a file that is not a session fails there with ValueError; nothing
+    per row is read up front.  Columns are zero-copy views of the mapping
+    (on little-endian hosts), and ``record``/``points`` decode single rows on
+    demand, so open time does not grow with the amount of ink.  Decoding a
+    row first checks its offsets and references, and those of the rows it
+    refers to, raising ValueError for a corrupt one (see ``check_rows``).
+    Rows ``0 .. scene_count - 1`` are the scene shapes, bottom to top.
+    """
+
+    def __init__(self, path=None, data=None, fd=None):
+        self.path = path
+        self._file = None
+        self._map = None
+        self._data = None
+        # Objects built from this file by the caller, e.g. shared geometry per row
+        self.cache = {}
+        if data is None:
+            # A descriptor (see opener) is taken over and closed with the reader
+            self._file = open(path, "rb") if fd is None else os.fdopen(fd, "rb")
+            try:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                self._file.close()
+                raise ValueError(f"{path} is not a TutorDraw session file")
+            data = self._map
+        try:
+            self._setup(data)
+        except ValueError:
+            self._release()
+            raise
+        except (IndexError, TypeError, struct.error) as e:
+            self._release()
+            raise ValueError(f"Corrupt session file: {e}") from e
+
+    def _setup(self, data):
+        # Everything is validated on copies first: views that outlive a failed
+        # open (e.g. in a traceback) would keep the mapping from closing
+        if len(data) < _HEADER.size or bytes(data[:4]) != MAGIC:
+            raise ValueError("Not a TutorDraw session file")
+        _, version, section_count, rows, scene_rows, style_count = _HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported session file version {version}")
+        if section_count < _SECTION_COUNT or len(data) < _HEADER.size + section_count * _SECTION.size:
+            raise ValueError("Truncated session file")
+        spans = [_SECTION.unpack_from(data, _HEADER.size + k * _SECTION.size) for k in range(section_count)]
+        if any(offset + length > len(data) for offset, length in spans):
+            raise ValueError("Truncated session file")
+        for (name, typecode, width), (_, length) in zip(_COLUMNS, spans):
+            expected = (rows + 1) if name in _OFFSET_COLUMNS else rows * width
+            if length != expected * array(typecode).itemsize:
+                raise ValueError(f"Corrupt session file: column {name}")
+        if spans[_COORDS][1] % 4:
+            raise ValueError("Corrupt session file: coordinates")
+        offset, length = spans[_META]
+        self.meta = json.loads(bytes(data[offset:offset + length]).decode("utf-8"))
+        offset, length = spans[_STYLES]
+        if length < style_count * _STYLE.size:
+            raise ValueError("Corrupt session file: style table")
+        self._styles = [_STYLE.unpack_from(data, offset + k * _STYLE.size) for k in range(style_count)]
+        self._modes = self.meta.get("modes", [])
+        self.row_count = rows
+        self.scene_count = scene_rows
+
+        self._data = data
+        view = memoryview(data)
+        self._view = view
+        self._sections = [view[offset:offset + length] for offset, length in spans]
+        for (name, typecode, _), section in zip(_COLUMNS, self._sections):
+            setattr(self, "_" + name, self._column(section, typecode))
+        self._coords = self._column(self._sections[_COORDS], 'f')
+        self._text = self._sections[_TEXT]
+        self._pressures = self._sections[_PRESSURES]
+        self._validate()
+
+    def _validate(self):
+        """Check the header fields; rows are checked when they are first decoded"""
+        rows = self.row_count
+        if not isinstance(self.meta, dict) or self.scene_count > rows:
+            raise ValueError("Corrupt session file: header")
+        if not isinstance(self._modes, list) or not all(isinstance(mode, str) for mode in self._modes):
+            raise ValueError("Corrupt session file: modes")
+        self._checked = bytearray(rows)  # 1 for rows check_rows has accepted
+
+    def check_rows(self, start, stop):
+        """Check rows ``start .. stop - 1`` and every row they refer to, so decoding them cannot fail.
+
+        Raises ValueError for a corrupt row.  Accepted rows are remembered,
+        so checking again is cheap; loading a file checks each row once, on
+        the worker that decodes it.
+        """
+        checked = self._checked
+        pending = [row for row in range(start, min(stop, self.row_count)) if not checked[row]]
+        if not pending:
+            return
+        rows = self.row_count
+        limits = (("coord_offsets", len(self._coords), 4), ("text_offsets", len(self._text), 0),
+                  ("pressure_offsets", len(self._pressures), 0))
+        accepted = []
+        while pending:
+            row = pending.pop()
+            if checked[row]:
+                continue
+            for name, limit, minimum in limits:
+                offsets = getattr(self, "_" + name)
+                first, end = offsets[row], offsets[row + 1]
+                # Every row has a first point and an end point, as x/y pairs
+                if not first <= end <= limit or end - first < minimum or (minimum and (end - first) % 2):
+                    raise ValueError(f"Corrupt session file: column {name}")
+            if self._mode[row] >= len(self._modes) or self._style[row] >= len(self._styles):
+                raise ValueError("Corrupt session file: mode or style")
+            mode = self._modes[self._mode[row]]
+            ref = self._ref[row]
+            # Groups and instances only refer to later rows, so nothing nests in itself
+            if mode == "group":
+                if not (row < ref and ref + self._count[row] <= rows):
+                    raise ValueError("Corrupt session file: group children")
+                pending.extend(range(ref, ref + self._count[row]))
+            elif mode == "instance":
+                if not row < ref < rows:
+                    raise ValueError("Corrupt session file: instance geometry")
+                pending.append(ref)
+            accepted.append(row)
+        # Only once everything referred to is fine too
+        for row in accepted:
+            checked[row] = 1
+
+    @staticmethod
+    def _column(section, typecode):
+        if _LITTLE:
+            return section.cast(typecode)
+        values = array(typecode, bytes(section))
+        values.byteswap()
+        return values
+
+    def __len__(self):
+        return self.row_count
+
+    def close(self):
+        """Release the mapping; rows can no longer be read"""
+        self._release()
+
+    def opener(self):
+        """Callable that opens another reader of the same content, e.g. on a worker thread.
+
+        It reads what this reader reads even if this one is closed or the
+        file is replaced meanwhile; call it exactly once, since a mapped file
+        is reopened from a duplicate descriptor.
+        """
+        if self._map is None:
+            return functools.partial(SessionReader, self.path, self._data)
+        return functools.partial(SessionReader, self.path, fd=os.dup(self._file.fileno()))
+
+    def detach(self):
+        """Copy the file into memory and release the mapping, so the file can be replaced"""
+        if self._map is None:
+            return
+        data = bytes(self._view)
+        self._release()
+        self._setup(data)
+
+    def _release(self):
+        for name, _, _ in _COLUMNS:
+            setattr(self, "_" + name, None)
+        self._coords = self._text = self._pressures = None
+        self._sections = []
+        self._view = None
+        self._data = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def max_id(self):
+        """Largest shape id stored in the file, 0 if there is none"""
+        return max(self._id.tolist(), default=0)
+
+    def mode(self, row):
+        return self._modes[self._mode[row]]
+
+    def parent(self, row):
+        return self._parent[row]
+
+    def children(self, row):
+        """Rows of a group's children"""
+        first = self._ref[row]
+        return range(first, first + self._count[row])
+
+    def geometry_row(self, row):
+        """Row of the shared geometry an instance places"""
+        return self._ref[row]
+
+    def bounds(self, row):
+        x0, y0, x1, y1 = self._bounds[4 * row:4 * row + 4]
+        return None if math.isnan(x0) else (x0, y0, x1, y1)
+
+    def point_count(self, row):
+        """Number of points of a row, not counting the end point"""
+        return (self._coord_offsets[row + 1] - self._coord_offsets[row]) // 2 - 1
+
+    def points(self, row):
+        """Flat [x0, y0, ...] coordinates of a row's points (without the end point)"""
+        start = self._coord_offsets[row]
+        end = self._coord_offsets[row + 1] - 2
+        if not _LITTLE:
+            return self._coords[start:end]
+        coords = array('f')
+        coords.frombytes(self._sections[_COORDS][4 * start:4 * end])
+        return coords
+
+    def pressures(self, row):
+        if not self._flags[row] & _ROW_PRESSURE:
+            return None
+        data = self._pressures[self._pressure_offsets[row]:self._pressure_offsets[row + 1]]
+        return array('f', [b / 255 for b in data])
+
+    def record(self, row, points=True):
+        """Row as a shape record dict, the same shape as shape_codec produces.
+
+        Children and instance sources are not included; follow ``children``
+        and ``geometry_row`` instead.
+        """
+        return self.records(row, row + 1, points)[0]
+
+    def records(self, start, stop, points=True):
+        """Records of rows ``start .. stop - 1``, decoded a column at a time.
+
+        With ``points=False`` only the first point of each row is decoded, for
+        shapes whose geometry is loaded later (see ``points``).  Raises
+        ValueError if one of the rows is corrupt.
+        """
+        self.check_rows(start, stop)
+        styles = []
+        for color, fill, thickness, font_size, style_flags in self._styles:
+            styles.append((color, fill if style_flags & _STYLE_FILL else None,
+                           thickness if thickness != int(thickness) else int(thickness), font_size,
+                           bool(style_flags & _STYLE_BOLD), bool(style_flags & _STYLE_ITALIC)))
+        modes = self._modes
+        flags_col = self._flags[start:stop].tolist()
+        transforms = self._transform[3 * start:3 * stop].tolist()
+        bounds = self._bounds[4 * start:4 * stop].tolist()
+        coord_offsets = self._coord_offsets[start:stop + 1].tolist()
+        text_offsets = self._text_offsets[start:stop + 1].tolist()
+        c = self._coords
+        out = []
+        for k, (mode, flags, shape_id, layer, style, tint) in enumerate(zip(
+                self._mode[start:stop].tolist(), flags_col, self._id[start:stop].tolist(),
+                self._layer[start:stop].tolist(), self._style[start:stop].tolist(),
+                self._tint[start:stop].tolist())):
+            row = start + k
+            color, fill, thickness, font_size, bold, italic = styles[style]
+            first = coord_offsets[k]
+            last = coord_offsets[k + 1] - 2
+            coords = c[first:last].tolist() if points else [c[first], c[first + 1]]
+            t0 = text_offsets[k]
+            t1 = text_offsets[k + 1]
+            text = bytes(self._text[t0:t1]).decode("utf-8") if t1 > t0 else ""
+            box = bounds[4 * k:4 * k + 4]
+            out.append({
+                "mode": modes[mode],
+                "id": shape_id or None,
+                "layer": layer or None,
+                "color": color,
+                "fill": fill,
+                "thickness": thickness,
+                "rotation": transforms[3 * k],
+                "scale_x": transforms[3 * k + 1],
+                "scale_y": transforms[3 * k + 2],
+                "font_size": font_size,
+                "font_bold": bold,
+                "font_italic": italic,
+                "is_curve": bool(flags & _ROW_CURVE),
+                "text": text,
+                "points": coords,
+                "end": (c[last], c[last + 1]),
+                "text_bounds": tuple(self._text_bounds[4 * row:4 * row + 4]) if flags & _ROW_TEXT_BOUNDS else None,
+                "tint": tint if flags & _ROW_TINT else None,
+                "pressures": self.pressures(row) if points or flags & _ROW_PRESSURE else None,
+                "bounds": None if box[0] != box[0] else tuple(box),
+            })
+        return out
+
+    def full_record(self, row, geometry_key=None):
+        """Row as a record with nested children, as TutorShape.from_record takes.
+
+        Instances embed their source, so the record is self-contained.
+        Shared geometry keys are process-local and not stored; with
+        ``geometry_key`` (source row -> key) instances reference a key
+        instead, and the sources are looked up separately.
+        """
+        record = self.record(row)
+        mode = record["mode"]
+        if mode == "group":
+            record["children"] = [self.full_record(child, geometry_key) for child in self.children(row)]
+        elif mode == "instance":
+            source = self.geometry_row(row)
+            if geometry_key is None:
+                record["children"] = [self.full_record(source)]
+            else:
+                record["geometry"] = geometry_key(source)
+        return record
@@ -137,6 +137,81 @@ class SettingsDialog(QDialog):
         self.fill_check.setChecked(self.canvas.enable_fill)
         layout.addWidget(self.fill_check)
 
+        self.lbl_fit = QLabel(f"Curve Fit Tolerance: {self.canvas.stroke_fit_error:.1f}px")
+        layout.addWidget(self.lbl_fit)
+        fit_slider = QSlider(Qt.Horizontal)
+        fit_slider.setRange(2, 50)
+        fit_slider.setValue(int(self.canvas.stroke_fit_error * 10))
+        fit_slider.valueChanged.connect(lambda v: (setattr(self.canvas, 'stroke_fit_error', v/10.0), self.lbl_fit.setText(f"Curve Fit Tolerance: {v/10.0:.1f}px")))
+        layout.addWidget(fit_slider)
+
+        self.full_rate_check = QCheckBox("Keep every pen sample (no input compression)")
+        self.full_rate_check.setChecked(self.canvas.full_rate_input)
+        layout.addWidget(self.full_rate_check)
+
+        self.lbl_predict = QLabel(f"Ink Prediction: {self.canvas.prediction_horizon_ms} ms")
+        layout.addWidget(self.lbl_predict)
+        predict_slider = QSlider(Qt.Horizontal)
+        predict_slider.setRange(0, 50)
+        predict_slider.setValue(self.canvas.prediction_horizon_ms)
+        predict_slider.valueChanged.connect(lambda v: (setattr(self.canvas, 'prediction_horizon_ms', v), setattr(self.canvas.stroke_predictor, 'horizon', v / 1000), self.lbl_predict.setText(f"Ink Prediction: {v} ms")))
+        layout.addWidget(predict_slider)
+
+        self.lbl_cutoff = QLabel(f"Smoothing Cutoff: {self.canvas.smoothing_min_cutoff:.1f} Hz")
+        layout.addWidget(self.lbl_cutoff)
+        cutoff_slider = QSlider(Qt.Horizontal)
+        cutoff_slider.setRange(1, 100)
+        cutoff_slider.setValue(int(self.canvas.smoothing_min_cutoff * 10))
+        cutoff_slider.valueChanged.connect(lambda v: (setattr(self.canvas, 'smoothing_min_cutoff', v/10.0), self.lbl_cutoff.setText(f"Smoothing Cutoff: {v/10.0:.1f} Hz")))
+        layout.addWidget(cutoff_slider)
+
+        self.lbl_beta = QLabel(f"Speed Response: {self.canvas.smoothing_beta:.3f}")
+        layout.addWidget(self.lbl_beta)
+        beta_slider = QSlider(Qt.Horizontal)
+        beta_slider.setRange(0, 200)
+        beta_slider.setValue(int(self.canvas.smoothing_beta * 1000))
+        beta_slider.valueChanged.connect(lambda v: (setattr(self.canvas, 'smoothing_beta', v/1000.0), self.lbl_beta.setText(f"Speed Response: {v/1000.0:.3f}")))
+        layout.addWidget(beta_slider)
+
+        self.partial_eraser_check = QCheckBox("Eraser cuts through pencil strokes")
+        self.partial_eraser_check.setChecked(self.canvas.partial_eraser)
+        layout.addWidget(self.partial_eraser_check)
+
+        self.lbl_eraser = QLabel(f"Eraser Size: {self.canvas.eraser_size}px")
+        layout.addWidget(self.lbl_eraser)
+        eraser_slider = QSlider(Qt.Horizontal)
+        eraser_slider.setRange(4, 100)
+        eraser_slider.setValue(self.canvas.eraser_size)
+        eraser_slider.valueChanged.connect(lambda v: (setattr(self.canvas, 'eraser_size', v), self.lbl_eraser.setText(f"Eraser Size: {v}px")))
+        layout.addWidget(eraser_slider)
+
+        self.recognize_check = QCheckBox("Turn rough boxes, circles, lines and arrows into shapes")
+        self.recognize_check.setChecked(self.canvas.shape_recognition)
+        layout.addWidget(self.recognize_check)
+
+        self.variable_width_check = QCheckBox("Pressure-sensitive pencil (mouse: slower is wider)")
+        self.variable_width_check.setChecked(self.canvas.variable_width)
+        layout.addWidget(self.variable_width_check)
+
+        self.autosave_check = QCheckBox("Autosave drawings and restore them on the next start")
+        self.autosave_check.setChecked(self.canvas.autosave_enabled)
+        layout.addWidget(self.autosave_check)
+
+        self.snap_check = QCheckBox("Snap to shape edges and centers")
+        self.snap_check.setChecked(self.canvas.snap_enabled)
+        layout.addWidget(self.snap_check)
+
+        grid_row = QHBoxLayout()
+        grid_label = QLabel("Snap Grid (0 = off):")
+        grid_label.setFixedWidth(150)
+        grid_row.addWidget(grid_label)
+        self.grid_spin = QSpinBox()
+        self.grid_spin.setRange(0, 200)
+        self.grid_spin.setSuffix(" px")
+        self.grid_spin.setValue(self.canvas.snap_grid)
+        grid_row.addWidget(self.grid_spin)
+        layout.addLayout(grid_row)
+
         layout.addSpacing(15)
         layout.addWidget(self._section_label("🪄 LASER POINTER"))
         
@@ -234,6 +309,15 @@ class SettingsDialog(QDialog):
     def save_and_close(self):
         self.canvas.default_thickness = self.thick_spin.value()
         self.canvas.enable_fill = self.fill_check.isChecked()
+        self.canvas.full_rate_input = self.full_rate_check.isChecked()
+        self.canvas.partial_eraser = self.partial_eraser_check.isChecked()
+        self.canvas.snap_enabled = self.snap_check.isChecked()
+        self.canvas.shape_recognition = self.recognize_check.isChecked()
+        self.canvas.variable_width = self.variable_width_check.isChecked()
+        self.canvas.set_autosave(self.autosave_check.isChecked())
+        self.canvas.snap_grid = self.grid_spin.value()
+        from src.canvas import apply_input_compression
+        apply_input_compression(self.canvas.full_rate_input)
         self.canvas.laser_glow = self.glow_check.isChecked()
         self.canvas.toolbar_orientation = "vertical" if self.orientation_check.isChecked() else "horizontal"
         new_theme = self.theme_combo.currentText()
@@ -0,0 +1,313 @@
+"""
+Compact binary encoding of TutorDraw shapes
+Shapes are described as plain records (see TutorShape.to_record) and packed
+into quantized, delta-encoded varints, zlib-compressed when that pays off;
+the exact variant adds what quantizing dropped from each coordinate, for undo history
+"""
+
+import math
+import struct
+import zlib
+
+FORMAT_VERSION = 4  # 2: adds the layer ID, 3: flags become a varint, adds pressures, 4: exact residuals
+QUANTUM = 8  # Coordinates are stored in 1/8 px steps
+
+_RAW = 0
+_ZLIB = 1
+_COMPRESS_MIN = 64  # Bodies smaller than this are not worth compressing
+
+_FLAG_FILL = 1
+_FLAG_BOLD = 2
+_FLAG_ITALIC = 4
+_FLAG_CURVE = 8
+_FLAG_TEXT_BOUNDS = 16
+_FLAG_CHILDREN = 32
+_FLAG_TINT = 64
+_FLAG_GEOMETRY = 128
+_FLAG_PRESSURE = 256
+_FLAG_EXACT = 512  # Floats are stored as doubles and coordinates with their residuals
+
+
+def _put_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _put_signed(out, value):
+    # Zigzag encoding keeps small negative deltas small
+    _put_varint(out, (value << 1) if value >= 0 else ((-value) << 1) - 1)
+
+
+def _get_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _get_signed(data, pos):
+    value, pos = _get_varint(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def _put_string(out, text):
+    raw = text.encode("utf-8")
+    _put_varint(out, len(raw))
+    out.extend(raw)
+
+
+def _get_string(data, pos):
+    length, pos = _get_varint(data, pos)
+    return bytes(data[pos:pos + length]).decode("utf-8"), pos + length
+
+
+def encode_coords(out, coords):
+    """Append a flat [x0, y0, x1, y1, ...] list as quantized deltas"""
+    _put_varint(out, len(coords) // 2)
+    px = py = 0
+    for i in range(0, len(coords) - 1, 2):
+        qx = int(round(coords[i] * QUANTUM))
+        qy = int(round(coords[i + 1] * QUANTUM))
+        _put_signed(out, qx - px)
+        _put_signed(out, qy - py)
+        px, py = qx, qy
+
+
+def quantize(value):
+    """The nearest coordinate the quantized encoding represents exactly"""
+    return round(value * QUANTUM) / QUANTUM
+
+
+def _residual_unit(approx):
+    # Every double within half a quantum of approx is a multiple of this
+    return math.ulp(max(abs(approx) - 0.5 / QUANTUM, 1.0 / QUANTUM))
+
+
+def _put_residuals(out, coords):
+    """Append what quantizing took off each coordinate, so decoding is exact.
+
+    Within half a quantum of its grid point a coordinate minus that point is
+    exact and a whole number of units; on-grid coordinates cost one zero byte.
+    Anything else (tiny values near 0) is escaped as a raw double.
+    """
+    for value in coords:
+        approx = quantize(value)
+        unit = _residual_unit(approx)
+        steps = (value - approx) / unit
+        if steps == int(steps) and approx + int(steps) * unit == value:
+            steps = int(steps)
+            # Zigzagged like _put_signed, shifted to keep the low bit for the escape
+            _put_varint(out, ((steps << 1) if steps >= 0 else ((-steps) << 1) - 1) << 1)
+        else:
+            out.append(1)
+            out += struct.pack("<d", value)
+
+
+def _get_residuals(data, pos, coords):
+    for i, approx in enumerate(coords):
+        token, pos = _get_varint(data, pos)
+        if token & 1:
+            (coords[i],) = struct.unpack_from("<d", data, pos)
+            pos += 8
+        elif token:
+            token >>= 1
+            steps = (token >> 1) ^ -(token & 1)
+            coords[i] = approx + steps * _residual_unit(approx)
+    return pos
+
+
+def _put_doubles(out, values):
+    _put_varint(out, len(values))
+    out += struct.pack(f"<{len(values)}d", *values)
+
+
+def _get_doubles(data, pos):
+    count, pos = _get_varint(data, pos)
+    return list(struct.unpack_from(f"<{count}d", data, pos)), pos + 8 * count
+
+
+def decode_coords(data, pos):
+    count, pos = _get_varint(data, pos)
+    coords = []
+    x = y = 0
+    for _ in range(count):
+        dx, pos = _get_signed(data, pos)
+        dy, pos = _get_signed(data, pos)
+        x += dx
+        y += dy
+        coords.append(x / QUANTUM)
+        coords.append(y / QUANTUM)
+    return coords, pos
+
+
+def _pack_body(record, exact=False):
+    flags = _FLAG_EXACT if exact else 0
+    if record.get("fill") is not None:
+        flags |= _FLAG_FILL
+    if record.get("font_bold"):
+        flags |= _FLAG_BOLD
+    if record.get("font_italic"):
+        flags |= _FLAG_ITALIC
+    if record.get("is_curve"):
+        flags |= _FLAG_CURVE
+    if record.get("text_bounds") is not None:
+        flags |= _FLAG_TEXT_BOUNDS
+    if record.get("children") is not None:
+        flags |= _FLAG_CHILDREN
+    if record.get("tint") is not None:
+        flags |= _FLAG_TINT
+    if record.get("geometry") is not None:
+        flags |= _FLAG_GEOMETRY
+    if record.get("pressures") is not None:
+        flags |= _FLAG_PRESSURE
+    body = bytearray()
+    body.append(FORMAT_VERSION)
+    _put_varint(body, flags)
+    _put_string(body, record["mode"])
+    _put_varint(body, record.get("id") or 0)
+    _put_varint(body, record.get("layer") or 0)
+    body += struct.pack("<I", record["color"] & 0xFFFFFFFF)
+    if flags & _FLAG_FILL:
+        body += struct.pack("<I", record["fill"] & 0xFFFFFFFF)
+    floats = "<dddd" if exact else "<ffff"
+    body += struct.pack(floats, record.get("thickness", 4), record.get("rotation", 0.0),
+                        record.get("scale_x", 1.0), record.get("scale_y", 1.0))
+    _put_varint(body, record.get("font_size", 22))
+    _put_string(body, record.get("text", ""))
+    coords = list(record["points"]) + list(record["end"])
+    encode_coords(body, coords)
+    if exact:
+        _put_residuals(body, coords)
+    if flags & _FLAG_TEXT_BOUNDS:
+        body += struct.pack(floats, *record["text_bounds"])
+    if flags & _FLAG_CHILDREN:
+        # Group members are nested bodies; the group is compressed as a whole
+        _put_varint(body, len(record["children"]))
+        for child in record["children"]:
+            child_body = _pack_body(child, exact)
+            _put_varint(body, len(child_body))
+            body += child_body
+    if flags & _FLAG_TINT:
+        body += struct.pack("<I", record["tint"] & 0xFFFFFFFF)
+    if flags & _FLAG_GEOMETRY:
+        _put_varint(body, record["geometry"])
+    if flags & _FLAG_PRESSURE:
+        pressures = record["pressures"]
+        if exact:
+            _put_doubles(body, list(pressures))
+        else:
+            # One byte per sample is finer than any pen reports usefully
+            _put_varint(body, len(pressures))
+            body += bytes(min(255, max(0, int(round(p * 255)))) for p in pressures)
+    return body
+
+
+def pack_record(record, exact=False):
+    """Encode a shape record dict (groups include their children) into bytes.
+
+    Coordinates are quantized to 1/QUANTUM px and pressures to bytes, which
+    suits files; ``exact`` keeps all values as they are, so shapes restored
+    from history land exactly where they were however often they are undone.
+    """
+    body = _pack_body(record, exact)
+    if len(body) >= _COMPRESS_MIN:
+        packed = zlib.compress(bytes(body), 1)
+        if len(packed) < len(body):
+            return bytes((_ZLIB,)) + packed
+    return bytes((_RAW,)) + bytes(body)
+
+
+def unpack_record(blob):
+    """Decode bytes produced by pack_record back into a record dict"""
+    body = zlib.decompress(blob[1:]) if blob[0] == _ZLIB else memoryview(blob)[1:]
+    return _unpack_body(body)
+
+
+def _unpack_body(body):
+    version = body[0]
+    if version not in (1, 2, 3, FORMAT_VERSION):
+        raise ValueError(f"Unsupported shape encoding version {version}")
+    if version >= 3:
+        flags, pos = _get_varint(body, 1)
+    else:
+        flags = body[1]
+        pos = 2
+    mode, pos = _get_string(body, pos)
+    shape_id, pos = _get_varint(body, pos)
+    layer = 0
+    if version >= 2:
+        layer, pos = _get_varint(body, pos)
+    (color,) = struct.unpack_from("<I", body, pos)
+    pos += 4
+    fill = None
+    if flags & _FLAG_FILL:
+        (fill,) = struct.unpack_from("<I", body, pos)
+        pos += 4
+    exact = flags & _FLAG_EXACT
+    floats = struct.Struct("<dddd" if exact else "<ffff")
+    thickness, rotation, scale_x, scale_y = floats.unpack_from(body, pos)
+    pos += floats.size
+    font_size, pos = _get_varint(body, pos)
+    text, pos = _get_string(body, pos)
+    if exact and version < 4:
+        coords, pos = _get_doubles(body, pos)
+    else:
+        coords, pos = decode_coords(body, pos)
+        if exact:
+            pos = _get_residuals(body, pos, coords)
+    text_bounds = None
+    if flags & _FLAG_TEXT_BOUNDS:
+        text_bounds = floats.unpack_from(body, pos)
+        pos += floats.size
+    children = None
+    if flags & _FLAG_CHILDREN:
+        count, pos = _get_varint(body, pos)
+        children = []
+        for _ in range(count):
+            length, pos = _get_varint(body, pos)
+            children.append(_unpack_body(body[pos:pos + length]))
+            pos += length
+    tint = None
+    if flags & _FLAG_TINT:
+        (tint,) = struct.unpack_from("<I", body, pos)
+        pos += 4
+    geometry = None
+    if flags & _FLAG_GEOMETRY:
+        geometry, pos = _get_varint(body, pos)
+    pressures = None
+    if flags & _FLAG_PRESSURE and exact:
+        pressures, pos = _get_doubles(body, pos)
+    elif flags & _FLAG_PRESSURE:
+        count, pos = _get_varint(body, pos)
+        pressures = [b / 255 for b in body[pos:pos + count]]
+        pos += count
+    return {
+        "mode": mode,
+        "id": shape_id or None,
+        "layer": layer or None,
+        "color": color,
+        "fill": fill,
+        "thickness": thickness if thickness != int(thickness) else int(thickness),
+        "rotation": rotation,
+        "scale_x": scale_x,
+        "scale_y": scale_y,
+        "font_size": font_size,
+        "font_bold": bool(flags & _FLAG_BOLD),
+        "font_italic": bool(flags & _FLAG_ITALIC),
+        "is_curve": bool(flags & _FLAG_CURVE),
+        "text": text,
+        "points": coords[:-2],
+        "end": coords[-2:],
+        "text_bounds": text_bounds,
+        "children": children,
+        "tint": tint,
+        "geometry": geometry,
+        "pressures": pressures,
+    }
@@ -0,0 +1,136 @@
+"""
+Shape recognition for TutorDraw
+Classifies a finished freehand stroke as a rectangle, ellipse, diamond, line
+or arrow so it can be replaced by the equivalent two-point shape
+"""
+
+import math
+
+from src.hit_testing import segment_distance_sq
+
+MIN_SIZE = 24.0        # Strokes smaller than this (bounding-box diagonal) are left alone
+MAX_SAMPLES = 256      # Long strokes are subsampled to keep recognition within a frame
+CLOSED_GAP = 0.2       # End-to-start gap, relative to the diagonal, that still counts as closed
+FIT_ERROR = 0.06       # Mean outline distance, relative to the shorter box side
+STRAIGHT_ERROR = 0.04  # Largest deviation from the chord, relative to its length
+BOX_PERCENTILE = 0.02  # Fraction of samples allowed outside the fitted box on each side
+MIN_HEAD = 10.0        # Shortest barb, in pixels, that makes a line an arrow
+
+
+def _subsample(coords):
+    n = len(coords) // 2
+    if n <= MAX_SAMPLES:
+        return [(coords[2 * i], coords[2 * i + 1]) for i in range(n)]
+    step = (n - 1) / (MAX_SAMPLES - 1)
+    return [(coords[2 * round(i * step)], coords[2 * round(i * step) + 1]) for i in range(MAX_SAMPLES)]
+
+
+def _rect_distance(x, y, box):
+    x0, y0, x1, y1 = box
+    if x0 <= x <= x1 and y0 <= y <= y1:
+        return min(x - x0, x1 - x, y - y0, y1 - y)
+    dx = max(x0 - x, 0.0, x - x1)
+    dy = max(y0 - y, 0.0, y - y1)
+    return math.hypot(dx, dy)
+
+
+def _ellipse_distance(x, y, box):
+    x0, y0, x1, y1 = box
+    a = (x1 - x0) / 2.0
+    b = (y1 - y0) / 2.0
+    dx = x - (x0 + x1) / 2.0
+    dy = y - (y0 + y1) / 2.0
+    rho = math.hypot(dx / a, dy / b)
+    if rho == 0.0:
+        return min(a, b)
+    # Distance to where the ray from the center crosses the ellipse
+    return math.hypot(dx, dy) * abs(1.0 - 1.0 / rho)
+
+
+def _diamond_distance(x, y, box):
+    x0, y0, x1, y1 = box
+    cx = (x0 + x1) / 2.0
+    cy = (y0 + y1) / 2.0
+    corners = ((cx, y0), (x1, cy), (cx, y1), (x0, cy), (cx, y0))
+    return math.sqrt(min(segment_distance_sq(ax, ay, bx, by, x, y)
+                         for (ax, ay), (bx, by) in zip(corners, corners[1:])))
+
+
+_OUTLINES = (("rect", _rect_distance), ("ellipse", _ellipse_distance), ("diamond", _diamond_distance))
+
+
+def _max_chord_deviation(points, start, end):
+    (ax, ay), (bx, by) = points[start], points[end]
+    return max(math.sqrt(segment_distance_sq(ax, ay, bx, by, x, y)) for x, y in points[start:end + 1])
+
+
+def _recognize_open(points):
+    """'line' or 'arrow' for a straight shaft, optionally ending in a head"""
+    sx, sy = points[0]
+    # The tip is where the stroke first gets (nearly) as far from the start as
+    # it ever does; anything after it is the head
+    distances = [math.hypot(x - sx, y - sy) for x, y in points]
+    farthest = max(distances)
+    tip = next(i for i, d in enumerate(distances) if d >= farthest - MIN_HEAD / 2)
+    tx, ty = points[tip]
+    shaft = math.hypot(tx - sx, ty - sy)
+    if shaft < MIN_SIZE or _max_chord_deviation(points, 0, tip) > STRAIGHT_ERROR * shaft:
+        return None
+    head = points[tip + 1:]
+    if not head:
+        return ("line", sx, sy, tx, ty)
+    ux = (tx - sx) / shaft
+    uy = (ty - sy) / shaft
+    reach = max(math.hypot(x - tx, y - ty) for x, y in head)
+    if reach < MIN_HEAD:
+        return ("line", sx, sy, tx, ty)
+    if reach > 0.4 * shaft:
+        return None
+    # Barbs point back along the shaft and away from it
+    spread = 0.0
+    for x, y in head:
+        if (x - tx) * ux + (y - ty) * uy > 0.05 * shaft:
+            return None
+        spread = max(spread, abs((x - tx) * -uy + (y - ty) * ux))
+    if spread < 0.3 * reach:
+        # Doubling back along the shaft is a retraced line, not a head
+        return ("line", sx, sy, tx, ty)
+    return ("arrow", sx, sy, tx, ty)
+
+
+def recognize(coords):
+    """Classify a stroke given as a flat [x0, y0, x1, y1, ...] polyline.
+
+    Returns ``(mode, x0, y0, x1, y1)`` where mode is 'rect', 'ellipse' or
+    'diamond' (the two points are the box corners) or 'line' or 'arrow'
+    (start and tip), or None when the stroke matches none of them.
+    """
+    if len(coords) < 6:
+        return None
+    points = _subsample(coords)
+    xs = sorted(p[0] for p in points)
+    ys = sorted(p[1] for p in points)
+    # Percentiles rather than extremes, so jitter and overshoot at the
+    # corners do not inflate the box
+    lo = int(len(points) * BOX_PERCENTILE)
+    hi = len(points) - 1 - lo
+    box = (xs[lo], ys[lo], xs[hi], ys[hi])
+    w = box[2] - box[0]
+    h = box[3] - box[1]
+    diagonal = math.hypot(w, h)
+    if diagonal < MIN_SIZE:
+        return None
+    (sx, sy), (ex, ey) = points[0], points[-1]
+    if math.hypot(ex - sx, ey - sy) > CLOSED_GAP * diagonal:
+        return _recognize_open(points)
+    if min(w, h) < 0.1 * max(w, h):
+        # A closed loop this flat is a scribble, not a box
+        return None
+    scale = min(w, h)
+    errors = []
+    for mode, distance in _OUTLINES:
+        errors.append((sum(distance(x, y, box) for x, y in points) / len(points) / scale, mode))
+    error, mode = min(errors)
+    if error > FIT_ERROR:
+        return None
+    return (mode,) + box
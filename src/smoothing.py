@@ -0,0 +1,64 @@
+"""
+Incremental stroke smoothing for TutorDraw
+One Euro filter (Casiez et al.): an adaptive low-pass filter whose cutoff
+rises with speed, so slow strokes lose jitter and fast ones keep their shape;
+each sample costs O(1) and is filtered exactly once
+"""
+
+import math
+
+
+def _alpha(cutoff, dt):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """One Euro filter for a single coordinate"""
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x = None
+        self._dx = 0.0
+        self._t = None
+
+    def __call__(self, x, t):
+        if self._x is None:
+            self._x = x
+            self._t = t
+            return x
+        dt = t - self._t
+        if dt <= 0:
+            # Coalesced samples with one timestamp: assume a 1 ms step
+            dt = 0.001
+        self._t = t
+        dx = (x - self._x) / dt
+        self._dx += _alpha(self.d_cutoff, dt) * (dx - self._dx)
+        cutoff = self.min_cutoff + self.beta * abs(self._dx)
+        self._x += _alpha(cutoff, dt) * (x - self._x)
+        return self._x
+
+
+class PointSmoother:
+    """One Euro filtering of (x, y) pointer samples"""
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, d_cutoff=1.0):
+        self._fx = OneEuroFilter(min_cutoff, beta, d_cutoff)
+        self._fy = OneEuroFilter(min_cutoff, beta, d_cutoff)
+
+    def configure(self, min_cutoff, beta):
+        for f in (self._fx, self._fy):
+            f.min_cutoff = min_cutoff
+            f.beta = beta
+
+    def reset(self):
+        self._fx.reset()
+        self._fy.reset()
+
+    def __call__(self, x, y, t):
+        return self._fx(x, t), self._fy(y, t)
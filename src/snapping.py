@@ -0,0 +1,156 @@
+"""
+Snapping for TutorDraw
+Sorted indexes of shape edges and centerlines so pointer positions and
+dragged boxes find alignment candidates by binary search, with an optional
+grid as fallback
+"""
+
+from bisect import bisect_left, insort
+
+
+def snap_to_grid(v, spacing):
+    return round(v / spacing) * spacing
+
+
+def _lines(bounds):
+    x0, y0, x1, y1 = bounds
+    return (x0, (x0 + x1) / 2, x1), (y0, (y0 + y1) / 2, y1)
+
+
+def _nearest(lines, v, tolerance, skip):
+    """(value, key) of the line closest to v within tolerance, or None"""
+    i = bisect_left(lines, (v - tolerance,))
+    best = None
+    best_d = tolerance
+    n = len(lines)
+    while i < n and lines[i][0] <= v + tolerance:
+        value, key = lines[i]
+        d = abs(value - v)
+        if d <= best_d and (skip is None or not skip(key)):
+            best = lines[i]
+            best_d = d
+        i += 1
+    return best
+
+
+class SnapIndex:
+    """Left, center and right x lines and top, center and bottom y lines per key.
+
+    Each axis is a list of ``(value, key)`` kept sorted, so a query costs a
+    binary search plus the lines inside the tolerance window.
+    """
+
+    def __init__(self):
+        self._xs = []
+        self._ys = []
+        self._lines = {}
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __contains__(self, key):
+        return key in self._lines
+
+    def set(self, key, bounds):
+        """Register a shape's bounds, replacing its previous lines"""
+        lines = _lines(bounds)
+        if self._lines.get(key) == lines:
+            return
+        self.remove(key)
+        self._add(key, lines)
+
+    def set_many(self, items):
+        """Register many (key, bounds) pairs with one sort instead of an insertion per line"""
+        changed = []
+        for key, bounds in items:
+            lines = _lines(bounds)
+            if self._lines.get(key) != lines:
+                changed.append((key, lines))
+        if len(changed) < 64:
+            for key, lines in changed:
+                self.remove(key)
+                self._add(key, lines)
+            return
+        stale = {key for key, _ in changed if key in self._lines}
+        if stale:
+            self._xs = [line for line in self._xs if line[1] not in stale]
+            self._ys = [line for line in self._ys if line[1] not in stale]
+        for key, (xs, ys) in changed:
+            self._lines[key] = (xs, ys)
+            self._xs.extend((x, key) for x in xs)
+            self._ys.extend((y, key) for y in ys)
+        self._xs.sort()
+        self._ys.sort()
+
+    def _add(self, key, lines):
+        self._lines[key] = lines
+        xs, ys = lines
+        for x in xs:
+            insort(self._xs, (x, key))
+        for y in ys:
+            insort(self._ys, (y, key))
+
+    def remove(self, key):
+        lines = self._lines.pop(key, None)
+        if lines is None:
+            return
+        for axis, values in ((self._xs, lines[0]), (self._ys, lines[1])):
+            for v in values:
+                i = bisect_left(axis, (v, key))
+                if i < len(axis) and axis[i] == (v, key):
+                    del axis[i]
+
+    def clear(self):
+        self._xs.clear()
+        self._ys.clear()
+        self._lines.clear()
+
+    def nearest_x(self, x, tolerance, skip=None):
+        return _nearest(self._xs, x, tolerance, skip)
+
+    def nearest_y(self, y, tolerance, skip=None):
+        return _nearest(self._ys, y, tolerance, skip)
+
+    def snap_point(self, x, y, tolerance, grid=0, skip=None):
+        """Snapped (x, y, guide_x, guide_y).
+
+        Each axis snaps to the nearest shape line within tolerance, whose
+        value is returned as the guide; otherwise to the grid when a grid
+        spacing is given, without a guide.  ``skip(key)`` excludes shapes.
+        """
+        hit_x = self.nearest_x(x, tolerance, skip)
+        hit_y = self.nearest_y(y, tolerance, skip)
+        guide_x = hit_x[0] if hit_x else None
+        guide_y = hit_y[0] if hit_y else None
+        if guide_x is not None:
+            x = guide_x
+        elif grid:
+            x = snap_to_grid(x, grid)
+        if guide_y is not None:
+            y = guide_y
+        elif grid:
+            y = snap_to_grid(y, grid)
+        return x, y, guide_x, guide_y
+
+    def snap_box(self, bounds, tolerance, grid=0, skip=None):
+        """Offset (dx, dy, guide_x, guide_y) aligning a moved box with the index.
+
+        The box's edges and center are tried on each axis and the closest
+        match wins; without one the box's top-left corner snaps to the grid.
+        """
+        offsets = []
+        for values, nearest in zip(_lines(bounds), (self.nearest_x, self.nearest_y)):
+            best = None
+            for v in values:
+                hit = nearest(v, tolerance, skip)
+                if hit is not None and (best is None or abs(hit[0] - v) < abs(best[0])):
+                    best = (hit[0] - v, hit[0])
+            if best is not None:
+                offsets.append(best)
+            elif grid:
+                v = values[0]
+                offsets.append((snap_to_grid(v, grid) - v, None))
+            else:
+                offsets.append((0.0, None))
+        (dx, guide_x), (dy, guide_y) = offsets
+        return dx, dy, guide_x, guide_y
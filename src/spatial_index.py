@@ -0,0 +1,201 @@
+"""
+Spatial index for TutorDraw shapes
+Uniform grid over cached shape bounds used for hit testing, erasing,
+selection and paint culling
+"""
+
+import math
+
+from src.hit_testing import segment_in_bounds
+
+
+class SpatialGrid:
+    """Uniform grid that maps axis-aligned bounds to the items covering them.
+
+    Bounds are plain ``(x0, y0, x1, y1)`` tuples so the index stays free of Qt.
+    Every item carries a stacking order; queries return items topmost-first.
+    """
+
+    def __init__(self, cell_size=128, max_cells_per_item=256):
+        self.cell_size = cell_size
+        # Items covering more cells than this are kept in a separate list
+        # instead of being registered in every cell they touch
+        self.max_cells_per_item = max_cells_per_item
+        self._cells = {}
+        self._oversized = set()
+        self._bounds = {}
+        self._items = {}
+        self._order = {}
+        self._next_order = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def _cell_range(self, bounds):
+        x0, y0, x1, y1 = bounds
+        size = self.cell_size
+        return (math.floor(x0 / size), math.floor(y0 / size),
+                math.floor(x1 / size), math.floor(y1 / size))
+
+    def _register(self, key, bounds):
+        cx0, cy0, cx1, cy1 = self._cell_range(bounds)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > self.max_cells_per_item:
+            self._oversized.add(key)
+            return
+        cells = self._cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = {key}
+                else:
+                    bucket.add(key)
+
+    def _unregister(self, key, bounds):
+        if key in self._oversized:
+            self._oversized.discard(key)
+            return
+        cx0, cy0, cx1, cy1 = self._cell_range(bounds)
+        cells = self._cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del cells[(cx, cy)]
+
+    def insert(self, key, item, bounds, order=None):
+        """Add an item, or move it if the key is already indexed"""
+        if key in self._items:
+            self.update(key, bounds)
+            self._items[key] = item
+            if order is not None:
+                self._order[key] = order
+            return
+        if order is None:
+            order = self._next_order
+        self._next_order = max(self._next_order, order + 1)
+        self._items[key] = item
+        self._order[key] = order
+        self._bounds[key] = bounds
+        self._register(key, bounds)
+
+    def update(self, key, bounds):
+        """Re-register an item after its bounds changed"""
+        old = self._bounds.get(key)
+        if old is None or old == bounds:
+            return
+        old_range = self._cell_range(old)
+        self._bounds[key] = bounds
+        if key not in self._oversized and old_range == self._cell_range(bounds):
+            return
+        self._unregister(key, old)
+        self._register(key, bounds)
+
+    def remove(self, key):
+        """Drop an item from the index; unknown keys are ignored"""
+        bounds = self._bounds.pop(key, None)
+        if bounds is None:
+            return
+        self._unregister(key, bounds)
+        del self._items[key]
+        del self._order[key]
+
+    def clear(self):
+        self._cells.clear()
+        self._oversized.clear()
+        self._bounds.clear()
+        self._items.clear()
+        self._order.clear()
+        self._next_order = 0
+
+    def rebuild(self, entries):
+        """Replace the contents with ``(key, item, bounds)`` entries, bottom-most first"""
+        self.clear()
+        for key, item, bounds in entries:
+            self.insert(key, item, bounds)
+
+    def bounds_of(self, key):
+        return self._bounds.get(key)
+
+    def _sorted(self, keys):
+        order = self._order
+        items = self._items
+        return [items[k] for k in sorted(keys, key=order.__getitem__, reverse=True)]
+
+    def query_point(self, x, y):
+        """Items whose bounds contain the point, topmost first"""
+        size = self.cell_size
+        bucket = self._cells.get((math.floor(x / size), math.floor(y / size)), ())
+        bounds = self._bounds
+        hits = []
+        for key in bucket:
+            x0, y0, x1, y1 = bounds[key]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                hits.append(key)
+        for key in self._oversized:
+            x0, y0, x1, y1 = bounds[key]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                hits.append(key)
+        return self._sorted(hits)
+
+    def query_rect(self, rect):
+        """Items whose bounds intersect the rect, topmost first"""
+        qx0, qy0, qx1, qy1 = rect
+        cx0, cy0, cx1, cy1 = self._cell_range(rect)
+        bounds = self._bounds
+        cells = self._cells
+        candidates = set(self._oversized)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(cells):
+            # Large query: walking the occupied cells is cheaper than the range
+            for (cx, cy), bucket in cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    candidates.update(bucket)
+        else:
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket:
+                        candidates.update(bucket)
+        hits = []
+        for key in candidates:
+            x0, y0, x1, y1 = bounds[key]
+            if x0 <= qx1 and qx0 <= x1 and y0 <= qy1 and qy0 <= y1:
+                hits.append(key)
+        return self._sorted(hits)
+
+    def _segment_cells(self, ax, ay, bx, by):
+        """Grid cells crossed by the segment a-b, one column strip at a time"""
+        size = self.cell_size
+        if ax > bx:
+            ax, ay, bx, by = bx, by, ax, ay
+        slope = (by - ay) / (bx - ax) if bx != ax else 0.0
+        for cx in range(math.floor(ax / size), math.floor(bx / size) + 1):
+            if bx == ax:
+                ya, yb = ay, by
+            else:
+                # Part of the segment inside this column
+                ya = ay + (max(ax, cx * size) - ax) * slope
+                yb = ay + (min(bx, (cx + 1) * size) - ax) * slope
+            for cy in range(math.floor(min(ya, yb) / size), math.floor(max(ya, yb) / size) + 1):
+                yield cx, cy
+
+    def query_segment(self, ax, ay, bx, by):
+        """Items whose bounds the segment a-b passes through, topmost first.
+
+        Only the cells along the segment are visited, so a long diagonal
+        sweep costs its length rather than the area of its bounding box.
+        """
+        cells = self._cells
+        candidates = set(self._oversized)
+        for cell in self._segment_cells(ax, ay, bx, by):
+            bucket = cells.get(cell)
+            if bucket:
+                candidates.update(bucket)
+        bounds = self._bounds
+        hits = [key for key in candidates if segment_in_bounds(bounds[key], ax, ay, bx, by)]
+        return self._sorted(hits)
@@ -0,0 +1,139 @@
+"""
+Variable-width stroke outlines for TutorDraw
+Turns a centerline with per-sample pressure into a filled outline polygon,
+either in one go for finished strokes or incrementally while drawing
+"""
+
+import math
+from array import array
+
+THINNING = 0.6          # How much pressure changes the width (0 = constant width)
+CAP_SEGMENTS = 6        # Segments of each round end cap
+SPEED_FOR_THINNEST = 1500.0  # px/s at which speed-derived pressure bottoms out
+
+
+def pressure_radius(size, pressure):
+    """Half width for a pen of the given size; medium pressure (0.5) gives size / 2"""
+    return max(0.25, size / 2 * (1 - THINNING + 2 * THINNING * pressure))
+
+
+def max_width(size):
+    """Widest an outline of the given pen size gets, at full pressure"""
+    return 2 * pressure_radius(size, 1.0)
+
+
+def _normal(ax, ay, bx, by):
+    dx = bx - ax
+    dy = by - ay
+    length = math.hypot(dx, dy)
+    if length == 0.0:
+        return None
+    return -dy / length, dx / length
+
+
+class StrokeOutline:
+    """Left and right offset points of a stroke, kept up to date as samples arrive.
+
+    A point's offsets depend on both of its neighbours, so every ``add``
+    finalizes the previous point and returns the quad between the two points
+    before it and that one, ready to be appended to a live path.
+    """
+
+    def __init__(self):
+        self.xs = array('d')
+        self.ys = array('d')
+        self.radii = array('d')
+        self.left = array('d')
+        self.right = array('d')
+        self._last_normal = (0.0, 1.0)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def _offset(self, i):
+        xs, ys = self.xs, self.ys
+        n = len(xs)
+        a = max(i - 1, 0)
+        b = min(i + 1, n - 1)
+        normal = _normal(xs[a], ys[a], xs[b], ys[b])
+        if normal is None:
+            normal = self._last_normal
+        self._last_normal = normal
+        r = self.radii[i]
+        x, y = xs[i], ys[i]
+        return x + normal[0] * r, y + normal[1] * r, x - normal[0] * r, y - normal[1] * r
+
+    def add(self, x, y, radius):
+        """Append a sample; returns the newly finalized quad as 8 floats, or None"""
+        self.xs.append(x)
+        self.ys.append(y)
+        self.radii.append(radius)
+        n = len(self.xs)
+        left, right = self.left, self.right
+        if n >= 2:
+            left[-2], left[-1], right[-2], right[-1] = self._offset(n - 2)
+        lx, ly, rx, ry = self._offset(n - 1)
+        left.extend((lx, ly))
+        right.extend((rx, ry))
+        if n < 3:
+            return None
+        i = 2 * (n - 3)
+        return (left[i], left[i + 1], left[i + 2], left[i + 3],
+                right[i + 2], right[i + 3], right[i], right[i + 1])
+
+    def _cap(self, i, side, out):
+        """Half circle around point i starting from its offset on the given side.
+
+        Turning clockwise from the left offset passes in front of the stroke
+        and from the right offset behind it, so the same sweep closes both ends.
+        """
+        x, y, r = self.xs[i], self.ys[i], self.radii[i]
+        j = 2 * i
+        start = math.atan2(side[j + 1] - y, side[j] - x)
+        for k in range(1, CAP_SEGMENTS):
+            a = start - math.pi * k / CAP_SEGMENTS
+            out.extend((x + math.cos(a) * r, y + math.sin(a) * r))
+
+    def polygon(self):
+        """Closed outline as a flat [x0, y0, ...] list: left side, end cap, right side, start cap"""
+        n = len(self.xs)
+        if n == 0:
+            return []
+        out = list(self.left)
+        self._cap(n - 1, self.left, out)
+        right = self.right
+        for i in range(2 * n - 2, -1, -2):
+            out.extend((right[i], right[i + 1]))
+        self._cap(0, self.right, out)
+        return out
+
+
+def stroke_outline(coords, pressures, size):
+    """Closed outline polygon of a finished stroke with one pressure per point"""
+    outline = StrokeOutline()
+    for i in range(0, len(coords) - 1, 2):
+        outline.add(coords[i], coords[i + 1], pressure_radius(size, pressures[i // 2]))
+    return outline.polygon()
+
+
+class SpeedPressure:
+    """Pressure stand-in for mouse input: slow movement draws wide, fast thin"""
+
+    def __init__(self, response=0.3):
+        self.response = response
+        self.reset()
+
+    def reset(self):
+        self._last = None
+        self.pressure = 0.5
+
+    def __call__(self, x, y, t):
+        if self._last is not None:
+            lx, ly, lt = self._last
+            dt = t - lt
+            if dt > 0:
+                speed = math.hypot(x - lx, y - ly) / dt
+                target = 1.0 - min(1.0, speed / SPEED_FOR_THINNEST)
+                self.pressure += (target - self.pressure) * self.response
+        self._last = (x, y, t)
+        return self.pressure
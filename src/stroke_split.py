@@ -0,0 +1,166 @@
+"""
+Partial erasing for TutorDraw
+Clips freehand polylines against the eraser footprint, a capsule around the
+pointer's movement, and returns the pieces that survive
+"""
+
+import math
+
+
+def _disk_interval(px, py, dx, dy, cx, cy, r_sq):
+    """Parameter range of p + t*d inside the disk, or None"""
+    fx = px - cx
+    fy = py - cy
+    a = dx * dx + dy * dy
+    b = 2.0 * (fx * dx + fy * dy)
+    c = fx * fx + fy * fy - r_sq
+    if a == 0.0:
+        return (0.0, 1.0) if c <= 0.0 else None
+    disc = b * b - 4.0 * a * c
+    if disc < 0.0:
+        return None
+    root = math.sqrt(disc)
+    return (-b - root) / (2.0 * a), (-b + root) / (2.0 * a)
+
+
+def _band_interval(pu, pv, du, dv, length, radius):
+    """Parameter range inside the rectangle 0 <= u <= length, |v| <= radius"""
+    t0, t1 = -math.inf, math.inf
+    for start, step, lo, hi in ((pu, du, 0.0, length), (pv, dv, -radius, radius)):
+        if step == 0.0:
+            if start < lo or start > hi:
+                return None
+            continue
+        a = (lo - start) / step
+        b = (hi - start) / step
+        if a > b:
+            a, b = b, a
+        t0 = max(t0, a)
+        t1 = min(t1, b)
+        if t0 > t1:
+            return None
+    return t0, t1
+
+
+class Capsule:
+    """Points within ``radius`` of the segment a-b"""
+
+    def __init__(self, ax, ay, bx, by, radius):
+        self.ax, self.ay, self.bx, self.by = ax, ay, bx, by
+        self.radius = radius
+        self.length = math.hypot(bx - ax, by - ay)
+        if self.length > 0.0:
+            self.ux = (bx - ax) / self.length
+            self.uy = (by - ay) / self.length
+        else:
+            self.ux, self.uy = 1.0, 0.0
+        self.bounds = (min(ax, bx) - radius, min(ay, by) - radius,
+                       max(ax, bx) + radius, max(ay, by) + radius)
+
+    def interval(self, px, py, qx, qy):
+        """Parameter range [t0, t1] of the segment p-q inside the capsule, or None.
+
+        The capsule is convex, so its intersection with a segment is a single
+        interval: the union of the ranges inside the two end disks and the band.
+        """
+        dx = qx - px
+        dy = qy - py
+        r = self.radius
+        r_sq = r * r
+        parts = [_disk_interval(px, py, dx, dy, self.ax, self.ay, r_sq),
+                 _disk_interval(px, py, dx, dy, self.bx, self.by, r_sq)]
+        if self.length > 0.0:
+            ux, uy = self.ux, self.uy
+            rx = px - self.ax
+            ry = py - self.ay
+            parts.append(_band_interval(rx * ux + ry * uy, ry * ux - rx * uy,
+                                        dx * ux + dy * uy, dy * ux - dx * uy, self.length, r))
+        t0, t1 = math.inf, -math.inf
+        for part in parts:
+            if part is not None:
+                t0 = min(t0, part[0])
+                t1 = max(t1, part[1])
+        t0 = max(t0, 0.0)
+        t1 = min(t1, 1.0)
+        if t0 > t1:
+            return None
+        return t0, t1
+
+
+def split_polyline(coords, capsule, min_length=0.5, values=None):
+    """Pieces of the flat polyline ``coords`` left after erasing the capsule.
+
+    Returns None when the polyline does not touch the capsule, so callers can
+    leave untouched strokes (and their caches) alone.  Otherwise returns a
+    list of flat coordinate lists, possibly empty; pieces shorter than
+    ``min_length`` are dropped.  Segments whose box misses the capsule's are
+    rejected with four comparisons, so long strokes cost little beyond the
+    few segments near the eraser.
+
+    ``values`` optionally holds one number per vertex (pen pressure); the
+    pieces are then ``(coords, values)`` pairs with the values interpolated
+    at the cut points.
+    """
+    n = len(coords)
+    if n < 4:
+        if n == 2 and capsule.interval(coords[0], coords[1], coords[0], coords[1]):
+            return []
+        return None
+    bx0, by0, bx1, by1 = capsule.bounds
+    pieces = []
+    current = [coords[0], coords[1]]
+    # Values are tracked alongside; a constant stand-in keeps one code path
+    vals = values if values is not None else [0.0] * (n // 2)
+    current_vals = [vals[0]]
+    piece_vals = []
+    touched = False
+    px = coords[0]
+    py = coords[1]
+    pv = vals[0]
+    for i in range(2, n, 2):
+        qx = coords[i]
+        qy = coords[i + 1]
+        qv = vals[i // 2]
+        span = None
+        if not ((px < bx0 and qx < bx0) or (px > bx1 and qx > bx1) or
+                (py < by0 and qy < by0) or (py > by1 and qy > by1)):
+            span = capsule.interval(px, py, qx, qy)
+        if span is None:
+            if current is None:
+                current = [px, py]
+                current_vals = [pv]
+            current.append(qx)
+            current.append(qy)
+            current_vals.append(qv)
+        else:
+            touched = True
+            t0, t1 = span
+            if current is not None:
+                if t0 > 0.0:
+                    current.append(px + (qx - px) * t0)
+                    current.append(py + (qy - py) * t0)
+                    current_vals.append(pv + (qv - pv) * t0)
+                pieces.append(current)
+                piece_vals.append(current_vals)
+                current = None
+            if t1 < 1.0:
+                current = [px + (qx - px) * t1, py + (qy - py) * t1, qx, qy]
+                current_vals = [pv + (qv - pv) * t1, qv]
+        px = qx
+        py = qy
+        pv = qv
+    if not touched:
+        return None
+    if current is not None:
+        pieces.append(current)
+        piece_vals.append(current_vals)
+    if values is None:
+        return [p for p in pieces if polyline_length(p) >= min_length]
+    return [(p, v) for p, v in zip(pieces, piece_vals) if polyline_length(p) >= min_length]
+
+
+def polyline_length(coords):
+    total = 0.0
+    for i in range(2, len(coords) - 1, 2):
+        total += math.hypot(coords[i] - coords[i - 2], coords[i + 1] - coords[i - 1])
+    return total
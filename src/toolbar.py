@@ -411,6 +411,13 @@ class TutorToolbar(QWidget):
         
         menu.addAction("⚙️ Settings").triggered.connect(self.canvas.open_settings)
         menu.addAction("🗑️ Clear All").triggered.connect(self.canvas.clear_canvas)
+        menu.addAction("📂 Open Session…").triggered.connect(self.canvas.open_session_dialog)
+        menu.addAction("💾 Save Session…").triggered.connect(self.canvas.save_session_dialog)
+        menu.addAction("🖼️ Export Image…").triggered.connect(self.canvas.export_image_dialog)
+        menu.addAction("🕘 History").triggered.connect(self.canvas.toggle_history_scrubber)
+        menu.addAction("🗂️ Layers").triggered.connect(self.canvas.toggle_layers_panel)
+        menu.addAction("🔗 Group (Ctrl+G)").triggered.connect(self.canvas.group_selection)
+        menu.addAction("⛓️ Ungroup (Ctrl+Shift+G)").triggered.connect(self.canvas.ungroup_selection)
         
         # Capture submenu
         capture_menu = QMenu("Capture", menu)
@@ -0,0 +1,103 @@
+"""
+Affine transforms for TutorDraw
+2D matrices for moving, scaling and rotating selections, applied to flat
+[x0, y0, x1, y1, ...] coordinate arrays in one pass
+"""
+
+import math
+from array import array
+
+
+class Affine:
+    """Affine map x' = a*x + c*y + e, y' = b*x + d*y + f.
+
+    The coefficients follow QTransform's (m11, m12, m21, m22, dx, dy) order,
+    so ``QTransform(*m.coefficients())`` draws exactly what ``map`` computes.
+    """
+
+    __slots__ = ('a', 'b', 'c', 'd', 'e', 'f')
+
+    def __init__(self, a=1.0, b=0.0, c=0.0, d=1.0, e=0.0, f=0.0):
+        self.a, self.b, self.c, self.d, self.e, self.f = a, b, c, d, e, f
+
+    def __repr__(self):
+        return f"Affine{self.coefficients()!r}"
+
+    def __eq__(self, other):
+        return isinstance(other, Affine) and self.coefficients() == other.coefficients()
+
+    @classmethod
+    def translation(cls, dx, dy):
+        return cls(e=dx, f=dy)
+
+    @classmethod
+    def scaling(cls, sx, sy, ox=0.0, oy=0.0):
+        """Scale by (sx, sy) keeping the point (ox, oy) fixed"""
+        return cls(sx, 0.0, 0.0, sy, ox - sx * ox, oy - sy * oy)
+
+    @classmethod
+    def rotation(cls, angle, cx=0.0, cy=0.0):
+        """Rotate by angle radians (clockwise on screen) around (cx, cy)"""
+        cos = math.cos(angle)
+        sin = math.sin(angle)
+        return cls(cos, sin, -sin, cos, cx - cos * cx + sin * cy, cy - sin * cx - cos * cy)
+
+    def coefficients(self):
+        return (self.a, self.b, self.c, self.d, self.e, self.f)
+
+    def then(self, other):
+        """The map applying self first and other second"""
+        a, b, c, d, e, f = self.coefficients()
+        return Affine(other.a * a + other.c * b, other.b * a + other.d * b,
+                      other.a * c + other.c * d, other.b * c + other.d * d,
+                      other.a * e + other.c * f + other.e, other.b * e + other.d * f + other.f)
+
+    def is_translation(self):
+        return self.a == 1.0 and self.b == 0.0 and self.c == 0.0 and self.d == 1.0
+
+    def has_rotation(self):
+        return self.b != 0.0 or self.c != 0.0
+
+    def is_uniform(self):
+        """True if the map keeps proportions, so circles stay circles"""
+        return math.isclose(self.a, self.d, abs_tol=1e-9) and math.isclose(self.b, -self.c, abs_tol=1e-9)
+
+    def map(self, x, y):
+        return self.a * x + self.c * y + self.e, self.b * x + self.d * y + self.f
+
+    def map_bounds(self, bounds):
+        """Axis-aligned bounds of the mapped (x0, y0, x1, y1) box"""
+        x0, y0, x1, y1 = bounds
+        xs, ys = zip(*(self.map(x, y) for x, y in ((x0, y0), (x1, y0), (x0, y1), (x1, y1))))
+        return (min(xs), min(ys), max(xs), max(ys))
+
+
+def map_coords(m, coords):
+    """Mapped copy of a flat coordinate array"""
+    a, b, c, d, e, f = m.coefficients()
+    xs = coords[0::2]
+    ys = coords[1::2]
+    out = array('d', bytes(8 * len(coords)))
+    out[0::2] = array('d', [a * x + c * y + e for x, y in zip(xs, ys)])
+    out[1::2] = array('d', [b * x + d * y + f for x, y in zip(xs, ys)])
+    return out
+
+
+def map_many(m, arrays):
+    """Map several flat coordinate arrays with one pass over their concatenation.
+
+    Returns the mapped arrays in the same order and lengths, so a whole
+    selection is transformed with a single matrix application instead of
+    shape by shape and point by point.
+    """
+    flat = array('d')
+    for coords in arrays:
+        flat.extend(coords)
+    mapped = map_coords(m, flat)
+    out = []
+    start = 0
+    for coords in arrays:
+        end = start + len(coords)
+        out.append(mapped[start:end])
+        start = end
+    return out
@@ -0,0 +1,140 @@
+"""
+Integration tests for shape geometry that needs Qt
+"""
+
+import unittest
+import sys
+import os
+from array import array
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+class TestShapeRendering(unittest.TestCase):
+    """Test cached shape paths and in-place geometry edits"""
+
+    def setUp(self):
+        """Set up test environment"""
+        # Import here to avoid issues with QApplication instantiation
+        from PyQt5.QtWidgets import QApplication
+        self.app = QApplication.instance()
+        if self.app is None:
+            self.app = QApplication([])
+
+    def test_self_intersecting_pressure_stroke_is_filled(self):
+        """Where a variable-width stroke crosses itself the overlap is inked, not a hole"""
+        from PyQt5.QtCore import Qt, QPointF
+        from PyQt5.QtGui import QImage, QPainter, QColor
+        from src.canvas import TutorShape
+
+        # Right, down, left, then up through the first segment at (50, 50)
+        points = [QPointF(10, 50), QPointF(90, 50), QPointF(90, 90), QPointF(50, 90), QPointF(50, 10)]
+        shape = TutorShape("pencil", points[0], QColor("black"), thickness=10)
+        shape.points = points
+        shape.pressures = array('f', [0.5] * len(points))
+        image = QImage(100, 100, QImage.Format_ARGB32)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.fillPath(shape.freehand_path(), QColor("black"))
+        painter.end()
+        self.assertEqual(QColor(image.pixel(30, 50)).alpha(), 255)
+        self.assertEqual(QColor(image.pixel(50, 50)).alpha(), 255)
+        self.assertEqual(QColor(image.pixel(70, 70)).alpha(), 0)
+
+    def test_moved_text_highlight_keeps_its_rectangle(self):
+        """Moving a text highlight moves the rectangle it is drawn as, bounds included"""
+        from PyQt5.QtCore import QPointF, QRectF
+        from PyQt5.QtGui import QColor
+        from src.canvas import TutorShape
+
+        shape = TutorShape("highlighter", QPointF(12, 20), QColor("yellow"))
+        shape.text_bounds = QRectF(10, 8, 80, 16)
+        self.assertEqual(shape.bounds(), (10, 8, 90, 24))
+        shape.translate(QPointF(30, -5))
+        self.assertEqual(shape.text_bounds, QRectF(40, 3, 80, 16))
+        self.assertEqual(shape.bounds(), (40, 3, 120, 19))
+        copy = TutorShape.from_record(shape.to_record())
+        self.assertEqual(copy.text_bounds, shape.text_bounds)
+
+    def test_export_renders_independent_copies(self):
+        """Exports draw plain copies: instances decoded for them share nothing with the registry"""
+        from PyQt5.QtCore import QPointF
+        from PyQt5.QtGui import QColor
+        from src.canvas import TutorShape, SharedGeometry, ShapeInstance, render_export
+        from src.image_export import ExportJob
+
+        source = TutorShape("rect", QPointF(0, 0), QColor("black"), thickness=2)
+        source.end_pos = QPointF(10, 10)
+        geometry = SharedGeometry(source)
+        instance = ShapeInstance(geometry, QPointF(20, 20))
+        copy = TutorShape.from_record(instance.to_record(), {geometry.key: geometry.packed()}, registry={})
+        self.assertIsNot(copy.geometry, geometry)
+        self.assertIs(SharedGeometry.lookup(geometry.key), geometry)
+        image = render_export([copy], [(None, 1.0)], (40, 40), 2.0, None, None, ExportJob(None))
+        self.assertEqual((image.width(), image.height()), (80, 80))
+        self.assertGreater(QColor(image.pixel(40, 40)).alpha(), 0)
+        self.assertEqual(QColor(image.pixel(10, 10)).alpha(), 0)
+
+    def test_export_decodes_payloads_on_its_own(self):
+        """The export decodes history payloads itself, reading session rows through a reader of its own"""
+        import tempfile
+        from PyQt5.QtCore import QPointF
+        from PyQt5.QtGui import QColor
+        from src.canvas import TutorShape, export_scene
+        from src.image_export import ExportJob
+        from src.session_file import SessionReader, write_session
+        from src.shape_codec import pack_record
+
+        loaded = TutorShape("rect", QPointF(0, 0), QColor("black"), thickness=2)
+        loaded.end_pos = QPointF(10, 10)
+        drawn = TutorShape("rect", QPointF(20, 20), QColor("black"), thickness=2)
+        drawn.end_pos = QPointF(30, 30)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "session.tds")
+            write_session(path, [loaded.to_record()])
+            reader = SessionReader(path)
+            entries = [(1, pack_record(drawn.to_record(), exact=True)), (0, (reader, 0))]
+            openers = {id(reader): reader.opener()}
+            # The canvas may close the file while the export runs
+            reader.close()
+            image = export_scene(entries, {}, openers, [(None, 1.0)], (40, 40), 1.0, None, None, ExportJob(None))
+        self.assertGreater(QColor(image.pixel(0, 5)).alpha(), 0)
+        self.assertGreater(QColor(image.pixel(20, 25)).alpha(), 0)
+        self.assertEqual(QColor(image.pixel(15, 15)).alpha(), 0)
+
+    def test_recognized_arrow_is_drawn(self):
+        """A stroke recognized as an arrow keeps its ink: shaft and head are drawn"""
+        from types import SimpleNamespace
+        from PyQt5.QtCore import Qt, QPointF
+        from PyQt5.QtGui import QImage, QPainter, QColor
+        from src.canvas import TutorShape, TutorCanvas, draw_primitive
+
+        def segment(a, b, n=30):
+            return [(a[0] + (b[0] - a[0]) * i / n, a[1] + (b[1] - a[1]) * i / n) for i in range(n + 1)]
+        points = (segment((0, 100), (300, 100)) + segment((300, 100), (275, 85), 8) +
+                  segment((275, 85), (300, 100), 8) + segment((300, 100), (275, 115), 8))
+        stroke = TutorShape("pencil", QPointF(*points[0]), QColor("black"), thickness=4)
+        stroke.points = [QPointF(x, y) for x, y in points]
+        arrow = TutorCanvas.recognize_stroke(SimpleNamespace(enable_fill=False), stroke)
+        self.assertEqual(arrow.mode, "arrow")
+        image = QImage(320, 200, QImage.Format_ARGB32)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        draw_primitive(painter, arrow)
+        painter.end()
+        self.assertEqual(QColor(image.pixel(150, 100)).alpha(), 255)
+        # A wing of the head, which the bounds include as well
+        left, right = arrow.arrow_head()
+        wing = (left + arrow.end_pos) / 2
+        self.assertGreater(QColor(image.pixel(round(wing.x()), round(wing.y()))).alpha(), 0)
+        x0, y0, x1, y1 = arrow.bounds()
+        self.assertLessEqual(y0, min(left.y(), right.y()))
+        self.assertGreaterEqual(y1, max(left.y(), right.y()))
+
+    def tearDown(self):
+        """Clean up test environment"""
+        if self.app:
+            self.app.quit()
+
+if __name__ == '__main__':
+    unittest.main()
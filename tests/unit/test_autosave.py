@@ -0,0 +1,194 @@
+import unittest
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.autosave import (AutosaveJournal, recover, read_frames, session_state, CHECKPOINT_FILE, JOURNAL_FILE,
+                          OP_GEOMETRY)
+from src.session_file import SessionReader, encode_session
+from src.shape_codec import pack_record, unpack_record
+
+def record(**kw):
+    r = {"mode": "pencil", "id": None, "layer": 0, "color": 0xFF000000, "fill": None, "thickness": 2,
+         "rotation": 0.0, "scale_x": 1.0, "scale_y": 1.0, "font_size": 22, "font_bold": False,
+         "font_italic": False, "is_curve": False, "text": "", "points": [1.0, 1.0], "end": (1.0, 1.0),
+         "text_bounds": None}
+    r.update(kw)
+    return r
+
+class TestAutosave(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = self.dir.name
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def journal(self, **kw):
+        journal = AutosaveJournal(self.path, **kw)
+        geometries = {}
+        journal.start(*recover(self.path, geometries), geometries)
+        self.addCleanup(journal.close)
+        return journal
+
+    def test_replay_after_restart(self):
+        journal = self.journal()
+        journal.put(1, 0, b"one")
+        journal.put(2, 1, b"two")
+        journal.put(1, 2, b"one moved")
+        journal.delete(2)
+        journal.put(3, 3, b"three")
+        journal.close()
+        generation, state = recover(self.path)
+        self.assertEqual(state, {1: (2, b"one moved"), 3: (3, b"three")})
+        # A restarted journal continues the same log
+        journal = self.journal()
+        journal.clear()
+        journal.put(4, 0, b"four")
+        journal.sync()
+        self.assertEqual(recover(self.path)[1], {4: (0, b"four")})
+
+    def test_torn_tail_is_ignored(self):
+        journal = self.journal()
+        journal.put(1, 0, b"kept")
+        journal.put(2, 1, b"torn")
+        journal.close()
+        path = os.path.join(self.path, JOURNAL_FILE)
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 2)
+        self.assertEqual(recover(self.path)[1], {1: (0, b"kept")})
+        # Appending after a torn tail must not leave the new frames unreachable
+        journal = self.journal()
+        journal.put(3, 2, b"after")
+        journal.sync()
+        self.assertEqual(recover(self.path)[1], {1: (0, b"kept"), 3: (2, b"after")})
+
+    def test_compaction(self):
+        journal = self.journal(compact_bytes=1024)
+        for i in range(200):
+            journal.put(i % 10, i, b"x" * 20)
+            if i % 50 == 49:
+                journal.sync()
+        journal.close()
+        journal_size = os.path.getsize(os.path.join(self.path, JOURNAL_FILE))
+        self.assertLess(journal_size, 200 * 20)
+        generation, state = recover(self.path)
+        self.assertGreater(generation, 0)
+        self.assertEqual(state, {k: (190 + k, b"x" * 20) for k in range(10)})
+        with open(os.path.join(self.path, CHECKPOINT_FILE), "rb") as f:
+            self.assertEqual(len(read_frames(f.read())), 11)
+
+    def test_stale_journal_after_interrupted_compaction(self):
+        journal = self.journal(compact_bytes=64)
+        journal.put(1, 0, b"a" * 100)
+        journal.sync()
+        journal.close()
+        self.assertEqual(recover(self.path)[0], 1)
+        # A crash right after the checkpoint was replaced leaves a journal of
+        # the previous generation, whose operations the checkpoint already holds
+        journal = AutosaveJournal(self.path)
+        journal.start(0, {})
+        journal.put(1, 5, b"old generation")
+        journal.close()
+        self.assertEqual(recover(self.path)[1], {1: (0, b"a" * 100)})
+
+    def test_replace_writes_a_checkpoint(self):
+        journal = self.journal()
+        journal.put(1, 0, b"old")
+        journal.replace(lambda: ({7: (0, b"loaded"), 8: (1, b"loaded too")}, {}))
+        journal.put(9, 2, b"drawn after")
+        journal.sync()
+        generation, state = recover(self.path)
+        self.assertEqual(generation, 1)
+        self.assertEqual(state, {7: (0, b"loaded"), 8: (1, b"loaded too"), 9: (2, b"drawn after")})
+
+    def test_failing_replace_keeps_the_writer_answering(self):
+        journal = self.journal()
+        journal.put(1, 0, b"kept")
+        journal.sync()
+        journal.replace(lambda: [][0])
+        journal.put(2, 1, b"after the failure")
+        self.assertTrue(journal.sync(timeout=5))
+        self.assertIsInstance(journal.error, IndexError)
+        # Journaling stops; what reached the disk before stays recoverable
+        self.assertEqual(recover(self.path)[1], {1: (0, b"kept")})
+
+    def test_failing_start_is_reported_by_the_writer(self):
+        blocked = os.path.join(self.path, "not a directory")
+        open(blocked, "w").close()
+        errors = []
+        journal = AutosaveJournal(os.path.join(blocked, "autosave"), on_error=errors.append)
+        journal.start()
+        self.addCleanup(journal.close)
+        journal.put(1, 0, b"dropped")
+        self.assertTrue(journal.sync(timeout=5))
+        self.assertIsInstance(journal.error, OSError)
+        self.assertEqual(errors, [journal.error])
+
+    def test_start_continues_the_saved_generation(self):
+        journal = self.journal(compact_bytes=0)
+        journal.put(1, 0, b"a" * 100)
+        journal.sync()
+        journal.close()
+        journal = AutosaveJournal(self.path)
+        journal.start()
+        journal.put(2, 1, b"appended")
+        journal.close()
+        self.assertEqual(recover(self.path), (1, {1: (0, b"a" * 100), 2: (1, b"appended")}))
+
+    def test_sync_notices_a_dead_writer(self):
+        journal = self.journal()
+        journal.close()
+        self.assertFalse(journal.sync())
+
+    def test_geometry_is_written_once_and_pruned(self):
+        source = pack_record(record(points=[0.0, 0.0, 5.0, 5.0], end=(5.0, 5.0)))
+        instance = lambda shape_id: pack_record(record(mode="instance", id=shape_id, geometry=9))
+        journal = self.journal()
+        journal.put(1, 0, instance(1), {9: source})
+        journal.put(2, 1, instance(2), {9: source})
+        journal.close()
+        with open(os.path.join(self.path, JOURNAL_FILE), "rb") as f:
+            self.assertEqual(sum(p[0] == OP_GEOMETRY for p in read_frames(f.read())), 1)
+        geometries = {}
+        self.assertEqual(sorted(recover(self.path, geometries)[1]), [1, 2])
+        self.assertEqual(geometries, {9: source})
+        # Compaction keeps geometry that a recovered shape still references...
+        journal = self.journal(compact_bytes=0)
+        journal.delete(1)
+        journal.put(3, 2, b"x" * 500)
+        journal.sync()
+        geometries = {}
+        self.assertEqual(sorted(recover(self.path, geometries)[1]), [2, 3])
+        self.assertEqual(geometries, {9: source})
+        # ...and drops it once nothing does
+        journal.delete(2)
+        journal.put(4, 3, b"y" * 2000)
+        journal.sync()
+        geometries = {}
+        self.assertEqual(sorted(recover(self.path, geometries)[1]), [3, 4])
+        self.assertEqual(geometries, {})
+
+    def test_session_state(self):
+        source = {"mode": "pencil", "id": None, "layer": 0, "color": 0xFF000000, "fill": None, "thickness": 2,
+                  "rotation": 0.0, "scale_x": 1.0, "scale_y": 1.0, "font_size": 22, "font_bold": False,
+                  "font_italic": False, "is_curve": False, "text": "", "points": [0.0, 0.0, 5.0, 5.0],
+                  "end": (5.0, 5.0), "text_bounds": None}
+        instance = dict(source, mode="instance", id=4, points=[1.0, 1.0], end=(1.0, 1.0),
+                        children=[source], geometry=3, tint=None)
+        reader = SessionReader(data=encode_session([dict(source, id=2), instance, dict(instance, id=5)]))
+        state, geometries = session_state(reader, iter([17, 18]).__next__)
+        self.assertEqual(sorted(state), [2, 4, 5])
+        z, blob = state[4]
+        self.assertEqual(z, 1)
+        record = unpack_record(blob)
+        # Instances of one source share one key and do not embed the source
+        self.assertEqual(record["geometry"], 17)
+        self.assertIsNone(record["children"])
+        self.assertEqual(unpack_record(state[5][1])["geometry"], 17)
+        self.assertEqual(list(geometries), [17])
+        self.assertEqual(unpack_record(geometries[17])["points"], source["points"])
+        reader.close()
+
+if __name__ == '__main__':
+    unittest.main()
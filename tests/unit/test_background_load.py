@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+import threading
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.background_load import BackgroundLoader
+
+class TestBackgroundLoader(unittest.TestCase):
+    def test_items_arrive_in_order(self):
+        loader = BackgroundLoader(lambda: iter(range(100)))
+        loader.start()
+        out = []
+        self.assertTrue(loader.wait(out.append, timeout=5))
+        self.assertEqual(out, list(range(100)))
+        self.assertTrue(loader.done)
+        self.assertIsNone(loader.error)
+
+    def test_poll_respects_budget(self):
+        loader = BackgroundLoader(lambda: iter(range(10)))
+        loader.start()
+        loader._thread.join(5)
+        out = []
+        def slow(item):
+            out.append(item)
+            time.sleep(0.01)
+        # Each item takes longer than the budget, so one poll hands over one item
+        self.assertFalse(loader.poll(slow, budget=0.001))
+        self.assertEqual(out, [0])
+        while not loader.poll(slow, budget=0.05):
+            pass
+        self.assertEqual(out, list(range(10)))
+
+    def test_cancel_stops_the_producer(self):
+        release = threading.Event()
+        produced = []
+        def produce():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+                release.wait(5)
+        loader = BackgroundLoader(produce)
+        loader.start()
+        loader.cancel()
+        release.set()
+        out = []
+        self.assertTrue(loader.wait(out.append, timeout=5))
+        self.assertLess(len(produced), 1000)
+        self.assertEqual(out, produced)
+
+    def test_producer_error_ends_the_load(self):
+        def produce():
+            yield 1
+            raise ValueError("corrupt")
+        loader = BackgroundLoader(produce)
+        loader.start()
+        out = []
+        self.assertTrue(loader.wait(out.append, timeout=5))
+        self.assertEqual(out, [1])
+        self.assertIsInstance(loader.error, ValueError)
+
+if __name__ == '__main__':
+    unittest.main()
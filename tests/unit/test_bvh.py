@@ -0,0 +1,38 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.bvh import BVH
+
+class TestBVH(unittest.TestCase):
+    def setUp(self):
+        # A 10x10 grid of 10px boxes, 20px apart
+        self.entries = [((i, j), (i * 20, j * 20, i * 20 + 10, j * 20 + 10))
+                        for i in range(10) for j in range(10)]
+        self.bvh = BVH(self.entries)
+
+    def test_root_bounds(self):
+        self.assertEqual(self.bvh.bounds, (0, 0, 190, 190))
+        self.assertEqual(len(self.bvh), 100)
+
+    def test_point_query(self):
+        self.assertEqual(self.bvh.query_point(45, 65), [(2, 3)])
+        self.assertEqual(self.bvh.query_point(15, 15), [])
+
+    def test_rect_query_matches_linear_scan_topmost_first(self):
+        rect = (25, 5, 75, 48)
+        expected = [item for item, (x0, y0, x1, y1) in reversed(self.entries)
+                    if x0 <= rect[2] and rect[0] <= x1 and y0 <= rect[3] and rect[1] <= y1]
+        self.assertEqual(self.bvh.query_rect(rect), expected)
+
+    def test_overlapping_items_are_topmost_first(self):
+        bvh = BVH([('a', (0, 0, 50, 50)), ('b', (10, 10, 60, 60)), ('c', (100, 100, 110, 110))])
+        self.assertEqual(bvh.query_point(20, 20), ['b', 'a'])
+
+    def test_empty(self):
+        bvh = BVH([])
+        self.assertIsNone(bvh.bounds)
+        self.assertEqual(bvh.query_point(0, 0), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import math
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.curve_fit import fit_curve, CurveFitter, flatten, bezier_point
+from src.hit_testing import segment_distance_sq
+
+def _wave(n):
+    return [(100 + 800 * i / n, 300 + 80 * math.sin(12 * i / n)) for i in range(n)]
+
+def _max_deviation(points, coords):
+    worst = 0.0
+    for x, y in points:
+        d = min(segment_distance_sq(coords[i], coords[i + 1], coords[i + 2], coords[i + 3], x, y)
+                for i in range(0, len(coords) - 2, 2))
+        worst = max(worst, d)
+    return math.sqrt(worst)
+
+class TestCurveFit(unittest.TestCase):
+    def test_straight_line_is_one_segment(self):
+        segments = fit_curve([(i, 2 * i) for i in range(100)], error=0.5)
+        self.assertEqual(len(segments), 1)
+        self.assertEqual(segments[0][0], (0.0, 0.0))
+        self.assertEqual(segments[0][3], (99.0, 198.0))
+
+    def test_fit_within_tolerance(self):
+        points = _wave(1000)
+        segments = fit_curve(points, error=1.0)
+        self.assertLess(3 * len(segments) + 1, len(points) / 10)
+        self.assertLess(_max_deviation(points[::7], flatten(segments, 1.0)), 1.1)
+
+    def test_streaming_fitter_matches_stroke(self):
+        points = _wave(2000)
+        fitter = CurveFitter(error=1.5)
+        for x, y in points:
+            fitter.add_point(x, y)
+        segments = fitter.finish()
+        self.assertLess(3 * len(segments) + 1, len(points) / 10)
+        self.assertLess(_max_deviation(points[::11], flatten(segments, 1.0)), 1.6)
+        # Segments are chained end to end
+        for a, b in zip(segments, segments[1:]):
+            self.assertEqual(a[3], b[0])
+
+    def test_degenerate_input(self):
+        self.assertEqual(fit_curve([(5, 5), (5, 5)]), [])
+        self.assertEqual(bezier_point(((0, 0), (0, 0), (10, 0), (10, 0)), 0.5), (5.0, 0.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.history import History
+from src.scene import Scene
+
+class Shape:
+    def __init__(self, x):
+        self.id = None
+        self.x = x
+
+    def copy(self):
+        c = Shape(self.x)
+        c.id = self.id
+        return c
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.scene = Scene()
+        self.history = History(lambda s: s.copy(), keyframe_interval=4)
+        self.scene.changes.subscribe(self.history.on_scene_changed)
+
+    def commit(self):
+        self.scene.changes.flush()
+        self.history.commit(self.scene)
+
+    def xs(self):
+        return [s.x for s in self.scene]
+
+    def test_undo_redo(self):
+        a = Shape(1)
+        self.scene.add(a)
+        self.commit()
+        a.x = 5
+        self.scene.mark_transformed(a)
+        self.commit()
+        self.assertEqual(len(self.history), 2)
+        self.history.undo(self.scene)
+        self.assertEqual(self.xs(), [1])
+        self.history.undo(self.scene)
+        self.assertEqual(self.xs(), [])
+        self.history.redo(self.scene)
+        self.history.redo(self.scene)
+        self.assertEqual(self.xs(), [5])
+
+    def test_undo_restores_z_order(self):
+        shapes = [Shape(i) for i in range(3)]
+        for s in shapes:
+            self.scene.add(s)
+            self.commit()
+        self.scene.delete(shapes[1].id)
+        self.commit()
+        self.history.undo(self.scene)
+        self.assertEqual(self.xs(), [0, 1, 2])
+
+    def test_random_access_seek(self):
+        for i in range(30):
+            self.scene.add(Shape(i))
+            self.commit()
+        for target in (0, 17, 3, 30, 9):
+            self.history.seek(self.scene, target)
+            self.assertEqual(self.xs(), list(range(target)))
+            self.assertEqual(self.history.position, target)
+
+    def test_new_edit_discards_redo_branch(self):
+        for i in range(10):
+            self.scene.add(Shape(i))
+            self.commit()
+        self.history.seek(self.scene, 2)
+        self.scene.add(Shape(99))
+        self.commit()
+        self.assertEqual(len(self.history), 3)
+        self.history.seek(self.scene, 0)
+        self.history.seek(self.scene, 3)
+        self.assertEqual(self.xs(), [0, 1, 99])
+
+    def test_trim_keeps_latest_state(self):
+        history = History(lambda s: s.copy(), keyframe_interval=4, max_entries=8)
+        self.scene.changes.subscribe(history.on_scene_changed)
+        for i in range(20):
+            self.scene.add(Shape(i))
+            self.scene.changes.flush()
+            history.commit(self.scene)
+        self.assertLessEqual(len(history), 12)
+        history.seek(self.scene, 0)
+        history.seek(self.scene, len(history))
+        self.assertEqual(self.xs(), list(range(20)))
+
+    def test_unchanged_snapshot_is_not_an_entry(self):
+        history = History(lambda s: (s.x,), lambda t: Shape(t[0]))
+        self.scene.changes.subscribe(history.on_scene_changed)
+        a = Shape(3)
+        self.scene.add(a)
+        self.scene.changes.flush()
+        self.assertTrue(history.commit(self.scene))
+        self.scene.mark_transformed(a)
+        self.scene.changes.flush()
+        self.assertFalse(history.commit(self.scene))
+        self.assertEqual(len(history), 1)
+
+    def test_reset_with_base_payloads(self):
+        restored = []
+        def restore(payload):
+            restored.append(payload)
+            return Shape(payload[1]) if payload[0] == "ref" else payload.copy()
+        history = History(lambda s: s.copy(), restore)
+        self.scene.changes.subscribe(history.on_scene_changed)
+        a = Shape(7)
+        self.scene.add(a)
+        self.scene.changes.flush()
+        history.reset(self.scene, snapshot=lambda s: ("ref", s.x))
+        a.x = 8
+        self.scene.mark_transformed(a)
+        self.scene.changes.flush()
+        history.commit(self.scene)
+        history.undo(self.scene)
+        self.assertEqual(self.xs(), [7])
+        self.assertEqual(restored, [("ref", 7)])
+
+    def test_adopted_shapes_survive_undo(self):
+        a = Shape(1)
+        self.scene.add(a)
+        self.commit()
+        for x in range(2, 7):
+            a.x = x
+            self.scene.mark_transformed(a)
+            self.commit()
+        late = Shape(100)
+        self.scene.add(late, z=-1)
+        self.scene.changes.flush()
+        self.history.adopt({late.id: (-1, late.copy())})
+        self.assertFalse(self.history.has_uncommitted())
+        self.history.undo(self.scene)
+        self.assertEqual(self.xs(), [100, 5])
+        # Far seeks rebuild from keyframes, which include the adopted shape too
+        self.history.seek(self.scene, 0)
+        self.assertEqual(self.xs(), [100])
+        self.history.seek(self.scene, len(self.history))
+        self.assertEqual(self.xs(), [100, 6])
+
+    def test_on_change_reports_recorded_states(self):
+        changes = []
+        history = History(lambda s: (s.x,), lambda t: Shape(t[0]), keyframe_interval=2, on_change=changes.append)
+        self.scene.changes.subscribe(history.on_scene_changed)
+        a, b = Shape(1), Shape(2)
+        self.scene.add(a)
+        self.scene.add(b)
+        self.scene.changes.flush()
+        history.commit(self.scene)
+        self.assertEqual(changes, [{a.id: (0, (1,)), b.id: (1, (2,))}])
+        for x in range(3, 8):
+            a.x = x
+            self.scene.mark_transformed(a)
+            self.scene.changes.flush()
+            history.commit(self.scene)
+        self.assertEqual(changes[-1], {a.id: (0, (7,))})
+        history.undo(self.scene)
+        self.assertEqual(changes[-1], {a.id: (0, (6,))})
+        # A far seek rebuilds the scene but reports only the difference
+        history.seek(self.scene, 0)
+        self.assertEqual(changes[-1], {a.id: None, b.id: None})
+        history.seek(self.scene, 5)
+        self.assertEqual(changes[-1], {a.id: (0, (6,)), b.id: (1, (2,))})
+        history.seek(self.scene, 5)
+        self.assertEqual(len(changes), 9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src import hit_testing
+
+class TestHitTesting(unittest.TestCase):
+    def test_polyline_distance(self):
+        coords = [0, 0, 100, 0, 100, 100]
+        self.assertTrue(hit_testing.point_near_polyline(coords, 50, 4, 5))
+        self.assertTrue(hit_testing.point_near_polyline(coords, 104, 50, 5))
+        self.assertFalse(hit_testing.point_near_polyline(coords, 50, 50, 5))
+
+    def test_polyline_bounds_prefilter(self):
+        coords = [0, 0, 100, 0]
+        self.assertFalse(hit_testing.point_near_polyline(coords, 50, 0, 5, bounds=(200, 200, 300, 300)))
+
+    def test_zero_length_segment(self):
+        self.assertTrue(hit_testing.point_near_segment(10, 10, 10, 10, 12, 10, 3))
+        self.assertFalse(hit_testing.point_near_segment(10, 10, 10, 10, 20, 10, 3))
+
+    def test_ellipse_uses_real_outline(self):
+        rect = (0, 0, 100, 100)
+        self.assertTrue(hit_testing.point_in_ellipse(rect, 50, 50))
+        # Corner of the bounding box is outside the ellipse itself
+        self.assertFalse(hit_testing.point_in_ellipse(rect, 5, 5, 2))
+
+    def test_diamond_uses_real_outline(self):
+        rect = (0, 0, 100, 100)
+        self.assertTrue(hit_testing.point_in_diamond(rect, 50, 50))
+        self.assertTrue(hit_testing.point_in_diamond(rect, 50, -3, 5))
+        self.assertFalse(hit_testing.point_in_diamond(rect, 5, 5, 2))
+
+    def test_tolerance_scales_with_width(self):
+        self.assertGreater(hit_testing.hit_tolerance(20), hit_testing.hit_tolerance(2))
+
+    def test_segment_crossing_polyline_between_samples(self):
+        coords = [0, 0, 100, 0, 100, 100]
+        # A fast sweep jumps over the stroke; both endpoints are far from it
+        self.assertTrue(hit_testing.segment_near_polyline(coords, 50, -40, 50, 40, 2))
+        self.assertFalse(hit_testing.segment_near_polyline(coords, 50, 10, 90, 90, 2))
+
+    def test_segment_box_and_ellipse(self):
+        self.assertTrue(hit_testing.segment_in_bounds((0, 0, 10, 10), -5, 5, 20, 5))
+        self.assertFalse(hit_testing.segment_in_bounds((0, 0, 10, 10), -5, 15, 20, 30))
+        self.assertTrue(hit_testing.segment_in_ellipse((0, 0, 100, 100), -10, 50, 110, 50))
+        # Cuts the bounding-box corner but misses the ellipse
+        self.assertFalse(hit_testing.segment_in_ellipse((0, 0, 100, 100), -5, 10, 10, -5))
+        self.assertTrue(hit_testing.segment_in_diamond((0, 0, 100, 100), 40, 40, 60, 60))
+
+    def test_point_in_polygon(self):
+        # Concave "L" outline
+        poly = [0, 0, 100, 0, 100, 20, 20, 20, 20, 100, 0, 100]
+        self.assertTrue(hit_testing.point_in_polygon(poly, 10, 90))
+        self.assertTrue(hit_testing.point_in_polygon(poly, 90, 10))
+        self.assertFalse(hit_testing.point_in_polygon(poly, 60, 60))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import sys
+import os
+import io
+import struct
+import tempfile
+import threading
+import zlib
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.image_export import ExportJob, ExportCancelled, write_png, save_png, PNG_SIGNATURE, STRIP_ROWS
+
+def read_png(data):
+    """(width, height, raw rows) of a PNG written by write_png, checking every CRC"""
+    assert data.startswith(PNG_SIGNATURE)
+    pos = len(PNG_SIGNATURE)
+    idat = b""
+    while pos < len(data):
+        (length,) = struct.unpack_from(">I", data, pos)
+        kind = data[pos + 4:pos + 8]
+        body = data[pos + 8:pos + 8 + length]
+        (crc,) = struct.unpack_from(">I", data, pos + 8 + length)
+        assert crc == zlib.crc32(kind + body)
+        if kind == b"IHDR":
+            width, height = struct.unpack_from(">II", body)
+        elif kind == b"IDAT":
+            idat += body
+        pos += 12 + length
+    return width, height, zlib.decompress(idat)
+
+def rows(width, height):
+    return [bytes((x * 7 + y) % 256 for x in range(width * 4)) for y in range(height)]
+
+class TestImageExport(unittest.TestCase):
+    def test_png_round_trip(self):
+        width, height = 5, STRIP_ROWS + 3
+        image = rows(width, height)
+        out = io.BytesIO()
+        write_png(out, width, height, image)
+        w, h, raw = read_png(out.getvalue())
+        self.assertEqual((w, h), (width, height))
+        stride = width * 4 + 1
+        self.assertEqual([raw[y * stride] for y in range(height)], [0] * height)
+        self.assertEqual([raw[y * stride + 1:(y + 1) * stride] for y in range(height)], image)
+
+    def test_rejects_short_rows(self):
+        with self.assertRaises(ValueError):
+            write_png(io.BytesIO(), 4, 1, [b"\x00" * 15])
+
+    def test_job_reports_progress_and_result(self):
+        seen = []
+        def work(job):
+            out = io.BytesIO()
+            write_png(out, 2, STRIP_ROWS * 4, rows(2, STRIP_ROWS * 4), job, 0.5, 1.0)
+            seen.append(job.progress)
+            return out.getvalue()
+        job = ExportJob(work)
+        job.start()
+        self.assertTrue(job.wait(5))
+        self.assertIsNone(job.error)
+        self.assertEqual(seen, [1.0])
+        self.assertEqual(read_png(job.result)[:2], (2, STRIP_ROWS * 4))
+
+    def test_cancel_leaves_no_file(self):
+        path = os.path.join(tempfile.mkdtemp(), "out.png")
+        started = threading.Event()
+        def slow_rows(job):
+            for y, row in enumerate(rows(2, STRIP_ROWS * 8)):
+                if y == STRIP_ROWS:
+                    started.set()
+                    job.cancel()
+                yield row
+        def work(job):
+            save_png(path, 2, STRIP_ROWS * 8, slow_rows(job), job)
+        job = ExportJob(work)
+        job.start()
+        self.assertTrue(job.wait(5))
+        self.assertTrue(started.is_set())
+        self.assertIsNone(job.error)
+        self.assertLess(job.progress, 1.0)
+        self.assertEqual(os.listdir(os.path.dirname(path)), [])
+
+    def test_concurrent_exports_to_one_path(self):
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, "out.png")
+        both_writing = threading.Barrier(2)
+        errors = []
+        def export(width):
+            def paced_rows():
+                for y, row in enumerate(rows(width, STRIP_ROWS * 2)):
+                    if y == STRIP_ROWS:
+                        both_writing.wait(5)
+                    yield row
+            try:
+                save_png(path, width, STRIP_ROWS * 2, paced_rows())
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=export, args=(width,)) for width in (2, 3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(errors, [])
+        # The file is one export or the other, never a mix, and no temporary file is left
+        with open(path, "rb") as f:
+            width, height, raw = read_png(f.read())
+        self.assertIn(width, (2, 3))
+        self.assertEqual(len(raw), (width * 4 + 1) * height)
+        self.assertEqual(os.listdir(folder), ["out.png"])
+
+    def test_errors_are_kept(self):
+        def work(job):
+            job.check()
+            raise OSError("disk full")
+        job = ExportJob(work)
+        job.start()
+        job.wait(5)
+        self.assertIsInstance(job.error, OSError)
+        cancelled = ExportJob(lambda job: job.check())
+        cancelled.cancel()
+        cancelled.start()
+        cancelled.wait(5)
+        self.assertIsNone(cancelled.error)
+        self.assertIsNone(cancelled.result)
+
+if __name__ == '__main__':
+    unittest.main()
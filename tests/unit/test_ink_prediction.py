@@ -0,0 +1,41 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.ink_prediction import StrokePredictor
+
+class TestStrokePredictor(unittest.TestCase):
+    def feed_line(self, predictor, vx=500.0, vy=-250.0, rate=240, count=10):
+        for i in range(count):
+            t = i / rate
+            predictor.add_sample(vx * t, vy * t, t)
+        return (count - 1) / rate
+
+    def test_constant_velocity_is_extrapolated(self):
+        p = StrokePredictor(horizon=0.02)
+        t = self.feed_line(p)
+        x, y = p.predict(now=t)
+        self.assertAlmostEqual(x, 500.0 * (t + 0.02), places=6)
+        self.assertAlmostEqual(y, -250.0 * (t + 0.02), places=6)
+
+    def test_resting_pen_is_not_predicted(self):
+        p = StrokePredictor(horizon=0.02)
+        for i in range(10):
+            p.add_sample(100.0, 100.0, i / 240)
+        self.assertIsNone(p.predict())
+
+    def test_stale_samples_and_zero_horizon(self):
+        p = StrokePredictor(horizon=0.02)
+        t = self.feed_line(p)
+        self.assertIsNone(p.predict(now=t + 0.1))
+        p.horizon = 0
+        self.assertIsNone(p.predict(now=t))
+
+    def test_prediction_distance_is_capped(self):
+        p = StrokePredictor(horizon=0.05, max_distance=10.0)
+        t = self.feed_line(p, vx=5000.0, vy=0.0)
+        x, y = p.predict(now=t)
+        self.assertAlmostEqual(x - 5000.0 * t, 10.0, places=6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.input_pipeline import InputPipeline, iter_samples
+
+class TestInputPipeline(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.pipeline = InputPipeline(self.batches.append)
+
+    def test_samples_are_delivered_once_per_flush(self):
+        for i in range(5):
+            self.pipeline.push(i, i * 2, 0.5, i / 1000)
+        self.assertEqual(len(self.pipeline), 5)
+        self.assertEqual(self.batches, [])
+        self.assertEqual(self.pipeline.flush(), 5)
+        self.assertEqual(len(self.batches), 1)
+        samples = list(iter_samples(self.batches[0]))
+        self.assertEqual(samples[3], (3.0, 6.0, 0.5, 0.003))
+        self.assertEqual(len(self.pipeline), 0)
+
+    def test_empty_flush_does_not_call_consumer(self):
+        self.assertEqual(self.pipeline.flush(), 0)
+        self.assertEqual(self.batches, [])
+
+    def test_clear_and_max_batch(self):
+        for i in range(3):
+            self.pipeline.push(i, i)
+        self.pipeline.flush()
+        self.pipeline.push(1, 1)
+        self.pipeline.clear()
+        self.assertEqual(self.pipeline.flush(), 0)
+        self.assertEqual(self.pipeline.max_batch, 3)
+
+if __name__ == '__main__':
+    unittest.main()
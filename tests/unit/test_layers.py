@@ -0,0 +1,44 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.layers import LayerStack
+
+class TestLayerStack(unittest.TestCase):
+    def setUp(self):
+        self.stack = LayerStack()
+
+    def test_add_becomes_active(self):
+        layer = self.stack.add("Notes")
+        self.assertEqual(self.stack.active_id, layer.id)
+        self.assertEqual([l.name for l in self.stack], ["Layer 1", "Notes"])
+
+    def test_last_layer_cannot_be_removed(self):
+        self.assertIsNone(self.stack.remove(1))
+        self.assertEqual(len(self.stack), 1)
+
+    def test_remove_active_falls_back_below(self):
+        a = self.stack.add()
+        b = self.stack.add()
+        self.stack.remove(b.id)
+        self.assertEqual(self.stack.active_id, a.id)
+        self.assertIs(self.stack.resolve(b.id), self.stack.layers[0])
+
+    def test_move_and_order(self):
+        a = self.stack.add()
+        self.stack.move(a.id, -5)
+        self.assertEqual(self.stack.order_of(a.id), 0)
+        self.assertEqual(self.stack.order_of(1), 1)
+
+    def test_config_round_trip(self):
+        a = self.stack.add("Top")
+        a.opacity = 0.5
+        a.visible = False
+        other = LayerStack()
+        other.load_config(self.stack.to_config())
+        self.assertEqual([(l.id, l.name, l.visible, l.opacity) for l in other],
+                         [(1, "Layer 1", True, 1.0), (a.id, "Top", False, 0.5)])
+        self.assertEqual(other.add().id, a.id + 1)
+
+if __name__ == '__main__':
+    unittest.main()
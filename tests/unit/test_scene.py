@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.scene import Scene
+
+class Shape:
+    def __init__(self, name):
+        self.name = name
+        self.id = None
+
+class TestScene(unittest.TestCase):
+    def setUp(self):
+        self.scene = Scene()
+        self.a, self.b, self.c = Shape('a'), Shape('b'), Shape('c')
+        self.scene.add_many([self.a, self.b, self.c])
+
+    def names(self, shapes):
+        return [s.name for s in shapes]
+
+    def test_ids_are_stable_and_unique(self):
+        self.assertEqual(len({self.a.id, self.b.id, self.c.id}), 3)
+        self.scene.delete(self.b.id)
+        d = Shape('d')
+        self.scene.add(d)
+        self.assertNotIn(d.id, (self.a.id, self.c.id))
+        self.assertNotEqual(d.id, self.b.id)
+        self.assertIs(self.scene.get(self.c.id), self.c)
+
+    def test_z_order(self):
+        self.assertEqual(self.names(self.scene), ['a', 'b', 'c'])
+        self.assertEqual(self.names(reversed(self.scene)), ['c', 'b', 'a'])
+        self.scene.raise_to_top(self.a.id)
+        self.assertEqual(self.names(self.scene), ['b', 'c', 'a'])
+        self.scene.lower_to_bottom(self.c.id)
+        self.assertEqual(self.names(self.scene), ['c', 'b', 'a'])
+
+    def test_reinsert_at_original_z(self):
+        z = self.scene.z_of(self.b.id)
+        self.scene.delete(self.b.id)
+        self.scene.add(self.b, z=z)
+        self.assertEqual(self.names(self.scene), ['a', 'b', 'c'])
+
+    def test_bulk_delete_and_membership(self):
+        removed = self.scene.delete_many([self.a.id, self.c.id, 999])
+        self.assertEqual(self.names(removed), ['a', 'c'])
+        self.assertEqual(len(self.scene), 1)
+        self.assertIn(self.b, self.scene)
+        self.assertNotIn(self.a, self.scene)
+
+    def test_bulk_delete_is_one_event(self):
+        self.scene.changes.flush()
+        self.scene.delete_many([self.a.id, self.c.id])
+        events = self.scene.changes.flush()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(sorted(events[0].shape_ids), sorted([self.a.id, self.c.id]))
+
+    def test_reset_keeps_ids(self):
+        ids = [self.a.id, self.b.id]
+        self.scene.reset([self.a, self.b])
+        self.assertEqual(self.scene.ids(), ids)
+
+    def test_reserve_keeps_late_content_apart(self):
+        scene = Scene()
+        scene.reserve(1000, 1000)
+        early = Shape('early')
+        scene.add(early)
+        self.assertEqual((early.id, scene.z_of(early.id)), (1000, 1000))
+        # Content arriving later keeps its own ids and goes below
+        late = Shape('late')
+        late.id = 3
+        scene.add(late, z=3)
+        self.assertEqual(self.names(scene), ['late', 'early'])
+        # Reserving lower than what is in use does not rewind the counters
+        scene.reserve(4, 4)
+        newer = Shape('newer')
+        scene.add(newer)
+        self.assertEqual(newer.id, 1001)
+        self.assertEqual(self.names(scene), ['late', 'early', 'newer'])
+        scene.clear()
+        scene.reserve(10, 10)
+        scene.add(Shape('x'))
+        self.assertEqual(scene.ids(), [10])
+
+if __name__ == '__main__':
+    unittest.main()
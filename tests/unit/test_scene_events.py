@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src import scene_events
+from src.scene import Scene
+from src.scene_events import SceneChangeBus
+
+class Shape:
+    def __init__(self, rect):
+        self.id = None
+        self.rect = rect
+
+    def bounds(self):
+        return self.rect
+
+class TestSceneChangeBus(unittest.TestCase):
+    def setUp(self):
+        self.received = []
+        self.scene = Scene()
+        self.scene.changes.subscribe(self.received.extend)
+
+    def kinds(self):
+        return [(e.kind, sorted(e.shape_ids)) for e in self.received]
+
+    def test_add_then_transform_coalesces_to_added(self):
+        s = Shape((0, 0, 10, 10))
+        self.scene.add(s)
+        self.scene.mark_transformed(s)
+        self.scene.changes.flush()
+        self.assertEqual(self.kinds(), [(scene_events.ADDED, [s.id])])
+
+    def test_add_then_remove_in_one_frame_is_dropped(self):
+        s = Shape((0, 0, 10, 10))
+        self.scene.add(s)
+        self.scene.delete(s.id)
+        self.assertEqual(self.scene.changes.flush(), [])
+        self.assertEqual(self.received, [])
+
+    def test_flush_delivers_once_per_frame(self):
+        a, b = Shape((0, 0, 10, 10)), Shape((20, 20, 30, 30))
+        self.scene.add_many([a, b])
+        self.scene.changes.flush()
+        self.received.clear()
+        self.scene.mark_transformed(a)
+        self.scene.mark_restyled(a)
+        self.scene.mark_transformed(b)
+        events = self.scene.changes.flush()
+        self.assertEqual(self.kinds(), [(scene_events.TRANSFORMED, [a.id, b.id]), (scene_events.RESTYLED, [a.id])])
+        self.assertEqual(events[0].rect, (0, 0, 30, 30))
+        self.assertEqual(self.scene.changes.flush(), [])
+
+    def test_reset_reports_clear_then_adds(self):
+        a = Shape((0, 0, 10, 10))
+        self.scene.add(a)
+        self.scene.changes.flush()
+        self.received.clear()
+        self.scene.reset([a])
+        self.scene.changes.flush()
+        self.assertEqual(self.kinds(), [(scene_events.CLEARED, []), (scene_events.ADDED, [a.id])])
+
+    def test_remove_then_readd_is_delivered_as_both(self):
+        bus = SceneChangeBus()
+        bus.emit(scene_events.REMOVED, [7])
+        bus.emit(scene_events.ADDED, [7])
+        kinds = [e.kind for e in bus.flush()]
+        self.assertEqual(kinds, [scene_events.REMOVED, scene_events.ADDED])
+
+if __name__ == '__main__':
+    unittest.main()
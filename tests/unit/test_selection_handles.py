@@ -0,0 +1,35 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.selection_handles import HandleLayout, ROTATION_OFFSET
+
+class TestHandleLayout(unittest.TestCase):
+    def setUp(self):
+        self.layout = HandleLayout((100, 100, 300, 200))
+
+    def test_corner_and_edge_handles(self):
+        self.assertEqual(self.layout.hit(100, 100), 'top-left')
+        self.assertEqual(self.layout.hit(304, 203), 'bottom-right')
+        self.assertEqual(self.layout.hit(200, 97), 'top-center')
+        self.assertEqual(self.layout.hit(99, 150), 'left-center')
+
+    def test_rotation_move_and_outside(self):
+        self.assertEqual(self.layout.hit(200, 100 - ROTATION_OFFSET), 'rotation')
+        self.assertEqual(self.layout.hit(150, 130), 'move')
+        self.assertIsNone(self.layout.hit(50, 50))
+        self.assertIsNone(self.layout.hit(150, 210))
+
+    def test_handles_for_drawing(self):
+        names = [name for name, x, y in self.layout.handles]
+        self.assertEqual(len(names), 9)
+        self.assertIn(('bottom-center', 200, 200), self.layout.handles)
+
+    def test_fixed_size_selection_only_moves(self):
+        layout = HandleLayout((100, 100, 300, 200), resizable=False)
+        self.assertEqual(layout.handles, [])
+        self.assertEqual(layout.hit(100, 100), 'move')
+        self.assertIsNone(layout.hit(200, 100 - ROTATION_OFFSET))
+
+if __name__ == '__main__':
+    unittest.main()
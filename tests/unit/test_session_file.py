@@ -0,0 +1,163 @@
+import unittest
+import sys
+import os
+import random
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.session_file import SessionReader, encode_session, write_session, SCENE, GEOMETRY
+
+def record(**kw):
+    r = {"mode": "pencil", "id": 3, "layer": 2, "color": 0xFFFF0000, "fill": None, "thickness": 4,
+         "rotation": 0.0, "scale_x": 1.0, "scale_y": 1.0, "font_size": 22,
+         "font_bold": False, "font_italic": False, "is_curve": False, "text": "",
+         "points": [10.0, 20.0, 12.5, 21.0, 9.0, 18.0], "end": (9.0, 18.0), "text_bounds": None}
+    r.update(kw)
+    return r
+
+class TestSessionFile(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "session.tds")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def open(self, records, meta=None):
+        write_session(self.path, records, meta)
+        reader = SessionReader(self.path)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_round_trip(self):
+        records = [record(), record(mode="text", id=4, text="Héllo", fill=0x80112233, font_bold=True,
+                                    text_bounds=(1.0, 2.0, 30.0, 12.0), points=[5.0, 5.0], end=(5.0, 5.0)),
+                   record(mode="rect", id=5, rotation=0.5, points=[0.0, 0.0], end=(40.0, 30.0))]
+        reader = self.open(records, {"layers": {"active": 2}})
+        self.assertEqual(reader.scene_count, 3)
+        self.assertEqual(reader.meta["layers"], {"active": 2})
+        for row, expected in enumerate(records):
+            out = reader.record(row)
+            for key in ("mode", "id", "layer", "color", "fill", "thickness", "font_size", "font_bold",
+                        "text", "points", "text_bounds", "rotation"):
+                self.assertEqual(out[key], expected[key], key)
+            self.assertEqual(list(out["end"]), list(expected["end"]))
+        # The stroke and the box share a style
+        self.assertEqual(len(reader._styles), 2)
+
+    def test_lazy_rows(self):
+        reader = self.open([record(bounds=(9.0, 18.0, 12.5, 21.0), pressures=[0.0, 0.5, 1.0]), record(id=8)])
+        lazy = reader.records(0, 2, points=False)
+        self.assertEqual(lazy[0]["points"], [10.0, 20.0])
+        self.assertEqual(lazy[0]["bounds"], (9.0, 18.0, 12.5, 21.0))
+        self.assertIsNone(lazy[1]["bounds"])
+        self.assertAlmostEqual(lazy[0]["pressures"][1], 0.5, delta=1 / 255)
+        self.assertIsNone(lazy[1]["pressures"])
+        self.assertEqual(list(reader.points(1)), record()["points"])
+        self.assertEqual(reader.point_count(1), 3)
+
+    def test_groups_and_shared_geometry(self):
+        source = record(id=None)
+        group = record(mode="group", id=10, points=[1.0, 1.0], end=(1.0, 1.0),
+                       children=[record(id=11), record(mode="rect", id=12, points=[0.0, 0.0], end=(5.0, 5.0))])
+        first = record(mode="instance", id=13, points=[3.0, 3.0], end=(3.0, 3.0), children=[source],
+                       geometry=42, tint=0xFF00FF00)
+        second = record(mode="instance", id=14, points=[4.0, 4.0], end=(4.0, 4.0), children=[source], geometry=42)
+        reader = self.open([group, first, second])
+        self.assertEqual(reader.scene_count, 3)
+        children = reader.children(0)
+        self.assertEqual([reader.record(row)["id"] for row in children], [11, 12])
+        self.assertTrue(all(reader.parent(row) == 0 for row in children))
+        # One stored copy of the shared source, referenced by both instances
+        self.assertEqual(reader.geometry_row(1), reader.geometry_row(2))
+        self.assertEqual(reader.parent(reader.geometry_row(1)), GEOMETRY)
+        self.assertEqual(reader.parent(1), SCENE)
+        self.assertEqual(len(reader), 6)
+        full = reader.full_record(1)
+        self.assertEqual(full["tint"], 0xFF00FF00)
+        self.assertEqual(full["children"][0]["points"], source["points"])
+        self.assertEqual(reader.full_record(2, lambda row: row + 100)["geometry"], reader.geometry_row(2) + 100)
+
+    def test_instances_referencing_geometry(self):
+        source = record(id=None)
+        first = record(mode="instance", id=13, points=[3.0, 3.0], end=(3.0, 3.0), geometry=42)
+        second = record(mode="instance", id=14, points=[4.0, 4.0], end=(4.0, 4.0), geometry=42)
+        write_session(self.path, [first, second], geometries={42: source})
+        reader = SessionReader(self.path)
+        self.addCleanup(reader.close)
+        self.assertEqual(len(reader), 3)
+        self.assertEqual(reader.geometry_row(0), reader.geometry_row(1))
+        self.assertEqual(reader.record(reader.geometry_row(0))["points"], source["points"])
+
+    def test_detach_releases_the_file(self):
+        reader = self.open([record()])
+        reader.detach()
+        # The mapping is gone, so the file can be replaced while rows stay readable
+        write_session(self.path, [record(id=9)])
+        self.assertEqual(reader.record(0)["id"], 3)
+        replaced = SessionReader(self.path)
+        self.assertEqual(replaced.record(0)["id"], 9)
+        replaced.close()
+
+    def test_opener_outlives_the_reader_and_the_file(self):
+        reader = self.open([record()])
+        mapped = reader.opener()
+        reader.detach()
+        in_memory = reader.opener()
+        reader.close()
+        write_session(self.path, [record(id=9)])
+        for open_reader in (mapped, in_memory):
+            copy = open_reader()
+            self.assertEqual(copy.record(0)["id"], 3)
+            copy.close()
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"PNG not a session")
+        with self.assertRaises(ValueError):
+            SessionReader(self.path)
+        open(self.path, "wb").close()
+        with self.assertRaises(ValueError):
+            SessionReader(self.path)
+        data = encode_session([record()])
+        with self.assertRaises(ValueError):
+            SessionReader(data=data[:len(data) // 2])
+
+    def test_corrupt_rows_fail_when_decoded(self):
+        import struct
+        from src.session_file import _HEADER, _SECTION, _COLUMNS
+        group = record(mode="group", id=4, points=[0.0, 0.0], end=(0.0, 0.0), children=[record(id=None)])
+        data = bytearray(encode_session([record(), group, record(id=5)]))
+        # Point the group's children past the last row
+        ref = [name for name, _, _ in _COLUMNS].index("ref")
+        offset, _ = _SECTION.unpack_from(data, _HEADER.size + ref * _SECTION.size)
+        struct.pack_into("<I", data, offset + 4 * 1, 1000)
+        reader = SessionReader(data=bytes(data))
+        self.assertEqual(reader.record(0)["id"], 3)
+        with self.assertRaises(ValueError):
+            reader.full_record(1)
+        with self.assertRaises(ValueError):
+            reader.records(0, 3)
+        self.assertEqual(reader.record(2)["id"], 5)
+
+    def test_malformed_files_raise_value_error(self):
+        group = record(mode="group", points=[0.0, 0.0], end=(0.0, 0.0), children=[record(id=None)])
+        instance = record(mode="instance", id=5, points=[1.0, 1.0], end=(1.0, 1.0), tint=None,
+                          children=[record(id=None, pressures=[0.5, 0.5, 0.5])])
+        data = encode_session([record(text="x"), group, instance], {"layers": {}})
+        rng = random.Random(7)
+        for size in range(len(data)):
+            with self.assertRaises(ValueError):
+                SessionReader(data=data[:size])
+        # Corrupt bytes anywhere either fail to open with ValueError or still decode every row
+        for _ in range(2000):
+            corrupt = bytearray(data)
+            corrupt[rng.randrange(len(data))] = rng.randrange(256)
+            try:
+                reader = SessionReader(data=bytes(corrupt))
+                for row in range(reader.scene_count):
+                    reader.full_record(row)
+            except ValueError:
+                pass
+
+if __name__ == '__main__':
+    unittest.main()
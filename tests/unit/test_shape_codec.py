@@ -0,0 +1,134 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.shape_codec import pack_record, unpack_record, QUANTUM
+
+def record(**kw):
+    r = {"mode": "pencil", "id": 3, "layer": 2, "color": 0xFFFF0000, "fill": None, "thickness": 4,
+         "rotation": 0.0, "scale_x": 1.0, "scale_y": 1.0, "font_size": 22,
+         "font_bold": False, "font_italic": False, "is_curve": False, "text": "",
+         "points": [10.0, 20.0, 12.5, 21.0, 9.0, 18.0], "end": (9.0, 18.0), "text_bounds": None}
+    r.update(kw)
+    return r
+
+class TestShapeCodec(unittest.TestCase):
+    def test_round_trip(self):
+        r = record()
+        out = unpack_record(pack_record(r))
+        for key in ("mode", "id", "layer", "color", "fill", "thickness", "font_size", "text", "is_curve"):
+            self.assertEqual(out[key], r[key])
+        self.assertEqual(out["points"], r["points"])
+        self.assertEqual(list(out["end"]), list(r["end"]))
+
+    def test_quantization_error_is_bounded(self):
+        pts = [0.013, 1000.987, -333.333, 0.49, 77.77, -0.06]
+        out = unpack_record(pack_record(record(points=pts, end=(1.234, -5.678))))
+        for a, b in zip(out["points"] + list(out["end"]), pts + [1.234, -5.678]):
+            self.assertLessEqual(abs(a - b), 0.5 / QUANTUM)
+
+    def test_exact_round_trip(self):
+        pts = [0.013, 1000.987, -333.333, 0.49, 77.77, 1 / 3]
+        child = record(points=pts, end=(1.234, -5.678), rotation=12.345678, scale_x=1.1,
+                       pressures=[0.123, 0.456], text_bounds=(0.1, 0.2, 30.3, 12.7))
+        r = record(mode="group", points=[0.1, 0.7], end=(0.1, 0.7), children=[child])
+        out = unpack_record(pack_record(r, exact=True))
+        self.assertEqual(out["points"], [0.1, 0.7])
+        inner = out["children"][0]
+        self.assertEqual(inner["points"], pts)
+        self.assertEqual(list(inner["end"]), [1.234, -5.678])
+        self.assertEqual((inner["rotation"], inner["scale_x"]), (12.345678, 1.1))
+        self.assertEqual(inner["pressures"], [0.123, 0.456])
+        self.assertEqual(inner["text_bounds"], (0.1, 0.2, 30.3, 12.7))
+        # Packing what was unpacked gives the same bytes, so unchanged shapes stay unchanged
+        self.assertEqual(pack_record(inner, exact=True), pack_record(child, exact=True))
+
+    def test_exact_residuals(self):
+        import random
+        rng = random.Random(4)
+        pts = [rng.uniform(-2000, 2000) for _ in range(200)] + [1e-300, -0.03, 5e-324, 1e12 + 0.1, 0.0625, -0.0625]
+        out = unpack_record(pack_record(record(points=pts, end=(0.1, -0.1)), exact=True))
+        self.assertEqual(out["points"], pts)
+        self.assertEqual(list(out["end"]), [0.1, -0.1])
+        # On-grid coordinates add a byte each to the quantized encoding, not a double
+        grid = [round(rng.uniform(0, 2000) * QUANTUM) / QUANTUM for _ in range(400)]
+        r = record(points=grid, end=(grid[-2], grid[-1]))
+        self.assertLessEqual(len(pack_record(r, exact=True)), len(pack_record(r)) + len(grid) + 40)
+
+    def test_decodes_exact_version_3(self):
+        # Version 3 stored exact coordinates as raw doubles
+        from src.shape_codec import _put_varint, _put_string, _put_doubles
+        import struct
+        body = bytearray((0, 3))
+        _put_varint(body, 512)
+        _put_string(body, "pencil")
+        _put_varint(body, 3)
+        _put_varint(body, 2)
+        body += struct.pack("<Idddd", 0xFFFF0000, 4, 0.0, 1.0, 1.0)
+        _put_varint(body, 22)
+        _put_string(body, "")
+        _put_doubles(body, [0.013, 1 / 3, 9.0, 18.0])
+        out = unpack_record(bytes(body))
+        self.assertEqual(out["points"], [0.013, 1 / 3])
+        self.assertEqual(list(out["end"]), [9.0, 18.0])
+
+    def test_text_and_flags(self):
+        r = record(mode="text", text="Héllo", fill=0x80112233, font_bold=True,
+                   font_italic=True, is_curve=True, text_bounds=(1.0, 2.0, 30.0, 12.0))
+        out = unpack_record(pack_record(r))
+        self.assertEqual(out["text"], "Héllo")
+        self.assertEqual(out["fill"], 0x80112233)
+        self.assertTrue(out["font_bold"] and out["font_italic"] and out["is_curve"])
+        self.assertEqual(out["text_bounds"], (1.0, 2.0, 30.0, 12.0))
+
+    def test_long_stroke_is_compact(self):
+        pts = []
+        for i in range(2000):
+            pts += [100 + i * 0.75, 200 + (i % 40) * 0.5]
+        blob = pack_record(record(points=pts, end=(pts[-2], pts[-1])))
+        # Far below 16 bytes per point of two raw doubles
+        self.assertLess(len(blob), len(pts) * 2)
+        self.assertEqual(len(unpack_record(blob)["points"]), len(pts))
+
+    def test_group_children_round_trip(self):
+        inner = record(mode="group", points=[5.0, 5.0], end=(5.0, 5.0),
+                       children=[record(id=7), record(mode="rect", id=8, points=[0.0, 0.0], end=(40.0, 30.0))])
+        group = record(mode="group", id=9, points=[100.0, 50.0], end=(100.0, 50.0),
+                       children=[inner, record(mode="text", id=10, text="label")])
+        out = unpack_record(pack_record(group))
+        self.assertEqual(out["id"], 9)
+        self.assertEqual([c["mode"] for c in out["children"]], ["group", "text"])
+        self.assertEqual([c["id"] for c in out["children"][0]["children"]], [7, 8])
+        self.assertEqual(list(out["children"][0]["children"][1]["end"]), [40.0, 30.0])
+        self.assertIsNone(out["children"][1]["children"])
+
+    def test_instance_fields(self):
+        r = record(mode="instance", points=[40.0, 60.0], end=(40.0, 60.0),
+                   children=[record()], tint=0xFF00FF00, geometry=12)
+        out = unpack_record(pack_record(r))
+        self.assertEqual(out["tint"], 0xFF00FF00)
+        self.assertEqual(out["geometry"], 12)
+        self.assertEqual(out["children"][0]["points"], record()["points"])
+        plain = unpack_record(pack_record(record()))
+        self.assertIsNone(plain["tint"])
+        self.assertIsNone(plain["geometry"])
+
+    def test_pressures_round_trip(self):
+        pressures = [0.0, 0.5, 1.0]
+        out = unpack_record(pack_record(record(pressures=pressures, tint=0xFF00FF00, geometry=3)))
+        for a, b in zip(out["pressures"], pressures):
+            self.assertLessEqual(abs(a - b), 0.5 / 255)
+        self.assertEqual(out["geometry"], 3)
+        self.assertIsNone(unpack_record(pack_record(record()))["pressures"])
+
+    def test_decodes_version_2(self):
+        # Before version 3 the flags were a single byte; any flags below 128 encode the same
+        body = bytearray(pack_record(record(fill=0x80112233, font_bold=True)))
+        body[1] = 2
+        out = unpack_record(bytes(body))
+        self.assertEqual(out["fill"], 0x80112233)
+        self.assertTrue(out["font_bold"])
+        self.assertEqual(out["points"], record()["points"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+import math
+import random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.shape_recognition import recognize
+
+def segment(a, b, n=40):
+    return [(a[0] + (b[0] - a[0]) * i / n, a[1] + (b[1] - a[1]) * i / n) for i in range(n + 1)]
+
+def polygon(*corners):
+    points = []
+    for a, b in zip(corners, corners[1:] + corners[:1]):
+        points += segment(a, b)
+    return points
+
+def flat(points, noise=1.5, seed=7):
+    rng = random.Random(seed)
+    return [c + rng.gauss(0, noise) for p in points for c in p]
+
+class TestRecognize(unittest.TestCase):
+    def test_rectangle(self):
+        mode, x0, y0, x1, y1 = recognize(flat(polygon((100, 100), (300, 100), (300, 220), (100, 220))))
+        self.assertEqual(mode, "rect")
+        self.assertAlmostEqual(x0, 100, delta=4)
+        self.assertAlmostEqual(y1, 220, delta=4)
+
+    def test_ellipse(self):
+        points = [(200 + 120 * math.cos(t / 50 * math.pi), 150 + 60 * math.sin(t / 50 * math.pi)) for t in range(101)]
+        self.assertEqual(recognize(flat(points))[0], "ellipse")
+
+    def test_diamond(self):
+        self.assertEqual(recognize(flat(polygon((200, 100), (300, 180), (200, 260), (100, 180))))[0], "diamond")
+
+    def test_line_and_arrow(self):
+        mode, x0, y0, x1, y1 = recognize(flat(segment((0, 0), (300, 200))))
+        self.assertEqual(mode, "line")
+        self.assertAlmostEqual(x1, 300, delta=5)
+        shaft = segment((0, 300), (300, 300))
+        head = segment((300, 300), (275, 285), 8) + segment((275, 285), (300, 300), 8) + segment((300, 300), (275, 315), 8)
+        mode, sx, sy, tx, ty = recognize(flat(shaft + head))
+        self.assertEqual(mode, "arrow")
+        self.assertAlmostEqual(tx, 300, delta=6)
+
+    def test_scribbles_and_small_strokes_are_left_alone(self):
+        wave = [(100 + 2 * i, 100 + 30 * math.sin(i / 5)) for i in range(150)]
+        self.assertIsNone(recognize(flat(wave)))
+        self.assertIsNone(recognize(flat(polygon((0, 0), (10, 0), (10, 8), (0, 8)), noise=0.2)))
+        self.assertIsNone(recognize([0, 0, 5, 5]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import sys
+import os
+import random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.smoothing import OneEuroFilter, PointSmoother
+
+class TestOneEuroFilter(unittest.TestCase):
+    def test_first_sample_passes_through(self):
+        f = OneEuroFilter()
+        self.assertEqual(f(42.0, 0.0), 42.0)
+
+    def test_constant_input_is_unchanged(self):
+        f = OneEuroFilter(min_cutoff=2.0, beta=0.03)
+        for i in range(50):
+            self.assertAlmostEqual(f(10.0, i / 240), 10.0)
+
+    def test_jitter_is_reduced(self):
+        rng = random.Random(1)
+        f = OneEuroFilter(min_cutoff=2.0, beta=0.03)
+        raw_err = smooth_err = 0.0
+        for i in range(240):
+            noisy = 100.0 + rng.gauss(0, 1.5)
+            out = f(noisy, i / 240)
+            if i > 20:
+                raw_err += abs(noisy - 100.0)
+                smooth_err += abs(out - 100.0)
+        self.assertLess(smooth_err, raw_err / 2)
+
+    def test_higher_beta_lags_less_on_fast_motion(self):
+        def lag(beta):
+            f = OneEuroFilter(min_cutoff=1.0, beta=beta)
+            for i in range(60):
+                t = i / 240
+                out = f(2000.0 * t, t)
+            return 2000.0 * t - out
+        self.assertLess(lag(0.05), lag(0.0) / 2)
+
+    def test_repeated_timestamp_does_not_divide_by_zero(self):
+        f = OneEuroFilter()
+        f(0.0, 1.0)
+        self.assertGreater(f(5.0, 1.0), 0.0)
+
+class TestPointSmoother(unittest.TestCase):
+    def test_reset_and_configure(self):
+        s = PointSmoother()
+        s(0.0, 0.0, 0.0)
+        s(10.0, 10.0, 0.01)
+        s.reset()
+        s.configure(5.0, 0.1)
+        self.assertEqual(s(3.0, 4.0, 1.0), (3.0, 4.0))
+        self.assertEqual(s._fx.min_cutoff, 5.0)
+        self.assertEqual(s._fy.beta, 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.snapping import SnapIndex, snap_to_grid
+
+class TestSnapIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SnapIndex()
+        self.index.set(1, (100, 100, 200, 150))
+        self.index.set(2, (400, 300, 500, 400))
+
+    def test_point_snaps_to_edges_and_centers(self):
+        self.assertEqual(self.index.snap_point(203, 127, 5), (200, 125, 200, 125))
+        # Out of tolerance on y: only x snaps
+        self.assertEqual(self.index.snap_point(452, 10, 5), (450, 10, 450, None))
+
+    def test_grid_fallback_has_no_guide(self):
+        self.assertEqual(self.index.snap_point(33, 48, 5, grid=20), (40, 40, None, None))
+        self.assertEqual(snap_to_grid(-14, 10), -10)
+
+    def test_skip_and_remove(self):
+        self.assertIsNone(self.index.nearest_x(198, 5, skip=lambda key: key == 1))
+        self.index.remove(1)
+        self.assertIsNone(self.index.nearest_x(198, 5))
+        self.assertEqual(len(self.index), 1)
+
+    def test_set_replaces_lines(self):
+        self.index.set(2, (600, 600, 700, 700))
+        self.assertIsNone(self.index.nearest_y(300, 5))
+        self.assertEqual(self.index.nearest_y(650, 5), (650, 2))
+
+    def test_box_aligns_closest_line(self):
+        # The left edge (202) is 2px from the first box's right edge
+        dx, dy, guide_x, guide_y = self.index.snap_box((202, 500, 300, 520), 5)
+        self.assertEqual((dx, guide_x), (-2, 200))
+        self.assertEqual((dy, guide_y), (0.0, None))
+        dx, dy, _, _ = self.index.snap_box((13, 500, 23, 520), 5, grid=10)
+        self.assertEqual((dx, dy), (-3, 0))
+
+    def test_set_many_matches_set(self):
+        items = [(k, (k * 10, k * 7, k * 10 + 5, k * 7 + 3)) for k in range(3, 200)]
+        # Key 2 moves as part of the bulk update
+        items.append((2, (1000, 1000, 1010, 1010)))
+        self.index.set_many(items)
+        reference = SnapIndex()
+        reference.set(1, (100, 100, 200, 150))
+        for key, bounds in items:
+            reference.set(key, bounds)
+        self.assertEqual(self.index._xs, reference._xs)
+        self.assertEqual(self.index._ys, reference._ys)
+        self.assertEqual([v for v, key in self.index._xs if key == 2], [1000, 1005, 1010])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.spatial_index import SpatialGrid
+
+class TestSpatialGrid(unittest.TestCase):
+    def setUp(self):
+        self.grid = SpatialGrid(cell_size=50)
+        self.grid.insert('a', 'A', (0, 0, 100, 100))
+        self.grid.insert('b', 'B', (80, 80, 200, 200))
+        self.grid.insert('c', 'C', (500, 500, 520, 520))
+
+    def test_point_query_is_topmost_first(self):
+        self.assertEqual(self.grid.query_point(90, 90), ['B', 'A'])
+        self.assertEqual(self.grid.query_point(10, 10), ['A'])
+        self.assertEqual(self.grid.query_point(300, 300), [])
+
+    def test_rect_query(self):
+        self.assertEqual(self.grid.query_rect((150, 150, 510, 510)), ['C', 'B'])
+
+    def test_update_moves_item(self):
+        self.grid.update('c', (0, 0, 10, 10))
+        self.assertEqual(self.grid.query_point(5, 5), ['C', 'A'])
+        self.assertEqual(self.grid.query_point(510, 510), [])
+
+    def test_remove_and_clear(self):
+        self.grid.remove('b')
+        self.assertEqual(self.grid.query_point(150, 150), [])
+        self.assertNotIn('b', self.grid)
+        self.grid.clear()
+        self.assertEqual(len(self.grid), 0)
+
+    def test_oversized_items(self):
+        grid = SpatialGrid(cell_size=10, max_cells_per_item=4)
+        grid.insert('big', 'BIG', (0, 0, 1000, 1000))
+        grid.insert('small', 'SMALL', (0, 0, 5, 5))
+        self.assertEqual(grid.query_point(2, 2), ['SMALL', 'BIG'])
+        self.assertEqual(grid.query_point(900, 900), ['BIG'])
+
+    def test_segment_query_follows_the_segment(self):
+        # The diagonal's bounding box covers C, the segment itself does not
+        self.assertEqual(self.grid.query_segment(0, 0, 600, 300), ['B', 'A'])
+        self.assertEqual(self.grid.query_segment(510, 400, 510, 600), ['C'])
+        self.assertEqual(self.grid.query_segment(300, 300, 300, 300), [])
+        self.assertEqual(self.grid.query_segment(10, 10, 10, 10), ['A'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.hit_testing import point_in_polygon
+from src.stroke_outline import (StrokeOutline, SpeedPressure, stroke_outline, pressure_radius,
+                                max_width, CAP_SEGMENTS)
+
+class TestStrokeOutline(unittest.TestCase):
+    def test_radius_follows_pressure(self):
+        self.assertAlmostEqual(pressure_radius(10, 0.5), 5.0)
+        self.assertLess(pressure_radius(10, 0.0), pressure_radius(10, 1.0))
+        self.assertAlmostEqual(2 * pressure_radius(10, 1.0), max_width(10))
+
+    def test_straight_stroke_outline(self):
+        poly = stroke_outline([0, 0, 10, 0, 20, 0], [0.5, 0.5, 0.5], 10)
+        # Three points per side plus two caps
+        self.assertEqual(len(poly) // 2, 6 + 2 * (CAP_SEGMENTS - 1))
+        ys = poly[1::2]
+        xs = poly[0::2]
+        self.assertAlmostEqual(max(ys), 5.0)
+        self.assertAlmostEqual(min(ys), -5.0)
+        # Round caps reach one radius past each end
+        self.assertAlmostEqual(min(xs), -5.0)
+        self.assertAlmostEqual(max(xs), 25.0)
+        self.assertTrue(point_in_polygon(poly, 10, 0))
+        self.assertFalse(point_in_polygon(poly, 10, 6))
+
+    def test_width_varies_along_stroke(self):
+        poly = stroke_outline([0, 0, 50, 0, 100, 0], [0.0, 0.5, 1.0], 10)
+        self.assertTrue(point_in_polygon(poly, 100, pressure_radius(10, 1.0) - 0.5))
+        self.assertFalse(point_in_polygon(poly, 0, pressure_radius(10, 0.0) + 0.5))
+
+    def test_incremental_quads_match_final_outline(self):
+        outline = StrokeOutline()
+        quads = []
+        coords = [0, 0, 10, 5, 20, 0, 30, 5, 40, 0]
+        for i in range(0, len(coords), 2):
+            quad = outline.add(coords[i], coords[i + 1], 3.0)
+            if quad is not None:
+                quads.append(quad)
+        # Every point but the last has been finalized
+        self.assertEqual(len(quads), len(coords) // 2 - 2)
+        for k, quad in enumerate(quads):
+            self.assertEqual(tuple(quad[:4]), tuple(outline.left[2 * k:2 * k + 4]))
+
+    def test_repeated_points_keep_a_direction(self):
+        poly = stroke_outline([0, 0, 0, 0, 10, 0, 10, 0], [0.5] * 4, 4)
+        self.assertTrue(all(v == v for v in poly))
+
+    def test_speed_pressure(self):
+        sp = SpeedPressure(response=1.0)
+        self.assertEqual(sp(0, 0, 0.0), 0.5)
+        self.assertAlmostEqual(sp(0.1, 0, 0.01), 1.0 - 10 / 1500)
+        self.assertEqual(sp(100, 0, 0.02), 0.0)
+        sp.reset()
+        self.assertEqual(sp.pressure, 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.stroke_split import Capsule, split_polyline, polyline_length
+
+class TestSplitPolyline(unittest.TestCase):
+    def test_untouched_stroke_returns_none(self):
+        coords = [0, 0, 100, 0, 200, 0]
+        self.assertIsNone(split_polyline(coords, Capsule(50, 50, 60, 60, 5)))
+
+    def test_cut_in_the_middle_of_a_long_segment(self):
+        coords = [0, 0, 100, 0]
+        pieces = split_polyline(coords, Capsule(50, -20, 50, 20, 10))
+        self.assertEqual(len(pieces), 2)
+        self.assertAlmostEqual(pieces[0][-2], 40.0)
+        self.assertAlmostEqual(pieces[1][0], 60.0)
+        self.assertEqual(pieces[1][-2:], [100, 0])
+
+    def test_erasing_an_end_keeps_one_piece(self):
+        coords = [0, 0, 10, 0, 20, 0, 30, 0]
+        pieces = split_polyline(coords, Capsule(0, 0, 0, 0, 15))
+        self.assertEqual(len(pieces), 1)
+        self.assertAlmostEqual(pieces[0][0], 15.0)
+        self.assertAlmostEqual(polyline_length(pieces[0]), 15.0)
+
+    def test_fully_erased_stroke_leaves_nothing(self):
+        coords = [0, 0, 5, 0, 10, 0]
+        self.assertEqual(split_polyline(coords, Capsule(-10, 0, 20, 0, 3)), [])
+
+    def test_several_cuts_along_a_zigzag(self):
+        coords = []
+        for i in range(11):
+            coords.extend((i * 10, 0 if i % 2 == 0 else 30))
+        # A horizontal sweep through the middle cuts every segment
+        pieces = split_polyline(coords, Capsule(-10, 15, 110, 15, 2))
+        self.assertEqual(len(pieces), 11)
+
+    def test_capsule_interval_uses_rounded_ends(self):
+        capsule = Capsule(0, 0, 10, 0, 5)
+        # Passes the corner of the capsule's bounding box, outside the end disk
+        self.assertIsNone(capsule.interval(14, -6, 16, -4))
+        t0, t1 = capsule.interval(-10, 0, 30, 0)
+        self.assertAlmostEqual(t0, 0.125)
+        self.assertAlmostEqual(t1, 0.625)
+
+    def test_values_are_interpolated_at_cuts(self):
+        coords = [0, 0, 100, 0]
+        pieces = split_polyline(coords, Capsule(50, -10, 50, 10, 10), values=[0.0, 1.0])
+        self.assertEqual(len(pieces), 2)
+        (left, left_vals), (right, right_vals) = pieces
+        self.assertEqual(len(left) // 2, len(left_vals))
+        self.assertAlmostEqual(left_vals[-1], 0.4)
+        self.assertAlmostEqual(right_vals[0], 0.6)
+        self.assertEqual(right_vals[-1], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
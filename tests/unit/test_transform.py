@@ -0,0 +1,55 @@
+import unittest
+import sys
+import os
+import math
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.transform import Affine, map_coords, map_many
+
+class TestAffine(unittest.TestCase):
+    def assertPoint(self, p, x, y):
+        self.assertAlmostEqual(p[0], x)
+        self.assertAlmostEqual(p[1], y)
+
+    def test_scaling_keeps_anchor(self):
+        m = Affine.scaling(2.0, 0.5, 10, 20)
+        self.assertPoint(m.map(10, 20), 10, 20)
+        self.assertPoint(m.map(20, 40), 30, 30)
+
+    def test_rotation_around_center(self):
+        m = Affine.rotation(math.pi / 2, 100, 100)
+        self.assertPoint(m.map(100, 100), 100, 100)
+        # Clockwise on screen (y down): right of the center goes below it
+        self.assertPoint(m.map(110, 100), 100, 110)
+        self.assertTrue(m.has_rotation())
+        self.assertFalse(m.is_translation())
+
+    def test_then_composes_in_order(self):
+        m = Affine.translation(5, 0).then(Affine.scaling(2, 2))
+        self.assertPoint(m.map(1, 1), 12, 2)
+
+    def test_map_bounds(self):
+        m = Affine.rotation(math.pi / 2)
+        x0, y0, x1, y1 = m.map_bounds((0, 0, 10, 20))
+        self.assertAlmostEqual(x0, -20)
+        self.assertAlmostEqual(x1, 0)
+        self.assertAlmostEqual(y1, 10)
+
+    def test_is_uniform(self):
+        self.assertTrue(Affine.scaling(2, 2, 5, 5).is_uniform())
+        self.assertTrue(Affine.rotation(0.3, 10, 10).then(Affine.translation(4, 0)).is_uniform())
+        self.assertFalse(Affine.scaling(2, 1.5).is_uniform())
+
+class TestMapArrays(unittest.TestCase):
+    def test_map_coords(self):
+        out = map_coords(Affine.translation(1, 2), [0, 0, 3, 4])
+        self.assertEqual(list(out), [1, 2, 4, 6])
+
+    def test_map_many_keeps_array_boundaries(self):
+        m = Affine.scaling(2, 3)
+        a, b, c = map_many(m, [[1, 1], [2, 2, 3, 3], []])
+        self.assertEqual(list(a), [2, 3])
+        self.assertEqual(list(b), [4, 6, 6, 9])
+        self.assertEqual(list(c), [])
+
+if __name__ == '__main__':
+    unittest.main()